@@ -0,0 +1,64 @@
+"""Compare per-box and vectorized conversion of labels to Raster Foundry annotations
+
+Usage:
+    python benchmarks/bench_converters.py [num_boxes]
+"""
+
+import sys
+import time
+
+import numpy as np
+import rasterio
+from rastervision.core import Box
+from rastervision.data.crs_transformer.rasterio_crs_transformer import (
+    RasterioCRSTransformer,
+)
+from rastervision.data.label.object_detection_labels import ObjectDetectionLabels
+
+from rf_raster_vision_plugin.http.converters import annotation_features_from_labels
+
+
+def per_box_coordinates(labels, crs_transformer):
+    """The conversion annotation_features_from_labels used to do, one box at a time"""
+    lat_lng_xform = RasterioCRSTransformer(
+        crs_transformer.transform, crs_transformer.image_proj.srs
+    )
+    return [
+        Box.from_npbox(npbox)
+        .reproject(lat_lng_xform.pixel_to_map)
+        .geojson_coordinates()
+        for npbox in labels.get_npboxes()
+    ]
+
+
+def main(num_boxes: int = 50000):
+    crs_transformer = RasterioCRSTransformer(
+        rasterio.Affine(0.5, 0, 500000, 0, -0.5, 4500000), "epsg:32633"
+    )
+    rng = np.random.RandomState(0)
+    corners = rng.uniform(0, 20000, size=(num_boxes, 2))
+    npboxes = np.hstack([corners, corners + rng.uniform(5, 50, size=(num_boxes, 2))])
+    labels = ObjectDetectionLabels(
+        npboxes, rng.randint(1, 3, size=num_boxes), rng.uniform(size=num_boxes)
+    )
+    class_map = {1: "car", 2: "truck"}
+
+    start = time.perf_counter()
+    old = per_box_coordinates(labels, crs_transformer)
+    old_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    new = annotation_features_from_labels(labels, crs_transformer, "group", class_map)
+    new_time = time.perf_counter() - start
+
+    assert [feature["geometry"]["coordinates"][0] for feature in new] == [
+        [list(vertex) for vertex in ring] for ring in old
+    ]
+    print("boxes:       {}".format(num_boxes))
+    print("per box:     {:.3f} s".format(old_time))
+    print("vectorized:  {:.3f} s".format(new_time))
+    print("speedup:     {:.1f}x".format(old_time / new_time))
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
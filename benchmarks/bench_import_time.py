@@ -0,0 +1,188 @@
+"""Measure how long importing the plugin's modules takes, with python -X importtime
+
+Each module is imported in a fresh interpreter, several times, and the median time
+is reported with the heaviest packages the import pulled in. Interpreter startup isn't
+counted. The cost of register_plugin is measured on its own, after Raster Vision is
+imported, as it is when Raster Vision loads the plugin. Results are printed and written
+as JSON, to benchmarks/results/ unless --output says otherwise, and can be compared
+with an earlier run's.
+
+Usage:
+    python benchmarks/bench_import_time.py [--runs 5] [--output imports.json] [--compare old.json]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# Where results go by default, kept out of version control
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+REGISTRY = """
+class Registry(object):
+    def register_config_builder(self, group, key, builder_class):
+        pass
+"""
+
+# Each case is a statement to measure, and setup run before it that isn't measured
+CASES = {
+    "package": ("import rf_raster_vision_plugin", ""),
+    "plugin_config": ("import rf_raster_vision_plugin.plugin_config", ""),
+    "http_client": ("import rf_raster_vision_plugin.http.client", ""),
+    "converters": ("import rf_raster_vision_plugin.http.converters", ""),
+    "window_sampler": ("import rf_raster_vision_plugin.window_sampler", ""),
+    "label_source": (
+        "import rf_raster_vision_plugin.label_source.rf_annotation_group_label_source",
+        "",
+    ),
+    "label_store": (
+        "import rf_raster_vision_plugin.label_store.rf_annotation_group_label_store",
+        "",
+    ),
+    "raster_source": (
+        "import rf_raster_vision_plugin.raster_source.rf_layer_raster_source",
+        "",
+    ),
+    # Raster Vision is loaded before it calls register_plugin, so only the plugin's
+    # own cost counts
+    "register_plugin": (
+        "register_plugin(Registry())",
+        "import rastervision\n"
+        "from rf_raster_vision_plugin.plugin_config import register_plugin\n"
+        + REGISTRY,
+    ),
+}
+
+MARKER = "-- measuring"
+MEASURE = """{setup}
+import sys
+import time
+
+sys.stderr.write("{marker}\\n")
+start = time.perf_counter()
+{code}
+print(time.perf_counter() - start)
+"""
+
+
+def parse_importtime(stderr):
+    """Read (package, depth, cumulative microseconds) from importtime output after the marker"""
+    lines = stderr.splitlines()
+    imports = []
+    for line in lines[lines.index(MARKER) + 1 :]:
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        _, cumulative, package = line[len("import time:") :].split("|")
+        depth = (len(package) - len(package.lstrip())) // 2
+        imports.append((package.strip(), depth, int(cumulative)))
+    return imports
+
+
+def run(code, setup):
+    proc = subprocess.run(
+        [
+            sys.executable,
+            "-X",
+            "importtime",
+            "-c",
+            MEASURE.format(setup=setup, marker=MARKER, code=code),
+        ],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+    )
+    if proc.returncode:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1])
+    return float(proc.stdout), parse_importtime(proc.stderr)
+
+
+def bench(code, setup, runs):
+    """Time a statement in fresh interpreters, and find the heaviest packages it imports
+
+    Packages are top-level ones outside the plugin, like numpy or rasterio, whichever
+    plugin module imported them.
+    """
+
+    seconds, import_us = [], []
+    for _ in range(runs):
+        elapsed, imports = run(code, setup)
+        seconds.append(elapsed)
+        import_us.append(sum(us for _, depth, us in imports if depth == 0))
+    packages = [
+        (package, us)
+        for package, _, us in imports
+        if "." not in package and package != "rf_raster_vision_plugin"
+    ]
+    return {
+        "ms": 1000 * statistics.median(seconds),
+        "import_ms": statistics.median(import_us) / 1000,
+        "modules_imported": len(imports),
+        "heaviest": {
+            package: us / 1000
+            for package, us in sorted(packages, key=lambda item: -item[1])[:5]
+        },
+    }
+
+
+def compare(results, previous):
+    """Print the ratio of each time to the same time in an earlier run"""
+    print("\ncompared with {}:".format(previous["meta"].get("commit")))
+    for name, result in results["results"].items():
+        old = previous["results"].get(name, {}).get("ms")
+        if "ms" in result and old:
+            print("  {}: {:.2f}x".format(name, result["ms"] / old))
+
+
+def git_commit():
+    try:
+        return (
+            subprocess.check_output(
+                ["git", "rev-parse", "HEAD"], stderr=subprocess.DEVNULL
+            )
+            .decode()
+            .strip()
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument(
+        "--output", default=os.path.join(RESULTS_DIR, "import-time-results.json")
+    )
+    parser.add_argument("--compare")
+    args = parser.parse_args()
+
+    results = {}
+    for name, (code, setup) in CASES.items():
+        try:
+            results[name] = bench(code, setup, args.runs)
+        except RuntimeError as e:
+            results[name] = {"error": str(e)}
+
+    output = {
+        "meta": {
+            "commit": git_commit(),
+            "python": sys.version.split()[0],
+            "time": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "params": vars(args),
+        },
+        "results": results,
+    }
+    print(json.dumps(results, indent=2, sort_keys=True))
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(output, f, indent=2, sort_keys=True)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(output, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
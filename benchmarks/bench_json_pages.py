@@ -0,0 +1,85 @@
+"""Compare peak memory of merging annotation pages against streaming them
+
+Serves a synthetic annotation group from the fake Raster Foundry and converts it to
+AnnotationArrays twice: once from get_labels, which merges every page into one
+FeatureCollection first, and once from iter_labels, which yields each page's
+features as it arrives. Scenes are listed too. The fake runs in its own process, so
+that its allocations don't count towards the peaks.
+
+Usage:
+    python benchmarks/bench_json_pages.py [num_annotations] [page_size]
+"""
+
+from multiprocessing import Pipe, Process
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import fake_rf
+from rf_raster_vision_plugin.http import decoding
+from rf_raster_vision_plugin.http.client import RfClient
+from rf_raster_vision_plugin.label_source.annotation_arrays import AnnotationArrays
+
+
+def measure(fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def report(name, elapsed, peak):
+    print("{:<16}{:.2f} s, {:.0f} MB peak".format(name + ":", elapsed, peak / 2**20))
+
+
+def serve(num_annotations, conn):
+    scenes = fake_rf.write_cogs(tempfile.mkdtemp(), 2, scene_size=512)
+    fake = fake_rf.FakeRasterFoundry(
+        scenes * 500, fake_rf.synthetic_annotations(scenes, num_annotations)
+    )
+    conn.send(fake.start())
+    conn.recv()
+    fake.stop()
+
+
+def main(num_annotations: int = 200000, page_size: int = 5000):
+    conn, child_conn = Pipe()
+    server = Process(target=serve, args=(num_annotations, child_conn), daemon=True)
+    server.start()
+    host = conn.recv()
+    client = RfClient("refresh", host, rate_limit=None)
+    ids = (fake_rf.PROJECT_ID, fake_rf.LAYER_ID, fake_rf.ANNOTATION_GROUP_ID)
+    try:
+        merged, merged_time, merged_peak = measure(
+            lambda: AnnotationArrays.from_features(
+                client.get_labels(*ids, page_size=page_size)["features"], rings=False
+            )
+        )
+        streamed, streamed_time, streamed_peak = measure(
+            lambda: AnnotationArrays.from_features(
+                client.iter_labels(*ids, page_size=page_size), rings=False
+            )
+        )
+        assert len(merged) == len(streamed) == num_annotations
+        _, scenes_time, scenes_peak = measure(
+            lambda: client.get_scenes(fake_rf.PROJECT_ID, fake_rf.LAYER_ID)
+        )
+    finally:
+        conn.send("stop")
+        server.join()
+
+    print("annotations:    {}".format(num_annotations))
+    print("page size:      {}".format(page_size))
+    print("decoder:        {}".format("orjson" if decoding.orjson else "json"))
+    report("merged", merged_time, merged_peak)
+    report("streamed", streamed_time, streamed_peak)
+    report("scenes", scenes_time, scenes_peak)
+    print("peak ratio:     {:.1f}x".format(merged_peak / streamed_peak))
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
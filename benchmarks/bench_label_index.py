@@ -0,0 +1,80 @@
+"""Compare windowed label queries with and without the label source's box index
+
+Usage:
+    python benchmarks/bench_label_index.py [num_boxes] [chip_size]
+"""
+
+import sys
+import time
+
+import numpy as np
+from rastervision.core import Box
+from rastervision.data.label.object_detection_labels import ObjectDetectionLabels
+
+from rf_raster_vision_plugin.label_source.box_index import BoxIndex
+
+
+def synthetic_geojson(num_boxes: int, extent_size: int) -> dict:
+    rng = np.random.RandomState(0)
+    corners = rng.uniform(0, extent_size - 50, size=(num_boxes, 2))
+    sizes = rng.uniform(5, 50, size=(num_boxes, 2))
+    features = []
+    for (y, x), (h, w), class_id in zip(
+        corners, sizes, rng.randint(1, 4, size=num_boxes)
+    ):
+        box = Box(y, x, y + h, x + w)
+        features.append(
+            {
+                "geometry": {
+                    "type": "Polygon",
+                    "coordinates": [box.geojson_coordinates()],
+                },
+                "properties": {"class_id": int(class_id)},
+            }
+        )
+    return {"features": features}
+
+
+def indexed_labels(index: BoxIndex, window: Box) -> ObjectDetectionLabels:
+    selected = index.query(window.ymin, window.xmin, window.ymax, window.xmax)
+    if not len(selected):
+        return ObjectDetectionLabels.make_empty()
+    labels = ObjectDetectionLabels(
+        index.npboxes[selected], index.class_ids[selected], index.scores[selected]
+    )
+    return ObjectDetectionLabels.get_overlapping(
+        labels, window, ioa_thresh=0.8, clip=True
+    )
+
+
+def main(num_boxes: int = 100000, chip_size: int = 300):
+    extent_size = 20000
+    geojson = synthetic_geojson(num_boxes, extent_size)
+    windows = Box(0, 0, extent_size, extent_size).get_windows(chip_size, chip_size)
+    # The unindexed path is slow enough that a sample of windows is plenty
+    sample = windows[:: max(1, len(windows) // 50)]
+
+    start = time.perf_counter()
+    for window in sample:
+        ObjectDetectionLabels.from_geojson(geojson, window)
+    old_per_window = (time.perf_counter() - start) / len(sample)
+
+    start = time.perf_counter()
+    index = BoxIndex.from_geojson(geojson)
+    build_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for window in sample:
+        indexed_labels(index, window)
+    new_per_window = (time.perf_counter() - start) / len(sample)
+
+    print("boxes:             {}".format(num_boxes))
+    print("windows sampled:   {} of {}".format(len(sample), len(windows)))
+    print("from_geojson:      {:.2f} ms/window".format(old_per_window * 1000))
+    print("index build:       {:.2f} ms (once)".format(build_time * 1000))
+    print("indexed query:     {:.2f} ms/window".format(new_per_window * 1000))
+    print("speedup:           {:.1f}x".format(old_per_window / new_per_window))
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
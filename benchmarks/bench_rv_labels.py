@@ -0,0 +1,110 @@
+"""Compare building a label source's box index through GeoJSON and from arrays directly
+
+Usage:
+    python benchmarks/bench_rv_labels.py [num_annotations]
+"""
+
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import rasterio
+from rastervision.data.crs_transformer.rasterio_crs_transformer import (
+    RasterioCRSTransformer,
+)
+from rastervision.data.vector_source.vector_source import transform_geojson
+
+from rf_raster_vision_plugin.label_source.annotation_arrays import AnnotationArrays
+from rf_raster_vision_plugin.label_source.box_index import BoxIndex
+
+
+def synthetic_arrays(num_annotations: int) -> AnnotationArrays:
+    rng = np.random.RandomState(0)
+    corners = rng.uniform([10, 45], [11, 46], size=(num_annotations, 2))
+    sizes = rng.uniform(1e-5, 1e-4, size=(num_annotations, 2))
+    xmins, ymins = corners[:, 0], corners[:, 1]
+    xmaxs, ymaxs = xmins + sizes[:, 0], ymins + sizes[:, 1]
+    rings = np.stack(
+        [
+            np.column_stack([xmins, ymins]),
+            np.column_stack([xmins, ymaxs]),
+            np.column_stack([xmaxs, ymaxs]),
+            np.column_stack([xmaxs, ymins]),
+            np.column_stack([xmins, ymins]),
+        ],
+        axis=1,
+    )
+    return AnnotationArrays(
+        np.array([str(idx) for idx in range(num_annotations)]),
+        np.array(["car", "truck"]),
+        rng.randint(0, 2, size=num_annotations).astype(np.int32),
+        np.ones(num_annotations),
+        rings.reshape(-1, 2),
+        np.arange(0, 5 * num_annotations + 1, 5),
+    )
+
+
+def through_geojson(arrays, class_map, crs_transformer):
+    """The conversion _set_rv_labels used to do"""
+    geojson = transform_geojson(arrays.to_rv_geojson(class_map), crs_transformer)
+    return BoxIndex.from_geojson(geojson)
+
+
+def from_arrays(arrays, class_map, crs_transformer):
+    return BoxIndex(arrays.to_npboxes(crs_transformer), arrays.class_ids(class_map))
+
+
+def nbytes(arrays: AnnotationArrays) -> int:
+    """How much memory an annotation group's arrays hold on to"""
+    return sum(
+        array.nbytes
+        for array in (
+            arrays.ids,
+            arrays.labels,
+            arrays.label_indices,
+            arrays.scores,
+            arrays.bounds,
+            arrays.coords,
+            arrays.offsets,
+        )
+        if array is not None
+    )
+
+
+def measure(build, *args):
+    tracemalloc.start()
+    start = time.perf_counter()
+    index = build(*args)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return index, elapsed, peak
+
+
+def main(num_annotations: int = 500000):
+    crs_transformer = RasterioCRSTransformer(
+        rasterio.Affine(1e-5, 0, 10, 0, -1e-5, 46), "epsg:4326"
+    )
+    arrays = synthetic_arrays(num_annotations)
+    class_map = {"car": 1, "truck": 2}
+
+    old, old_time, old_peak = measure(
+        through_geojson, arrays, class_map, crs_transformer
+    )
+    new, new_time, new_peak = measure(from_arrays, arrays, class_map, crs_transformer)
+
+    assert len(old) == len(new)
+    print("annotations:   {}".format(num_annotations))
+    print("geojson:       {:.2f} s, {:.0f} MB peak".format(old_time, old_peak / 2**20))
+    print("arrays:        {:.2f} s, {:.0f} MB peak".format(new_time, new_peak / 2**20))
+    print("speedup:       {:.1f}x".format(old_time / new_time))
+    print(
+        "retained:      {:.0f} MB with rings, {:.0f} MB without".format(
+            nbytes(arrays) / 2**20, nbytes(arrays.without_rings()) / 2**20
+        )
+    )
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,273 @@
+"""A local fake Raster Foundry API and tile server serving synthetic data
+
+The fake serves one project with one layer of synthetic scenes, whose imagery is a
+set of local Cloud Optimized GeoTIFFs, and one annotation group of randomly placed
+boxes over them. Every request sleeps for a configurable latency first.
+"""
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import os
+import re
+import threading
+import time
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+import rasterio
+from rasterio.io import MemoryFile
+from rasterio.warp import transform_bounds
+
+PROJECT_ID = "00000000-0000-0000-0000-000000000001"
+LAYER_ID = "00000000-0000-0000-0000-000000000002"
+ANNOTATION_GROUP_ID = "00000000-0000-0000-0000-000000000003"
+PREDICTION_GROUP_ID = "00000000-0000-0000-0000-000000000004"
+LABELS = [{"id": "car", "name": "Car"}, {"id": "truck", "name": "Truck"}]
+
+# Where the synthetic scenes are laid out, in web mercator
+ORIGIN = (1113194.9, 5621521.5)
+TILE_SIZE = 256
+
+
+def write_cogs(directory, num_scenes, scene_size=2048, resolution=0.5, seed=0):
+    """Write a row of tiled, overviewed GeoTIFFs side by side
+
+    Returns:
+        Raster Foundry scene metadata for each file
+    """
+
+    rng = np.random.RandomState(seed)
+    scenes = []
+    for idx in range(num_scenes):
+        path = os.path.join(directory, "scene-{}.tif".format(idx))
+        left = ORIGIN[0] + idx * scene_size * resolution
+        top = ORIGIN[1]
+        transform = rasterio.Affine(resolution, 0, left, 0, -resolution, top)
+        with rasterio.open(
+            path,
+            "w",
+            driver="GTiff",
+            width=scene_size,
+            height=scene_size,
+            count=3,
+            dtype="uint8",
+            crs="EPSG:3857",
+            transform=transform,
+            tiled=True,
+            blockxsize=512,
+            blockysize=512,
+            compress="deflate",
+        ) as dataset:
+            # Noise at a coarse scale, so the files compress like imagery rather than static
+            coarse = rng.randint(1, 255, size=(3, scene_size // 16, scene_size // 16))
+            data = np.repeat(np.repeat(coarse, 16, axis=1), 16, axis=2)
+            dataset.write(data.astype(np.uint8))
+            dataset.build_overviews([2, 4, 8], rasterio.enums.Resampling.average)
+
+        right = left + scene_size * resolution
+        bottom = top - scene_size * resolution
+        west, south, east, north = transform_bounds(
+            "EPSG:3857", "EPSG:4326", left, bottom, right, top
+        )
+        scenes.append(
+            {
+                "id": "scene-{}".format(idx),
+                "ingestLocation": path,
+                "statusFields": {"ingestStatus": "INGESTED"},
+                "images": [{"resolutionMeters": resolution}],
+                "dataFootprint": {
+                    "type": "MultiPolygon",
+                    "coordinates": [
+                        [
+                            [
+                                [west, south],
+                                [west, north],
+                                [east, north],
+                                [east, south],
+                                [west, south],
+                            ]
+                        ]
+                    ],
+                },
+            }
+        )
+    return scenes
+
+
+def synthetic_annotations(scenes, num_annotations, seed=0):
+    """Randomly place small boxes over the scenes' footprints, in lng/lat"""
+    rng = np.random.RandomState(seed)
+    vertices = np.array(
+        [
+            vertex
+            for scene in scenes
+            for vertex in scene["dataFootprint"]["coordinates"][0][0]
+        ]
+    )
+    west, south = vertices.min(axis=0)
+    east, north = vertices.max(axis=0)
+    size = (north - south) / 500
+    xs = rng.uniform(west, east - size, num_annotations)
+    ys = rng.uniform(south, north - size, num_annotations)
+    widths = rng.uniform(size / 4, size, num_annotations)
+    heights = rng.uniform(size / 4, size, num_annotations)
+    labels = rng.randint(0, len(LABELS), num_annotations)
+    return [
+        {
+            "id": "annotation-{}".format(idx),
+            "type": "Feature",
+            "geometry": {
+                "type": "Polygon",
+                "coordinates": [
+                    [[x, y], [x, y + h], [x + w, y + h], [x + w, y], [x, y]]
+                ],
+            },
+            "properties": {
+                "label": LABELS[label]["id"],
+                "confidence": None,
+                "annotationGroup": ANNOTATION_GROUP_ID,
+            },
+        }
+        for idx, (x, y, w, h, label) in enumerate(
+            zip(
+                xs.tolist(),
+                ys.tolist(),
+                widths.tolist(),
+                heights.tolist(),
+                labels.tolist(),
+            )
+        )
+    ]
+
+
+def encode_tile(array):
+    """Encode a (height, width, channels) uint8 array as a PNG"""
+    with MemoryFile() as memfile:
+        with memfile.open(
+            driver="PNG",
+            width=array.shape[1],
+            height=array.shape[0],
+            count=array.shape[2],
+            dtype="uint8",
+        ) as dataset:
+            dataset.write(np.transpose(array, axes=[2, 0, 1]))
+        return memfile.read()
+
+
+class FakeRasterFoundry(object):
+    def __init__(self, scenes, annotations, latency=0.0):
+        """Serve synthetic scenes and annotations like the Raster Foundry API does
+
+        Args:
+            scenes (list): Raster Foundry scene metadata, as from write_cogs
+            annotations (list): Annotation GeoJSON features, as from synthetic_annotations
+            latency (float): How many seconds to sleep before answering each request
+        """
+
+        self.project = {
+            "id": PROJECT_ID,
+            "extras": {"annotate": {"labels": LABELS}},
+        }
+        self.scenes = scenes
+        self.annotations = annotations
+        self.latency = latency
+        self.posted = []
+        self.request_count = 0
+        self._lock = threading.Lock()
+        self._tiles = {}
+        self._server = None
+
+    def paginate(self, results, results_key, query):
+        page = int(query.get("page", ["0"])[0])
+        page_size = int(query.get("pageSize", ["30"])[0])
+        start = page * page_size
+        return {
+            "count": len(results),
+            "page": page,
+            "pageSize": page_size,
+            "hasNext": start + page_size < len(results),
+            results_key: results[start : start + page_size],
+        }
+
+    def tile(self, z, x, y):
+        """A tile of coarse noise seeded by its address, generated once"""
+        key = (z, x, y)
+        if key not in self._tiles:
+            rng = np.random.RandomState((z * 7919 + x * 104729 + y) % 2**32)
+            self._tiles[key] = encode_tile(
+                np.repeat(
+                    np.repeat(rng.randint(1, 255, (16, 16, 3)), 16, axis=0),
+                    16,
+                    axis=1,
+                ).astype(np.uint8)
+            )
+        return self._tiles[key]
+
+    def handle(self, method, path, query, body):
+        with self._lock:
+            self.request_count += 1
+        time.sleep(self.latency)
+        if method == "POST" and path == "/api/tokens":
+            return {"id_token": "fake-jwt"}
+        if method == "GET" and re.match(r"^/api/projects/[^/]+$", path):
+            return self.project
+        if re.match(r"^/api/projects/[^/]+/layers/[^/]+/annotations$", path):
+            if method == "POST":
+                with self._lock:
+                    self.posted.extend(body["features"])
+                return body
+            group = query.get("annotationGroup", [None])[0]
+            features = self.annotations if group == ANNOTATION_GROUP_ID else []
+            return dict(
+                self.paginate(features, "features", query), type="FeatureCollection"
+            )
+        if method == "GET" and re.match(
+            r"^/api/projects/[^/]+/layers/[^/]+/scenes$", path
+        ):
+            return self.paginate(self.scenes, "results", query)
+        tile = re.match(r"^/[^/]+/layers/[^/]+/(\d+)/(\d+)/(\d+)/$", path)
+        if method == "GET" and tile:
+            return self.tile(*(int(part) for part in tile.groups()))
+        return None
+
+    def start(self) -> str:
+        """Start serving on a free local port, returning the host to point clients at"""
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _respond(self, method):
+                url = urlparse(self.path)
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length)) if length else None
+                result = fake.handle(method, url.path, parse_qs(url.query), body)
+                if isinstance(result, bytes):
+                    payload, content_type = result, "image/png"
+                else:
+                    payload = json.dumps(result).encode()
+                    content_type = "application/json"
+                self.send_response(404 if result is None else 200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_GET(self):
+                self._respond("GET")
+
+            def do_POST(self):
+                self._respond("POST")
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return "http://127.0.0.1:{}".format(self._server.server_address[1])
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
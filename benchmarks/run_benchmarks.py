@@ -0,0 +1,226 @@
+"""Measure the plugin's throughput against a local fake Raster Foundry
+
+Writes synthetic COGs, serves them and a synthetic annotation group from a fake
+Raster Foundry API, and times label source construction, windowed get_labels,
+chip reads with each backend and label store saves. Results are printed and
+written as JSON, to benchmarks/results/ unless --output says otherwise, and can be
+compared with an earlier run's.
+
+Usage:
+    python benchmarks/run_benchmarks.py [--output results.json] [--compare old.json]
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+
+import numpy as np
+from rastervision.data.label.object_detection_labels import ObjectDetectionLabels
+
+import fake_rf
+from rf_raster_vision_plugin import __version__
+from rf_raster_vision_plugin.http.client import RfClient
+from rf_raster_vision_plugin.label_source.rf_annotation_group_label_source import (
+    RfAnnotationGroupLabelSource,
+)
+from rf_raster_vision_plugin.label_store.rf_annotation_group_label_store import (
+    RfAnnotationGroupLabelStore,
+)
+from rf_raster_vision_plugin.raster_source.rf_layer_raster_source import (
+    RfLayerRasterSource,
+)
+
+# Where results go by default, kept out of version control
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+def git_commit():
+    try:
+        return (
+            subprocess.check_output(
+                ["git", "rev-parse", "HEAD"],
+                cwd=os.path.dirname(os.path.abspath(__file__)),
+                stderr=subprocess.DEVNULL,
+            )
+            .decode()
+            .strip()
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def client(host):
+    # The fake serves tiles from the API host, so the API rate limit would throttle
+    # tile reads too, and measure the limit rather than the plugin
+    return RfClient("refresh", host, rate_limit=None)
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def raster_source(host, client, chip_backend):
+    return RfLayerRasterSource(
+        fake_rf.PROJECT_ID,
+        fake_rf.LAYER_ID,
+        fake_rf.ANNOTATION_GROUP_ID,
+        "refresh",
+        [0, 1, 2],
+        3,
+        rf_api_host=host,
+        rf_tile_host=host,
+        client=client,
+        chip_backend=chip_backend,
+    )
+
+
+def bench_label_source(host, crs_transformer, extent, args):
+    rf_client = client(host)
+    label_source, construction = timed(
+        RfAnnotationGroupLabelSource,
+        fake_rf.ANNOTATION_GROUP_ID,
+        fake_rf.PROJECT_ID,
+        fake_rf.LAYER_ID,
+        "refresh",
+        crs_transformer,
+        rf_api_host=host,
+        client=rf_client,
+    )
+    windows = extent.get_windows(args.chip_size, args.chip_size)[: args.windows]
+    _, querying = timed(lambda: [label_source.get_labels(w) for w in windows])
+    return {
+        "label_source_construction": {
+            "seconds": construction,
+            "annotations_per_second": args.annotations / construction,
+        },
+        "windowed_get_labels": {
+            "windows": len(windows),
+            "ms_per_window": 1000 * querying / len(windows),
+        },
+    }
+
+
+def bench_chips(host, chip_backend, args, prefetch=False):
+    source = raster_source(host, client(host), chip_backend)
+    windows = source.get_extent().get_windows(args.chip_size, args.chip_size)
+    windows = windows[: args.chips]
+    if prefetch:
+        source.prefetch(windows)
+    _, seconds = timed(lambda: [source.get_chip(window) for window in windows])
+    result = {"chips": len(windows), "chips_per_second": len(windows) / seconds}
+    if prefetch:
+        result.update(source._prefetcher.stats())
+        source.stop_prefetch()
+    return result
+
+
+def bench_save(host, fake, crs_transformer, extent, args):
+    rng = np.random.RandomState(0)
+    corners = rng.uniform(
+        0, min(extent.get_height(), extent.get_width()) - 50, (args.boxes, 2)
+    )
+    npboxes = np.hstack([corners, corners + rng.uniform(5, 50, (args.boxes, 2))])
+    labels = ObjectDetectionLabels(
+        npboxes, rng.randint(1, 3, args.boxes), rng.uniform(size=args.boxes)
+    )
+    store = RfAnnotationGroupLabelStore(
+        fake_rf.PREDICTION_GROUP_ID,
+        fake_rf.PROJECT_ID,
+        fake_rf.LAYER_ID,
+        "refresh",
+        crs_transformer,
+        {1: "car", 2: "truck"},
+        rf_api_host=host,
+        client=client(host),
+        progress_dir=tempfile.mkdtemp(),
+    )
+    requests_before = fake.request_count
+    _, seconds = timed(store.save, labels)
+    assert len(fake.posted) == args.boxes
+    return {
+        "boxes": args.boxes,
+        "annotations_per_second": args.boxes / seconds,
+        "requests": fake.request_count - requests_before,
+    }
+
+
+def compare(results, previous):
+    """Print the ratio of each metric to the same metric in an earlier run"""
+    print("\ncompared with {}:".format(previous["meta"].get("commit")))
+    for name, metrics in results["results"].items():
+        for metric, value in metrics.items():
+            old = previous["results"].get(name, {}).get(metric)
+            if isinstance(value, (int, float)) and old:
+                print("  {}.{}: {:.2f}x".format(name, metric, value / old))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--scenes", type=int, default=4)
+    parser.add_argument("--scene-size", type=int, default=2048)
+    parser.add_argument("--annotations", type=int, default=50000)
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--chip-size", type=int, default=300)
+    parser.add_argument("--chips", type=int, default=100)
+    parser.add_argument("--windows", type=int, default=500)
+    parser.add_argument("--boxes", type=int, default=20000)
+    parser.add_argument(
+        "--output", default=os.path.join(RESULTS_DIR, "benchmark-results.json")
+    )
+    parser.add_argument("--compare")
+    args = parser.parse_args()
+    warnings.simplefilter("ignore")
+
+    workdir = tempfile.mkdtemp()
+    scenes = fake_rf.write_cogs(workdir, args.scenes, scene_size=args.scene_size)
+    fake = fake_rf.FakeRasterFoundry(
+        scenes,
+        fake_rf.synthetic_annotations(scenes, args.annotations),
+        latency=args.latency,
+    )
+    host = fake.start()
+    try:
+        source, construction = timed(raster_source, host, client(host), "rasterio")
+        crs_transformer = source.get_crs_transformer()
+        extent = source.get_extent()
+        results = {"raster_source_construction": {"seconds": construction}}
+        results.update(bench_label_source(host, crs_transformer, extent, args))
+        results["get_chip_rasterio"] = bench_chips(host, "rasterio", args)
+        results["get_chip_rasterio_prefetch"] = bench_chips(
+            host, "rasterio", args, prefetch=True
+        )
+        results["get_chip_tiles"] = bench_chips(host, "tiles", args)
+        results["save"] = bench_save(host, fake, crs_transformer, extent, args)
+    finally:
+        fake.stop()
+
+    output = {
+        "meta": {
+            "version": __version__,
+            "commit": git_commit(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "params": vars(args),
+        },
+        "results": results,
+    }
+    print(json.dumps(results, indent=2, sort_keys=True))
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(output, f, indent=2, sort_keys=True)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(output, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -66,9 +66,9 @@ setup(
     install_requires=[
         # eg: 'aspectlib==1.1.1', 'six>=1.7',
         'rastervision >= 0.9.0',
-        'requests >= 2.22.0',
-        'mypy >= 0.701'
+        'requests >= 2.22.0'
     ],
     extras_require={
+        'fast-json': ['orjson'],
     },
 )
@@ -0,0 +1,159 @@
+from datetime import datetime, timezone
+import hashlib
+import json
+import os
+from typing import Optional, Tuple
+from uuid import UUID
+
+from .. import instrumentation
+from ..http.client import RfClient
+from ..label_source.annotation_arrays import AnnotationArrays
+
+
+class AnnotationCacheMiss(Exception):
+    """Raised when an offline read finds nothing cached for an annotation group"""
+
+    pass
+
+
+class AnnotationCache(object):
+    def __init__(self, cache_dir: str):
+        """Construct a new on-disk cache of annotation groups
+
+        Each annotation group gets a directory named by the hash of its api host,
+        project, layer and group ids. Inside it, a manifest records the group's count
+        and ETag at the last sync, the project metadata, and the name of the
+        AnnotationArrays blob, which is itself named by the hash of its contents.
+
+        Args:
+            cache_dir (str): The directory to keep cached annotation groups in
+        """
+
+        self.cache_dir = cache_dir
+
+    def _entry_dir(
+        self,
+        api_host: str,
+        project_id: UUID,
+        project_layer_id: UUID,
+        annotation_group: UUID,
+        window: Optional[str] = None,
+    ) -> str:
+        parts = [api_host, project_id, project_layer_id, annotation_group]
+        if window:
+            parts.append(window)
+        key = "/".join(str(part) for part in parts)
+        return os.path.join(
+            self.cache_dir,
+            "annotations",
+            hashlib.sha256(key.encode("utf-8")).hexdigest(),
+        )
+
+    def _read_manifest(self, entry_dir: str) -> Optional[dict]:
+        try:
+            with open(os.path.join(entry_dir, "manifest.json")) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _read_annotations(self, entry_dir: str, manifest: dict) -> AnnotationArrays:
+        with open(os.path.join(entry_dir, manifest["data"]), "rb") as f:
+            return AnnotationArrays.from_bytes(f.read())
+
+    def _write(
+        self,
+        entry_dir: str,
+        version: dict,
+        project: dict,
+        annotations: AnnotationArrays,
+    ):
+        os.makedirs(entry_dir, exist_ok=True)
+        previous = self._read_manifest(entry_dir)
+
+        data = annotations.to_bytes()
+        data_name = hashlib.sha256(data).hexdigest() + ".npz"
+        data_path = os.path.join(entry_dir, data_name)
+        if not os.path.exists(data_path):
+            with open(data_path + ".tmp", "wb") as f:
+                f.write(data)
+            os.replace(data_path + ".tmp", data_path)
+
+        manifest = {
+            "data": data_name,
+            "count": version["count"],
+            "etag": version["etag"],
+            "synced_at": datetime.now(timezone.utc).isoformat(),
+            "project": project,
+        }
+        manifest_path = os.path.join(entry_dir, "manifest.json")
+        with open(manifest_path + ".tmp", "w") as f:
+            json.dump(manifest, f)
+        os.replace(manifest_path + ".tmp", manifest_path)
+
+        if previous is not None and previous["data"] != data_name:
+            try:
+                os.remove(os.path.join(entry_dir, previous["data"]))
+            except FileNotFoundError:
+                pass
+
+    def sync(
+        self,
+        client: RfClient,
+        project_id: UUID,
+        project_layer_id: UUID,
+        annotation_group: UUID,
+        offline: bool = False,
+        window: Optional[str] = None,
+    ) -> Tuple[dict, AnnotationArrays]:
+        """Get an annotation group's project metadata and annotations, downloading only if stale
+
+        The Raster Foundry annotations endpoint has no modified-since filter, so the
+        cached copy is validated by the group's annotation count and, when the API sends
+        one, its ETag. Either changing triggers a full download.
+
+        Args:
+            client (RfClient): The client to sync with
+            project_id (UUID): A Raster Foundry project id
+            project_layer_id (UUID): A Raster Foundry project layer id in this project
+            annotation_group (UUID): The annotation group that holds the annotations
+            offline (bool): Whether to read only from the cache, never touching the network
+            window (Optional[str]): A "xmin,ymin,xmax,ymax" lng/lat bbox, to cache only the annotations intersecting it
+
+        Returns:
+            The project metadata and the group's annotations
+        """
+
+        entry_dir = self._entry_dir(
+            client.api_host, project_id, project_layer_id, annotation_group, window
+        )
+        manifest = self._read_manifest(entry_dir)
+
+        if offline:
+            if manifest is None:
+                raise AnnotationCacheMiss(
+                    "No cached annotations for annotation group {}".format(
+                        annotation_group
+                    )
+                )
+            return manifest["project"], self._read_annotations(entry_dir, manifest)
+
+        version = client.get_labels_version(
+            project_id, project_layer_id, annotation_group, window
+        )
+        project = client.get_project(project_id)
+        if (
+            manifest is not None
+            and manifest["count"] == version["count"]
+            and manifest["etag"] == version["etag"]
+        ):
+            instrumentation.cache_access("annotation_cache", True)
+            annotations = self._read_annotations(entry_dir, manifest)
+        else:
+            instrumentation.cache_access("annotation_cache", False)
+            annotations = AnnotationArrays.from_features(
+                client.iter_labels(
+                    project_id, project_layer_id, annotation_group, window
+                )
+            )
+        self._write(entry_dir, version, project, annotations)
+        return project, annotations
@@ -0,0 +1,263 @@
+from collections import OrderedDict
+from contextlib import contextmanager
+import fcntl
+import hashlib
+import json
+import os
+import threading
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+
+DEFAULT_MAX_BYTES = 10 * 2**30
+# How many uses of chips to hold before appending them to the index log
+USE_BATCH = 64
+# The index log is compacted once it has this many times as many records as chips
+COMPACT_RATIO = 4
+# The fewest chips to size the index log's compaction threshold for
+MIN_COMPACT = 256
+
+
+def scene_set_hash(scenes: Iterable[dict]) -> str:
+    """Hash the ids and locations of a layer's scenes, so cached chips can tell when they change"""
+    digest = hashlib.sha256()
+    for scene_id, uri in sorted((str(scene["id"]), scene["uri"]) for scene in scenes):
+        digest.update("{}={}\n".format(scene_id, uri).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class ChipCache(object):
+    def __init__(self, cache_dir: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        """Construct a new on-disk cache of decoded chips
+
+        Each chip is stored as its own .npy file, named by the hash of its layer id,
+        scene set hash, window and channel order, and read back as a read-only memory
+        map, so a cache hit doesn't copy the chip into memory. The least recently used
+        chips are evicted once the cache holds more than max_bytes.
+
+        The index is an append-only log of each chip's layer, scene set and size, its
+        uses and its eviction, so least recently used order survives a restart. Uses
+        are appended in batches, and the log is rewritten compactly once it holds many
+        more records than there are chips. Processes sharing a directory lock the log
+        to write it, and first catch up with what the others appended.
+
+        Args:
+            cache_dir (str): The directory to keep cached chips in
+            max_bytes (int): The most bytes of chips to keep on disk
+        """
+
+        self.chip_dir = os.path.join(cache_dir, "chips")
+        self.max_bytes = max_bytes
+        self._log_path = os.path.join(self.chip_dir, "index.log")
+        self._lock = threading.Lock()
+        os.makedirs(self.chip_dir, exist_ok=True)
+        self._lock_file = open(os.path.join(self.chip_dir, "index.lock"), "a")
+        self._index = OrderedDict()  # type: OrderedDict
+        self._size = 0
+        self._pending = []  # type: List[dict]
+        self._log_inode = None  # type: Optional[int]
+        self._log_offset = 0
+        self._log_records = 0
+        self._log_partial = False
+        with self._lock, self._writing():
+            pass
+
+    def _apply(self, record: dict):
+        name = record["name"]
+        if record["op"] == "put":
+            if name in self._index:
+                self._size -= self._index.pop(name)["bytes"]
+            self._index[name] = {
+                key: record[key] for key in ("layer", "scenes", "bytes")
+            }
+            self._size += record["bytes"]
+        elif name in self._index:
+            if record["op"] == "use":
+                self._index.move_to_end(name)
+            else:
+                self._size -= self._index.pop(name)["bytes"]
+
+    def _catch_up(self):
+        """Apply the records appended to the log since it was last read"""
+        with open(self._log_path, "ab"):
+            pass
+        stat = os.stat(self._log_path)
+        replay = stat.st_ino != self._log_inode or stat.st_size < self._log_offset
+        if replay:
+            # The log is new or was compacted, so read it from the start
+            self._index, self._size = OrderedDict(), 0
+            self._log_inode, self._log_offset, self._log_records = stat.st_ino, 0, 0
+        with open(self._log_path, "rb") as f:
+            f.seek(self._log_offset)
+            data = f.read()
+        # A process that died mid-append leaves a partial line, which is skipped
+        end = data.rfind(b"\n") + 1
+        for line in data[:end].splitlines():
+            try:
+                self._apply(json.loads(line.decode("utf-8")))
+            except (KeyError, ValueError):
+                continue
+            self._log_records += 1
+        self._log_offset += end
+        self._log_partial = end < len(data)
+        if replay:
+            for name in list(self._index):
+                if not os.path.exists(os.path.join(self.chip_dir, name)):
+                    self._size -= self._index.pop(name)["bytes"]
+
+    @contextmanager
+    def _writing(self):
+        """Lock the log, catch up with it, and append the records made meanwhile
+
+        Callers must hold self._lock.
+        """
+
+        fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+        try:
+            self._catch_up()
+            for record in self._pending:
+                self._apply(record)
+            yield
+            if self._pending:
+                data = "".join(json.dumps(record) + "\n" for record in self._pending)
+                with open(self._log_path, "ab") as f:
+                    f.write(("\n" if self._log_partial else "").encode("utf-8"))
+                    f.write(data.encode("utf-8"))
+                    self._log_offset = f.tell()
+                self._log_records += len(self._pending)
+                self._log_partial = False
+                self._pending = []
+            if self._log_records > COMPACT_RATIO * max(len(self._index), MIN_COMPACT):
+                self._compact()
+        finally:
+            fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def _compact(self):
+        """Rewrite the log as one record per chip, in least to most recently used order"""
+        tmp_path = self._log_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            for name, entry in self._index.items():
+                f.write(json.dumps(dict(entry, op="put", name=name)) + "\n")
+        os.replace(tmp_path, self._log_path)
+        stat = os.stat(self._log_path)
+        self._log_inode, self._log_offset = stat.st_ino, stat.st_size
+        self._log_records = len(self._index)
+
+    def _record(self, op: str, name: str, **fields):
+        record = dict(fields, op=op, name=name)
+        self._apply(record)
+        self._pending.append(record)
+
+    def flush(self):
+        """Append the uses of chips that haven't been written to the log yet"""
+        with self._lock, self._writing():
+            pass
+
+    @staticmethod
+    def _name(
+        layer_id: str,
+        scene_hash: str,
+        window: Tuple[int, int, int, int],
+        channel_order: Optional[List[int]],
+    ) -> str:
+        key = json.dumps(
+            [
+                str(layer_id),
+                scene_hash,
+                [int(coord) for coord in window],
+                None if channel_order is None else [int(c) for c in channel_order],
+            ]
+        )
+        return hashlib.sha256(key.encode("utf-8")).hexdigest() + ".npy"
+
+    def _remove(self, name: str):
+        self._record("del", name)
+        try:
+            os.remove(os.path.join(self.chip_dir, name))
+        except FileNotFoundError:
+            pass
+
+    def contains(
+        self,
+        layer_id: str,
+        scene_hash: str,
+        window: Tuple[int, int, int, int],
+        channel_order: Optional[List[int]],
+    ) -> bool:
+        with self._lock:
+            return (
+                self._name(layer_id, scene_hash, window, channel_order) in self._index
+            )
+
+    def get(
+        self,
+        layer_id: str,
+        scene_hash: str,
+        window: Tuple[int, int, int, int],
+        channel_order: Optional[List[int]],
+    ) -> Optional[np.ndarray]:
+        """Get a cached chip as a read-only memory map, or None if it isn't cached"""
+        name = self._name(layer_id, scene_hash, window, channel_order)
+        with self._lock:
+            if name not in self._index:
+                return None
+            self._record("use", name)
+            if len(self._pending) >= USE_BATCH:
+                with self._writing():
+                    pass
+        try:
+            return np.load(os.path.join(self.chip_dir, name), mmap_mode="r")
+        except (FileNotFoundError, ValueError):
+            with self._lock, self._writing():
+                if name in self._index:
+                    self._remove(name)
+            return None
+
+    def put(
+        self,
+        layer_id: str,
+        scene_hash: str,
+        window: Tuple[int, int, int, int],
+        channel_order: Optional[List[int]],
+        chip: np.ndarray,
+    ) -> np.ndarray:
+        """Cache a chip, evicting the least recently used chips if the cache is full
+
+        Returns:
+            The cached chip as a read-only memory map
+        """
+
+        name = self._name(layer_id, scene_hash, window, channel_order)
+        path = os.path.join(self.chip_dir, name)
+        tmp_path = "{}.{}.tmp".format(path, threading.get_ident())
+        mapped = np.lib.format.open_memmap(
+            tmp_path, mode="w+", dtype=chip.dtype, shape=chip.shape
+        )
+        mapped[:] = chip
+        mapped.flush()
+        del mapped
+        os.replace(tmp_path, path)
+        size = os.path.getsize(path)
+
+        with self._lock, self._writing():
+            self._record(
+                "put", name, layer=str(layer_id), scenes=scene_hash, bytes=size
+            )
+            while self._size > self.max_bytes and len(self._index) > 1:
+                self._remove(next(iter(self._index)))
+        return np.load(path, mmap_mode="r")
+
+    def invalidate(self, layer_id: str, scene_hash: str):
+        """Drop a layer's cached chips that were read from any other set of scenes"""
+        with self._lock, self._writing():
+            stale = [
+                name
+                for name, entry in self._index.items()
+                if entry["layer"] == str(layer_id) and entry["scenes"] != scene_hash
+            ]
+            for name in stale:
+                self._remove(name)
+
+    def size(self) -> int:
+        """How many bytes of chips the cache holds"""
+        return self._size
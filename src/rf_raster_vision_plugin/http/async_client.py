@@ -0,0 +1,219 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Awaitable, Callable, Dict, List, Optional, TypeVar
+from uuid import UUID
+
+from ..label_source.annotation_arrays import AnnotationArrays
+from .client import RfClient
+from .pagination import DEFAULT_MAX_WORKERS, DEFAULT_PAGE_SIZE
+
+T = TypeVar("T")
+
+
+class AsyncRfClient(object):
+    def __init__(self, client: RfClient, max_concurrency: Optional[int] = None):
+        """Expose an RfClient's operations as coroutines
+
+        Each call runs the blocking RfClient method on a thread pool, so coroutines
+        share the client's pooled session and API token, and at most max_concurrency
+        calls run at once. That's never more than the connections the client keeps to
+        each host, since a request beyond those opens a connection that's then thrown
+        away.
+
+        Args:
+            client (RfClient): The client to make requests with
+            max_concurrency (Optional[int]): The most requests to run at once, defaulting to the client's pool_maxsize
+        """
+
+        self.client = client
+        self.max_concurrency = min(
+            max_concurrency or client.pool_maxsize, client.pool_maxsize
+        )
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency)
+
+    async def _run(self, call: Callable[..., T], *args, **kwargs) -> T:
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(
+            self._executor, partial(call, *args, **kwargs)
+        )
+
+    async def get_api_token(self) -> str:
+        return await self._run(lambda: self.client.token)
+
+    async def get_labels(
+        self,
+        project_id: UUID,
+        project_layer_id: UUID,
+        annotation_group_id: UUID,
+        window: Optional[str] = None,
+        page_size: int = DEFAULT_PAGE_SIZE,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+    ) -> dict:
+        return await self._run(
+            self.client.get_labels,
+            project_id,
+            project_layer_id,
+            annotation_group_id,
+            window,
+            page_size=page_size,
+            max_workers=max_workers,
+        )
+
+    async def get_labels_version(
+        self,
+        project_id: UUID,
+        project_layer_id: UUID,
+        annotation_group_id: UUID,
+        window: Optional[str] = None,
+    ) -> dict:
+        return await self._run(
+            self.client.get_labels_version,
+            project_id,
+            project_layer_id,
+            annotation_group_id,
+            window,
+        )
+
+    async def get_project(self, project_id: UUID) -> dict:
+        return await self._run(self.client.get_project, project_id)
+
+    async def get_scenes(
+        self,
+        project_id: UUID,
+        project_layer_id: UUID,
+        page_size: int = DEFAULT_PAGE_SIZE,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+    ) -> List[dict]:
+        return await self._run(
+            self.client.get_scenes,
+            project_id,
+            project_layer_id,
+            page_size=page_size,
+            max_workers=max_workers,
+        )
+
+    async def get_tile(
+        self,
+        tile_host: str,
+        project_id: UUID,
+        project_layer_id: UUID,
+        z: int,
+        x: int,
+        y: int,
+    ) -> Optional[bytes]:
+        return await self._run(
+            self.client.get_tile, tile_host, project_id, project_layer_id, z, x, y
+        )
+
+    async def get_annotations(
+        self, project_id: UUID, project_layer_id: UUID, annotation_group_id: UUID
+    ) -> AnnotationArrays:
+        """Fetch an annotation group and parse it into ringless AnnotationArrays off the event loop"""
+        return await self._run(
+            lambda: AnnotationArrays.from_features(
+                self.client.iter_labels(
+                    project_id, project_layer_id, annotation_group_id
+                ),
+                rings=False,
+            )
+        )
+
+    async def post_labels(
+        self, project_id: UUID, project_layer_id: UUID, labels: List[dict]
+    ) -> dict:
+        return await self._run(
+            self.client.post_labels, project_id, project_layer_id, labels
+        )
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+
+async def gather_scene_metadata(
+    client: AsyncRfClient, scenes: List[dict]
+) -> List[dict]:
+    """Fetch the metadata many scenes' sources need, all at once
+
+    Each scene is a dict with a project_id, a project_layer_id and optionally an
+    annotation_group_id. Requests shared between scenes, like the project they all
+    belong to, are made only once.
+
+    Args:
+        client (AsyncRfClient): The client to make requests with
+        scenes (List[dict]): The scenes to fetch metadata for
+
+    Returns:
+        For each scene, a dict of its project, its layer's Raster Foundry scenes as
+        rf_scenes, and its annotation group as annotations, or None if it has no
+        annotation group
+    """
+
+    requests = {}  # type: Dict[tuple, asyncio.Future]
+
+    def request(key: tuple, make_request: Callable[[], Awaitable]) -> asyncio.Future:
+        if key not in requests:
+            requests[key] = asyncio.ensure_future(make_request())
+        return requests[key]
+
+    async def no_annotations():
+        return None
+
+    per_scene = []
+    for scene in scenes:
+        project_id = scene["project_id"]
+        layer_id = scene["project_layer_id"]
+        group_id = scene.get("annotation_group_id")
+        per_scene.append(
+            (
+                request(
+                    ("project", project_id), partial(client.get_project, project_id)
+                ),
+                request(
+                    ("scenes", project_id, layer_id),
+                    partial(client.get_scenes, project_id, layer_id),
+                ),
+                request(
+                    ("annotations", project_id, layer_id, group_id),
+                    (
+                        partial(client.get_annotations, project_id, layer_id, group_id)
+                        if group_id is not None
+                        else no_annotations
+                    ),
+                ),
+            )
+        )
+    await asyncio.gather(*requests.values())
+    return [
+        {
+            "project": project.result(),
+            "rf_scenes": rf_scenes.result(),
+            "annotations": annotations.result(),
+        }
+        for project, rf_scenes, annotations in per_scene
+    ]
+
+
+def load_scene_metadata(
+    client: RfClient,
+    scenes: List[dict],
+    max_concurrency: Optional[int] = None,
+) -> List[dict]:
+    """Fetch many scenes' metadata concurrently from synchronous code
+
+    Args:
+        client (RfClient): The client to make requests with
+        scenes (List[dict]): The scenes to fetch metadata for, as for gather_scene_metadata
+        max_concurrency (Optional[int]): The most requests to run at once, as for AsyncRfClient
+
+    Returns:
+        The metadata for each scene, as from gather_scene_metadata
+    """
+
+    async_client = AsyncRfClient(client, max_concurrency=max_concurrency)
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(gather_scene_metadata(async_client, scenes))
+    finally:
+        loop.close()
+        async_client.close()
@@ -0,0 +1,306 @@
+import base64
+from itertools import chain, islice
+import json
+import threading
+import time
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, TypeVar
+from uuid import UUID
+
+import requests
+
+from . import raster_foundry as rf
+from .pagination import DEFAULT_MAX_WORKERS, DEFAULT_PAGE_SIZE
+from .retry import RetryingAdapter, RetryPolicy, TokenBucket
+
+T = TypeVar("T")
+
+# How long to trust a token whose expiry can't be read from its claims
+DEFAULT_TOKEN_TTL = 15 * 60
+# How long before a token's expiry to stop using it
+TOKEN_EXPIRY_LEEWAY = 60
+# How many requests per second to make to the API at most, by default
+DEFAULT_RATE_LIMIT = 25.0
+
+
+def _token_expiry(token: str) -> float:
+    """Read the expiry time from a JWT's claims without verifying it"""
+    try:
+        payload = token.split(".")[1]
+        claims = json.loads(
+            base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4))
+        )
+        return float(claims["exp"])
+    except (IndexError, KeyError, TypeError, ValueError):
+        return time.time() + DEFAULT_TOKEN_TTL
+
+
+class RfClient(object):
+    def __init__(
+        self,
+        refresh_token: str,
+        api_host: str = "app.staging.rasterfoundry.com",
+        pool_maxsize: int = DEFAULT_MAX_WORKERS,
+        retry_policy: Optional[RetryPolicy] = None,
+        rate_limit: Optional[float] = DEFAULT_RATE_LIMIT,
+    ):
+        """Construct a new Raster Foundry API client
+
+        The client owns a pooled requests.Session, so every call made through it reuses
+        open connections, and it exchanges its refresh token for an API token only when
+        it has no token or the one it has is about to expire. Every request is retried
+        according to retry_policy, and requests to the API host, though not to tile
+        hosts, are rate limited, so that many concurrent workers don't overload it.
+
+        Args:
+            refresh_token (str): A Raster Foundry refresh token to use to obtain an auth token
+            api_host (str): The url host name to use for communicating with Raster Foundry
+            pool_maxsize (int): How many connections to keep open to each host
+            retry_policy (Optional[RetryPolicy]): How to retry failed requests, defaulting to RetryPolicy()
+            rate_limit (Optional[float]): The most requests per second to make to the API host, or None for no limit
+        """
+
+        self.refresh_token = refresh_token
+        self.api_host = api_host
+        self.pool_maxsize = pool_maxsize
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.session = requests.Session()
+        adapter = RetryingAdapter(
+            self.retry_policy, pool_connections=4, pool_maxsize=pool_maxsize
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.mount(
+            rf._api_url(api_host, "/"),
+            RetryingAdapter(
+                self.retry_policy,
+                TokenBucket(rate_limit) if rate_limit else None,
+                pool_connections=1,
+                pool_maxsize=pool_maxsize,
+            ),
+        )
+        self._token = None  # type: Optional[str]
+        self._token_expiry = 0.0
+        self._token_lock = threading.Lock()
+
+    @property
+    def token(self) -> str:
+        """An API token for this client's refresh token, refreshed shortly before it expires"""
+        with self._token_lock:
+            if self._token is None or time.time() >= self._token_expiry:
+                self._token = rf.get_api_token(
+                    self.refresh_token, self.api_host, session=self.session
+                )
+                self._token_expiry = _token_expiry(self._token) - TOKEN_EXPIRY_LEEWAY
+            return self._token
+
+    def invalidate_token(self, token: str):
+        """Forget a token the API rejected, unless another thread already replaced it"""
+        with self._token_lock:
+            if self._token == token:
+                self._token = None
+
+    def _with_token(self, make_request: Callable[[str], T]) -> T:
+        token = self.token
+        try:
+            return make_request(token)
+        except requests.HTTPError as e:
+            if e.response is None or e.response.status_code != 401:
+                raise
+            self.invalidate_token(token)
+            return make_request(self.token)
+
+    def _iter_with_token(
+        self, make_iterator: Callable[[str], Iterable[T]]
+    ) -> Iterator[T]:
+        """Like _with_token for a paginated iterator, retrying if its first page is rejected"""
+
+        def start(token):
+            iterator = iter(make_iterator(token))
+            return chain(list(islice(iterator, 1)), iterator)
+
+        return self._with_token(start)
+
+    def get_labels(
+        self,
+        project_id: UUID,
+        project_layer_id: UUID,
+        annotation_group_id: UUID,
+        window: Optional[str] = None,
+        page_size: int = DEFAULT_PAGE_SIZE,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+    ) -> dict:
+        return self._with_token(
+            lambda token: rf.get_labels(
+                token,
+                self.api_host,
+                project_id,
+                project_layer_id,
+                annotation_group_id,
+                window,
+                page_size=page_size,
+                max_workers=max_workers,
+                session=self.session,
+            )
+        )
+
+    def iter_labels(
+        self,
+        project_id: UUID,
+        project_layer_id: UUID,
+        annotation_group_id: UUID,
+        window: Optional[str] = None,
+        page_size: int = DEFAULT_PAGE_SIZE,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+    ) -> Iterator[dict]:
+        return self._iter_with_token(
+            lambda token: rf.iter_labels(
+                token,
+                self.api_host,
+                project_id,
+                project_layer_id,
+                annotation_group_id,
+                window,
+                page_size=page_size,
+                max_workers=max_workers,
+                session=self.session,
+            )
+        )
+
+    def get_labels_version(
+        self,
+        project_id: UUID,
+        project_layer_id: UUID,
+        annotation_group_id: UUID,
+        window: Optional[str] = None,
+    ) -> dict:
+        return self._with_token(
+            lambda token: rf.get_labels_version(
+                token,
+                self.api_host,
+                project_id,
+                project_layer_id,
+                annotation_group_id,
+                window=window,
+                session=self.session,
+            )
+        )
+
+    def get_project(self, project_id: UUID) -> dict:
+        return self._with_token(
+            lambda token: rf.get_project(
+                token, self.api_host, project_id, session=self.session
+            )
+        )
+
+    def get_scenes(
+        self,
+        project_id: UUID,
+        project_layer_id: UUID,
+        page_size: int = DEFAULT_PAGE_SIZE,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+    ) -> List[dict]:
+        return self._with_token(
+            lambda token: rf.get_scenes(
+                token,
+                self.api_host,
+                project_id,
+                project_layer_id,
+                page_size=page_size,
+                max_workers=max_workers,
+                session=self.session,
+            )
+        )
+
+    def iter_scenes(
+        self,
+        project_id: UUID,
+        project_layer_id: UUID,
+        page_size: int = DEFAULT_PAGE_SIZE,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+    ) -> Iterator[dict]:
+        return self._iter_with_token(
+            lambda token: rf.iter_scenes(
+                token,
+                self.api_host,
+                project_id,
+                project_layer_id,
+                page_size=page_size,
+                max_workers=max_workers,
+                session=self.session,
+            )
+        )
+
+    def get_tile(
+        self,
+        tile_host: str,
+        project_id: UUID,
+        project_layer_id: UUID,
+        z: int,
+        x: int,
+        y: int,
+    ) -> Optional[bytes]:
+        return self._with_token(
+            lambda token: rf.get_tile(
+                token,
+                tile_host,
+                project_id,
+                project_layer_id,
+                z,
+                x,
+                y,
+                session=self.session,
+            )
+        )
+
+    def post_labels(
+        self, project_id: UUID, project_layer_id: UUID, labels: List[dict]
+    ) -> dict:
+        return self._with_token(
+            lambda token: rf.post_labels(
+                token,
+                self.api_host,
+                project_id,
+                project_layer_id,
+                labels,
+                session=self.session,
+            )
+        )
+
+    def put_label(self, project_id: UUID, project_layer_id: UUID, label: dict):
+        self._with_token(
+            lambda token: rf.put_label(
+                token,
+                self.api_host,
+                project_id,
+                project_layer_id,
+                label,
+                session=self.session,
+            )
+        )
+
+    def delete_label(
+        self, project_id: UUID, project_layer_id: UUID, annotation_id: str
+    ):
+        self._with_token(
+            lambda token: rf.delete_label(
+                token,
+                self.api_host,
+                project_id,
+                project_layer_id,
+                annotation_id,
+                session=self.session,
+            )
+        )
+
+
+_clients = {}  # type: Dict[Tuple[str, str], RfClient]
+_clients_lock = threading.Lock()
+
+
+def get_client(refresh_token: str, api_host: str) -> RfClient:
+    """Get the process-wide client for a refresh token and API host, creating it if needed"""
+    with _clients_lock:
+        key = (refresh_token, api_host)
+        if key not in _clients:
+            _clients[key] = RfClient(refresh_token, api_host)
+        return _clients[key]
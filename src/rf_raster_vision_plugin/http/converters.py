@@ -1,38 +1,106 @@
-from rastervision.core import Box
-from rastervision.data.crs_transformer import CRSTransformer
-from rastervision.data.crs_transformer.rasterio_crs_transformer import (
-    RasterioCRSTransformer,
-)
-from rastervision.data.label.object_detection_labels import ObjectDetectionLabels
-
-from mypy.types import List
+from typing import TYPE_CHECKING, List
 from uuid import UUID
 
+import numpy as np
+
+# Raster Vision, rasterio and pyproj are only imported when boxes are reprojected, so
+# building features from lng/lat boxes doesn't load them
+if TYPE_CHECKING:
+    from rastervision.data.crs_transformer import CRSTransformer
+    from rastervision.data.crs_transformer.rasterio_crs_transformer import (
+        RasterioCRSTransformer,
+    )
+    from rastervision.data.label.object_detection_labels import ObjectDetectionLabels
+
+
+def pixel_to_map_array(
+    crs_transformer: "RasterioCRSTransformer", xs: np.ndarray, ys: np.ndarray
+) -> np.ndarray:
+    """Transform many pixel points to map coordinates in one call
+
+    This matches RasterioCRSTransformer.pixel_to_map point for point, including its
+    truncation of pixel coordinates to ints and use of pixel centers.
+
+    Returns:
+        An (n, 2) array of map coordinates
+    """
+
+    import pyproj
+    from rasterio.transform import xy
+
+    rows = np.trunc(ys).astype(int)
+    cols = np.trunc(xs).astype(int)
+    image_xs, image_ys = xy(crs_transformer.transform, rows, cols)
+    map_xs, map_ys = pyproj.transform(
+        crs_transformer.image_proj,
+        crs_transformer.map_proj,
+        np.asarray(image_xs, dtype=float),
+        np.asarray(image_ys, dtype=float),
+    )
+    return np.column_stack([map_xs, map_ys])
+
+
+def map_boxes_from_labels(
+    labels: "ObjectDetectionLabels", crs_transformer: "CRSTransformer"
+) -> np.ndarray:
+    """Reproject labels' pixel boxes to lng/lat
+
+    Returns:
+        An (n, 4) array of (xmin, ymin, xmax, ymax) boxes
+    """
+
+    from rastervision.data.crs_transformer.rasterio_crs_transformer import (
+        RasterioCRSTransformer,
+    )
 
-def annotation_features_from_labels(
-    labels: ObjectDetectionLabels,
-    crs_transformer: CRSTransformer,
-    annotation_group: UUID,
-    inverted_class_map: dict,
-) -> List[dict]:
     # Build a new RasterioCRSTransformer, which defaults to 4326
     lat_lng_xform = RasterioCRSTransformer(
         crs_transformer.transform, crs_transformer.image_proj.srs
     )
-    box_list = labels.boxlist
-    boxes = [
-        Box.from_npbox(npbox)
-        .reproject(lat_lng_xform.pixel_to_map)
-        .geojson_coordinates()
-        for npbox in box_list.data["boxes"]
-    ]
+    npboxes = labels.get_npboxes()
+    num_boxes = len(npboxes)
+
+    # Reproject every box's (xmin, ymin) and (xmax, ymax) corners together
+    corners = pixel_to_map_array(
+        lat_lng_xform,
+        np.concatenate([npboxes[:, 1], npboxes[:, 3]]),
+        np.concatenate([npboxes[:, 0], npboxes[:, 2]]),
+    )
+    # Pixel ymin is the north edge, so take the min and max of each axis
+    return np.hstack(
+        [
+            np.minimum(corners[:num_boxes], corners[num_boxes:]),
+            np.maximum(corners[:num_boxes], corners[num_boxes:]),
+        ]
+    )
+
+
+def annotation_features_from_boxes(
+    map_boxes: np.ndarray,
+    label_ids: List[str],
+    scores: List[float],
+    annotation_group: UUID,
+) -> List[dict]:
+    """Build Raster Foundry annotation features from lng/lat boxes and their label ids"""
+    xmins, ymins, xmaxs, ymaxs = map_boxes.T
+    # The same ring as Box.geojson_coordinates of the pixel box, for every box at once
+    rings = np.stack(
+        [
+            np.column_stack([xmins, ymaxs]),
+            np.column_stack([xmins, ymins]),
+            np.column_stack([xmaxs, ymins]),
+            np.column_stack([xmaxs, ymaxs]),
+            np.column_stack([xmins, ymaxs]),
+        ],
+        axis=1,
+    ).tolist()
 
     return [
         {
-            "geometry": {"type": "Polygon", "coordinates": [box]},
+            "geometry": {"type": "Polygon", "coordinates": [ring]},
             "properties": {
                 "owner": None,
-                "label": inverted_class_map[class_id],
+                "label": label_id,
                 "description": None,
                 "machineGenerated": True,
                 "confidence": score,
@@ -42,7 +110,19 @@ def annotation_features_from_labels(
                 "verifiedBy": None,
             },
         }
-        for box, class_id, score in zip(
-            boxes, labels.boxlist.data["classes"], labels.boxlist.data["scores"]
-        )
+        for ring, label_id, score in zip(rings, label_ids, scores)
     ]
+
+
+def annotation_features_from_labels(
+    labels: "ObjectDetectionLabels",
+    crs_transformer: "CRSTransformer",
+    annotation_group: UUID,
+    inverted_class_map: dict,
+) -> List[dict]:
+    return annotation_features_from_boxes(
+        map_boxes_from_labels(labels, crs_transformer),
+        [inverted_class_map[class_id] for class_id in labels.get_class_ids().tolist()],
+        labels.get_scores().tolist(),
+        annotation_group,
+    )
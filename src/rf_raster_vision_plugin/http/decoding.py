@@ -0,0 +1,26 @@
+"""Decoding of JSON response bodies, with orjson when it's installed
+
+orjson decodes straight from the response's bytes, without first building the str
+that json.loads needs, and is several times faster on large annotation pages.
+"""
+
+import json
+from typing import Any
+
+import requests
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None  # type: ignore
+
+
+def loads(data: bytes) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def decode_json(resp: requests.Response) -> Any:
+    """Decode a response's JSON body from its bytes"""
+    return loads(resp.content)
@@ -0,0 +1,95 @@
+import threading
+from typing import Dict, List, Optional
+from uuid import UUID
+
+from ..label_source.annotation_arrays import AnnotationArrays
+from .client import RfClient
+
+# Metadata shared by every scene built in this process, keyed by api host and ids
+_projects = {}  # type: Dict[tuple, dict]
+_rf_scenes = {}  # type: Dict[tuple, List[dict]]
+_annotations = {}  # type: Dict[tuple, AnnotationArrays]
+_lock = threading.Lock()
+
+
+def prefetch(
+    client: RfClient,
+    scenes: List[dict],
+    max_concurrency: Optional[int] = None,
+):
+    """Fetch many scenes' metadata concurrently, to be shared by the sources built for them
+
+    Args:
+        client (RfClient): The client to make requests with
+        scenes (List[dict]): The scenes to fetch metadata for, as for load_scene_metadata
+        max_concurrency (Optional[int]): The most requests to run at once, as for AsyncRfClient
+    """
+
+    # asyncio is only worth importing once there's metadata to prefetch
+    from .async_client import load_scene_metadata
+
+    metadata = load_scene_metadata(client, scenes, max_concurrency=max_concurrency)
+    with _lock:
+        for scene, scene_metadata in zip(scenes, metadata):
+            project_id = str(scene["project_id"])
+            layer_id = str(scene["project_layer_id"])
+            _projects[(client.api_host, project_id)] = scene_metadata["project"]
+            _rf_scenes[(client.api_host, project_id, layer_id)] = scene_metadata[
+                "rf_scenes"
+            ]
+            if scene_metadata["annotations"] is not None:
+                group_id = str(scene["annotation_group_id"])
+                _annotations[(client.api_host, project_id, layer_id, group_id)] = (
+                    scene_metadata["annotations"]
+                )
+
+
+def get_project(client: RfClient, project_id: UUID) -> dict:
+    """Get a project's metadata, fetching it only if no scene has yet"""
+    key = (client.api_host, str(project_id))
+    with _lock:
+        if key in _projects:
+            return _projects[key]
+    project = client.get_project(project_id)
+    with _lock:
+        return _projects.setdefault(key, project)
+
+
+def get_rf_scenes(
+    client: RfClient, project_id: UUID, project_layer_id: UUID
+) -> List[dict]:
+    """Get a project layer's Raster Foundry scenes, fetching them only if no scene has yet"""
+    key = (client.api_host, str(project_id), str(project_layer_id))
+    with _lock:
+        if key in _rf_scenes:
+            return _rf_scenes[key]
+    rf_scenes = client.get_scenes(project_id, project_layer_id)
+    with _lock:
+        return _rf_scenes.setdefault(key, rf_scenes)
+
+
+def pop_annotations(
+    client: RfClient,
+    project_id: UUID,
+    project_layer_id: UUID,
+    annotation_group_id: UUID,
+) -> Optional[AnnotationArrays]:
+    """Take an annotation group's prefetched annotations, if there are any
+
+    Annotations can be large, so they're forgotten once a label source takes them.
+    """
+
+    key = (
+        client.api_host,
+        str(project_id),
+        str(project_layer_id),
+        str(annotation_group_id),
+    )
+    with _lock:
+        return _annotations.pop(key, None)
+
+
+def class_map(project: dict) -> Dict[str, int]:
+    """Map a project's Raster Foundry label ids to Raster Vision class ids"""
+    labels = project["extras"]["annotate"]["labels"]
+    return {item["id"]: idx + 1 for idx, item in enumerate(labels)}
@@ -0,0 +1,100 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import math
+from typing import Callable, Iterator
+
+DEFAULT_PAGE_SIZE = 100
+DEFAULT_MAX_WORKERS = 8
+
+
+def iter_pages(
+    fetch_page: Callable[[int, int], dict],
+    page_size: int = DEFAULT_PAGE_SIZE,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+) -> Iterator[dict]:
+    """Fetch every page of a paginated Raster Foundry response, yielding pages in order
+
+    The first page is fetched alone to learn the total count. The remaining pages are
+    then fetched concurrently, with at most max_workers requests in flight, so that
+    pages are never buffered far ahead of the consumer. If the server reports more
+    pages than the count implied, the rest are walked one at a time.
+
+    Args:
+        fetch_page (Callable[[int, int], dict]): A function of (page, page_size) returning the decoded page
+        page_size (int): How many results to request per page
+        max_workers (int): The maximum number of pages to fetch concurrently
+    """
+
+    page = fetch_page(0, page_size)
+    yield page
+    if not page.get("hasNext"):
+        return
+
+    num_pages = (
+        math.ceil(page["count"] / page_size) if page.get("count") is not None else 1
+    )
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        pending = deque()  # type: deque
+        next_page = 1
+        while pending or next_page < num_pages:
+            while next_page < num_pages and len(pending) < max_workers:
+                pending.append(pool.submit(fetch_page, next_page, page_size))
+                next_page += 1
+            page = pending.popleft().result()
+            yield page
+
+    while page.get("hasNext"):
+        page = fetch_page(next_page, page_size)
+        next_page += 1
+        yield page
+
+
+def iter_results(
+    fetch_page: Callable[[int, int], dict],
+    results_key: str,
+    page_size: int = DEFAULT_PAGE_SIZE,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+) -> Iterator:
+    """Yield the results of every page of a paginated response, in order
+
+    Each page is let go of once its results have been yielded, so at most the pages
+    in flight are held in memory at once.
+
+    Args:
+        fetch_page (Callable[[int, int], dict]): A function of (page, page_size) returning the decoded page
+        results_key (str): The key holding each page's list of results, e.g. "features" or "results"
+        page_size (int): How many results to request per page
+        max_workers (int): The maximum number of pages to fetch concurrently
+    """
+
+    for page in iter_pages(fetch_page, page_size, max_workers):
+        results = page.pop(results_key)
+        del page
+        yield from results
+        del results
+
+
+def fetch_all_pages(
+    fetch_page: Callable[[int, int], dict],
+    results_key: str,
+    page_size: int = DEFAULT_PAGE_SIZE,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+) -> dict:
+    """Fetch every page of a paginated response and merge their results in order
+
+    Args:
+        fetch_page (Callable[[int, int], dict]): A function of (page, page_size) returning the decoded page
+        results_key (str): The key holding each page's list of results, e.g. "features" or "results"
+        page_size (int): How many results to request per page
+        max_workers (int): The maximum number of pages to fetch concurrently
+
+    Returns:
+        The first page, with the results of every later page appended
+    """
+
+    pages = iter_pages(fetch_page, page_size, max_workers)
+    merged = next(pages)
+    for page in pages:
+        merged[results_key] += page[results_key]
+    merged["hasNext"] = False
+    return merged
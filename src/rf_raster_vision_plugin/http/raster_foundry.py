@@ -1,61 +1,287 @@
 import requests
 
-from mypy.types import List, Optional
+from typing import Dict, Iterator, List, Optional
 from uuid import UUID
 
-from .converters import annotation_features_from_labels
+from .. import instrumentation
+from .decoding import decode_json
+from .pagination import (
+    DEFAULT_MAX_WORKERS,
+    DEFAULT_PAGE_SIZE,
+    fetch_all_pages,
+    iter_results,
+)
 
 
-def get_api_token(refresh_token: str, api_host: str) -> str:
-    resp = requests.post(
-        "https://{rf_api_host}/api/tokens".format(rf_api_host=api_host),
+def _api_url(api_host: str, path: str) -> str:
+    """Build a url for an API path, using https unless the host names its own scheme"""
+    base = api_host if "://" in api_host else "https://" + api_host
+    return base + path
+
+
+def _request(
+    session: Optional[requests.Session], name: str, method: str, url: str, **kwargs
+) -> requests.Response:
+    """Make a request, recording its latency, count and response size under name"""
+    with instrumentation.timer("http." + name):
+        resp = (session or requests).request(method, url, **kwargs)
+    if instrumentation.enabled():
+        instrumentation.count("http.requests")
+        instrumentation.count("http.{}.requests".format(name))
+        body = resp.request.body
+        # A streamed body has no length to count
+        sent = len(body) if isinstance(body, (bytes, str)) else 0
+        instrumentation.count("http.bytes_sent", sent)
+        instrumentation.count("http.bytes_received", len(resp.content))
+    return resp
+
+
+def get_api_token(
+    refresh_token: str, api_host: str, session: Optional[requests.Session] = None
+) -> str:
+    resp = _request(
+        session,
+        "get_api_token",
+        "POST",
+        _api_url(api_host, "/api/tokens"),
         json={"refresh_token": refresh_token},
     )
     resp.raise_for_status()
     return resp.json()["id_token"]
 
 
-def get_labels(
+def _annotation_params(annotation_group_id: UUID, window: Optional[str]) -> dict:
+    params = {"annotationGroup": annotation_group_id}  # type: Dict[str, object]
+    if window:
+        params["bbox"] = window
+    return params
+
+
+def _labels_page_fetcher(
     jwt: str,
     api_host: str,
     project_id: UUID,
     project_layer_id: UUID,
     annotation_group_id: UUID,
     window: Optional[str],
-) -> dict:
-    def make_request(params):
-        resp = requests.get(
-            "https://{rf_api_host}/api/projects/{project_id}/layers/{layer_id}/annotations".format(
-                rf_api_host=api_host, project_id=project_id, layer_id=project_layer_id
+    session: Optional[requests.Session],
+):
+    def fetch_page(page, page_size):
+        resp = _request(
+            session,
+            "get_labels",
+            "GET",
+            _api_url(
+                api_host,
+                "/api/projects/{project_id}/layers/{layer_id}/annotations".format(
+                    project_id=project_id, layer_id=project_layer_id
+                ),
+            ),
+            params=dict(
+                _annotation_params(annotation_group_id, window),
+                pageSize=page_size,
+                page=page,
             ),
-            params=params,
             headers={"Authorization": jwt},
         )
         resp.raise_for_status()
-        return resp.json()
+        return decode_json(resp)
+
+    return fetch_page
+
+
+def get_labels(
+    jwt: str,
+    api_host: str,
+    project_id: UUID,
+    project_layer_id: UUID,
+    annotation_group_id: UUID,
+    window: Optional[str],
+    page_size: int = DEFAULT_PAGE_SIZE,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    session: Optional[requests.Session] = None,
+) -> dict:
+    """Fetch an annotation group's annotations, only those intersecting window if it's given
+
+    Args:
+        window (Optional[str]): A "xmin,ymin,xmax,ymax" bbox in lng/lat for the API to filter annotations to
+    """
+
+    return fetch_all_pages(
+        _labels_page_fetcher(
+            jwt,
+            api_host,
+            project_id,
+            project_layer_id,
+            annotation_group_id,
+            window,
+            session,
+        ),
+        "features",
+        page_size,
+        max_workers,
+    )
+
+
+def iter_labels(
+    jwt: str,
+    api_host: str,
+    project_id: UUID,
+    project_layer_id: UUID,
+    annotation_group_id: UUID,
+    window: Optional[str] = None,
+    page_size: int = DEFAULT_PAGE_SIZE,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    session: Optional[requests.Session] = None,
+) -> Iterator[dict]:
+    """Yield an annotation group's features as their pages arrive, without merging them
 
-    params = {"annotationGroup": annotation_group_id, "pageSize": 100, "page": 0}
+    Only the pages in flight are held in memory, so a consumer that converts features
+    as it goes, like AnnotationArrays.from_features, never holds the whole group as
+    decoded GeoJSON.
+    """
 
-    geojson = make_request(params)
+    return iter_results(
+        _labels_page_fetcher(
+            jwt,
+            api_host,
+            project_id,
+            project_layer_id,
+            annotation_group_id,
+            window,
+            session,
+        ),
+        "features",
+        page_size,
+        max_workers,
+    )
 
-    while geojson["hasNext"]:
-        params["page"] = params["page"] + 1  # type: ignore
-        resp = make_request(params)
-        geojson["hasNext"] = resp["hasNext"]
-        geojson["features"] += resp["features"]
 
-    return geojson
+def get_labels_version(
+    jwt: str,
+    api_host: str,
+    project_id: UUID,
+    project_layer_id: UUID,
+    annotation_group_id: UUID,
+    window: Optional[str] = None,
+    session: Optional[requests.Session] = None,
+) -> dict:
+    """Cheaply describe an annotation group's current contents, within window if it's given
 
+    Requests a single-item page, so that the count and any ETag the API sends can be
+    compared with a previous download without fetching the annotations again.
+    """
 
-def get_project(jwt: str, api_host: str, project_id: UUID) -> dict:
-    resp = requests.get(
-        "https://{rf_api_host}/api/projects/{project_id}".format(
-            rf_api_host=api_host, project_id=project_id
+    resp = _request(
+        session,
+        "get_labels_version",
+        "GET",
+        _api_url(
+            api_host,
+            "/api/projects/{project_id}/layers/{layer_id}/annotations".format(
+                project_id=project_id, layer_id=project_layer_id
+            ),
+        ),
+        params=dict(
+            _annotation_params(annotation_group_id, window), pageSize=1, page=0
         ),
         headers={"Authorization": jwt},
     )
     resp.raise_for_status()
-    return resp.json()
+    return {"count": decode_json(resp)["count"], "etag": resp.headers.get("ETag")}
+
+
+def get_project(
+    jwt: str,
+    api_host: str,
+    project_id: UUID,
+    session: Optional[requests.Session] = None,
+) -> dict:
+    resp = _request(
+        session,
+        "get_project",
+        "GET",
+        _api_url(api_host, "/api/projects/{project_id}".format(project_id=project_id)),
+        headers={"Authorization": jwt},
+    )
+    resp.raise_for_status()
+    return decode_json(resp)
+
+
+def iter_scenes(
+    jwt: str,
+    api_host: str,
+    project_id: UUID,
+    project_layer_id: UUID,
+    page_size: int = DEFAULT_PAGE_SIZE,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    session: Optional[requests.Session] = None,
+) -> Iterator[dict]:
+    """Yield a project layer's scenes as their pages arrive"""
+
+    def fetch_page(page, page_size):
+        resp = _request(
+            session,
+            "get_scenes",
+            "GET",
+            _api_url(
+                api_host,
+                "/api/projects/{project_id}/layers/{layer_id}/scenes".format(
+                    project_id=project_id, layer_id=project_layer_id
+                ),
+            ),
+            params={"pageSize": page_size, "page": page},
+            headers={"Authorization": "Bearer " + jwt},
+        )
+        resp.raise_for_status()
+        return decode_json(resp)
+
+    return iter_results(fetch_page, "results", page_size, max_workers)
+
+
+def get_scenes(
+    jwt: str,
+    api_host: str,
+    project_id: UUID,
+    project_layer_id: UUID,
+    page_size: int = DEFAULT_PAGE_SIZE,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    session: Optional[requests.Session] = None,
+) -> List[dict]:
+    return list(
+        iter_scenes(
+            jwt, api_host, project_id, project_layer_id, page_size, max_workers, session
+        )
+    )
+
+
+def get_tile(
+    jwt: str,
+    tile_host: str,
+    project_id: UUID,
+    project_layer_id: UUID,
+    z: int,
+    x: int,
+    y: int,
+    session: Optional[requests.Session] = None,
+) -> Optional[bytes]:
+    """Fetch one XYZ tile of a project layer, or None if the tile server has no data there"""
+    resp = _request(
+        session,
+        "get_tile",
+        "GET",
+        _api_url(
+            tile_host,
+            "/{project_id}/layers/{layer_id}/{z}/{x}/{y}/".format(
+                project_id=project_id, layer_id=project_layer_id, z=z, x=x, y=y
+            ),
+        ),
+        params={"token": jwt},
+    )
+    if resp.status_code in (204, 404):
+        return None
+    resp.raise_for_status()
+    return resp.content
 
 
 def post_labels(
@@ -64,15 +290,77 @@ def post_labels(
     project_id: UUID,
     project_layer_id: UUID,
     labels: List[dict],
+    session: Optional[requests.Session] = None,
 ) -> dict:
-    resp = requests.post(
-        "https://{rf_api_host}/api/projects/{project_id}/layers/{project_layer_id}/annotations".format(
-            rf_api_host=api_host,
+    resp = _request(
+        session,
+        "post_labels",
+        "POST",
+        _api_url(
+            api_host,
+            "/api/projects/{project_id}/layers/{project_layer_id}/annotations".format(
+                project_id=project_id, project_layer_id=project_layer_id
+            ),
+        ),
+        headers={"Authorization": jwt},
+        json={"features": labels},
+    )
+    resp.raise_for_status()
+    return decode_json(resp)
+
+
+def _annotation_url(
+    api_host: str, project_id: UUID, project_layer_id: UUID, annotation_id: str
+) -> str:
+    return _api_url(
+        api_host,
+        "/api/projects/{project_id}/layers/{project_layer_id}/annotations/{annotation_id}".format(
             project_id=project_id,
             project_layer_id=project_layer_id,
+            annotation_id=annotation_id,
         ),
+    )
+
+
+def put_label(
+    jwt: str,
+    api_host: str,
+    project_id: UUID,
+    project_layer_id: UUID,
+    label: dict,
+    session: Optional[requests.Session] = None,
+):
+    """Replace an existing annotation with a feature carrying its id"""
+    resp = _request(
+        session,
+        "put_label",
+        "PUT",
+        _annotation_url(api_host, project_id, project_layer_id, label["id"]),
+        headers={"Authorization": jwt},
+        json=label,
+    )
+    resp.raise_for_status()
+
+
+def delete_label(
+    jwt: str,
+    api_host: str,
+    project_id: UUID,
+    project_layer_id: UUID,
+    annotation_id: str,
+    session: Optional[requests.Session] = None,
+):
+    """Delete an annotation, succeeding if it's already gone
+
+    A retried or repeated delete finds no annotation, and that's what it was asked for.
+    """
+    resp = _request(
+        session,
+        "delete_label",
+        "DELETE",
+        _annotation_url(api_host, project_id, project_layer_id, annotation_id),
         headers={"Authorization": jwt},
-        json={"features": labels},
     )
+    if resp.status_code == 404:
+        return
     resp.raise_for_status()
-    return resp.json()
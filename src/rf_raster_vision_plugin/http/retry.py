@@ -0,0 +1,214 @@
+"""Retries with backoff, and client-side rate limiting, for Raster Foundry requests
+
+A RetryPolicy decides which failures are worth retrying and how long to wait before
+each retry, and RetryingAdapter applies one to every request a requests.Session sends
+through it, after taking a token from a TokenBucket if it has one.
+
+Requests with idempotent methods are retried on any retriable status or connection
+failure. A POST may already have been acted on when its response is lost, so it's only
+retried when the API certainly didn't act on it: a 429 or 503 refusal, or a connection
+that was never made. A POST with an Idempotency-Key header is treated as idempotent.
+"""
+
+from email.utils import parsedate_to_datetime
+import random
+import threading
+import time
+from typing import Callable, Optional, TypeVar
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+T = TypeVar("T")
+
+# Statuses worth retrying, since the API didn't accept the request
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+# Statuses that mean the API refused the request without acting on it
+REFUSED_STATUSES = (429, 503)
+IDEMPOTENT_METHODS = ("GET", "HEAD", "OPTIONS", "PUT", "DELETE")
+IDEMPOTENCY_KEY_HEADER = "Idempotency-Key"
+
+
+def _retry_after(response: Optional[requests.Response]) -> Optional[float]:
+    """Read a Retry-After header, in either its seconds or its HTTP date form"""
+    value = response.headers.get("Retry-After") if response is not None else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _never_connected(error: Exception) -> bool:
+    """Whether a connection error happened before any of the request was sent"""
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    return isinstance(reason, NewConnectionError)
+
+
+class RetryPolicy(object):
+    def __init__(
+        self,
+        max_retries: int = 5,
+        backoff: float = 0.5,
+        max_backoff: float = 60.0,
+        statuses: tuple = RETRY_STATUSES,
+    ):
+        """Construct a new policy for retrying failed requests
+
+        Args:
+            max_retries (int): How many times to retry a request before giving up
+            backoff (float): The base number of seconds to wait, doubled with each retry
+            max_backoff (float): The most seconds to wait before any retry, including ones a Retry-After header asks for
+            statuses (tuple): The response statuses worth retrying
+        """
+
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.statuses = statuses
+
+    def delay(
+        self, attempt: int, response: Optional[requests.Response] = None
+    ) -> float:
+        """How long to wait after a failed attempt, honoring any Retry-After header
+
+        Without a Retry-After, the wait doubles with each attempt and is jittered by up
+        to as much again, so that concurrent workers don't retry in lockstep.
+        """
+
+        retry_after = _retry_after(response)
+        if retry_after is None:
+            retry_after = self.backoff * 2**attempt * (1 + random.random())
+        return min(retry_after, self.max_backoff)
+
+    def should_retry_status(self, status: int, idempotent: bool) -> bool:
+        if idempotent:
+            return status in self.statuses
+        return status in self.statuses and status in REFUSED_STATUSES
+
+    def should_retry_error(self, error: Exception, idempotent: bool) -> bool:
+        if isinstance(error, requests.HTTPError):
+            return error.response is not None and self.should_retry_status(
+                error.response.status_code, idempotent
+            )
+        if isinstance(error, (requests.ConnectionError, requests.Timeout)):
+            return idempotent or _never_connected(error)
+        return False
+
+    def call(self, fn: Callable[[], T], idempotent: bool = True) -> T:
+        """Call fn, retrying it on the failures this policy considers retriable"""
+        for attempt in range(self.max_retries + 1):
+            try:
+                return fn()
+            except (
+                requests.HTTPError,
+                requests.ConnectionError,
+                requests.Timeout,
+            ) as e:
+                if attempt == self.max_retries or not self.should_retry_error(
+                    e, idempotent
+                ):
+                    raise
+                time.sleep(self.delay(attempt, getattr(e, "response", None)))
+        raise AssertionError("unreachable")
+
+
+class TokenBucket(object):
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        """Construct a new token bucket, to cap how fast requests are made
+
+        Args:
+            rate (float): How many tokens are added per second
+            capacity (Optional[float]): The most tokens the bucket holds, so the largest burst allowed, defaulting to one second's worth
+        """
+
+        self.rate = rate
+        self.capacity = capacity or max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1.0):
+        """Take tokens from the bucket, waiting until there are enough"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.capacity, self._tokens + (now - self._updated) * self.rate
+            )
+            self._updated = now
+            # Take the tokens now, even if that overdraws the bucket, and wait out the
+            # debt, so waiting threads are served in the order they arrived
+            self._tokens -= tokens
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait:
+            time.sleep(wait)
+
+
+class RetryingAdapter(HTTPAdapter):
+    def __init__(
+        self,
+        retry_policy: Optional[RetryPolicy] = None,
+        rate_limiter: Optional[TokenBucket] = None,
+        **kwargs
+    ):
+        """Construct a transport adapter that rate limits and retries the requests it sends
+
+        Args:
+            retry_policy (Optional[RetryPolicy]): How to retry failed requests, defaulting to RetryPolicy()
+            rate_limiter (Optional[TokenBucket]): A bucket to take a token from before each attempt, if any
+            **kwargs: Passed on to HTTPAdapter, such as pool_maxsize
+        """
+
+        super().__init__(**kwargs)
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.rate_limiter = rate_limiter
+
+    def send(
+        self,
+        request: requests.PreparedRequest,
+        stream=False,
+        timeout=None,
+        verify=True,
+        cert=None,
+        proxies=None,
+    ) -> requests.Response:
+        policy = self.retry_policy
+        idempotent = (
+            request.method in IDEMPOTENT_METHODS
+            or IDEMPOTENCY_KEY_HEADER in request.headers
+        )
+        for attempt in range(policy.max_retries + 1):
+            if self.rate_limiter is not None:
+                self.rate_limiter.acquire()
+            try:
+                response = super().send(
+                    request,
+                    stream=stream,
+                    timeout=timeout,
+                    verify=verify,
+                    cert=cert,
+                    proxies=proxies,
+                )
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt == policy.max_retries or not policy.should_retry_error(
+                    e, idempotent
+                ):
+                    raise
+                time.sleep(policy.delay(attempt))
+                continue
+            if attempt == policy.max_retries or not policy.should_retry_status(
+                response.status_code, idempotent
+            ):
+                return response
+            wait = policy.delay(attempt, response)
+            response.close()
+            time.sleep(wait)
+        raise AssertionError("unreachable")
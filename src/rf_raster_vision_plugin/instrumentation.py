@@ -0,0 +1,258 @@
+"""Timing, byte, request and cache counters for the plugin's hot paths
+
+Instrumentation is off by default, and while it's off every recording function
+returns after checking a single flag. Turn it on with enable, or by setting the
+RF_RV_PLUGIN_METRICS environment variable, and read what was recorded with snapshot,
+or send it to sinks with flush.
+"""
+
+from bisect import bisect_left
+from functools import wraps
+import json
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+log = logging.getLogger(__name__)
+
+# Upper bounds, in seconds, of the latency histogram buckets
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+PROMETHEUS_PREFIX = "rf_raster_vision_plugin"
+
+_enabled = bool(os.environ.get("RF_RV_PLUGIN_METRICS"))
+_lock = threading.Lock()
+_histograms = {}  # type: Dict[str, List]
+_counters = {}  # type: Dict[str, float]
+_cache = {}  # type: Dict[str, List[int]]
+_sinks = []  # type: List[Sink]
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def enable(sinks: Optional[List["Sink"]] = None):
+    """Start recording, sending what's recorded to sinks whenever flush is called"""
+    global _enabled
+    _enabled = True
+    if sinks is not None:
+        _sinks[:] = sinks
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def reset():
+    """Forget everything recorded so far"""
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
+        _cache.clear()
+
+
+def observe(name: str, seconds: float):
+    """Record one call's latency in the histogram for name"""
+    if not _enabled:
+        return
+    with _lock:
+        histogram = _histograms.get(name)
+        if histogram is None:
+            # Per-bucket counts, with a last bucket for anything slower, then the sum
+            histogram = _histograms[name] = [0] * (len(LATENCY_BUCKETS) + 1) + [0.0]
+        histogram[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        histogram[-1] += seconds
+
+
+def count(name: str, amount: float = 1):
+    """Add to a counter, such as of requests made or bytes transferred"""
+    if not _enabled:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + amount
+
+
+def cache_access(name: str, hit: bool):
+    """Record a hit or miss for the cache called name"""
+    if not _enabled:
+        return
+    with _lock:
+        hits_misses = _cache.setdefault(name, [0, 0])
+        hits_misses[0 if hit else 1] += 1
+
+
+class _Timer(object):
+    __slots__ = ("name", "start")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        observe(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class _NoopTimer(object):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NOOP_TIMER = _NoopTimer()
+
+
+def timer(name: str):
+    """A context manager recording how long its block takes in the histogram for name"""
+    if not _enabled:
+        return _NOOP_TIMER
+    return _Timer(name)
+
+
+def timed(name: str) -> Callable:
+    """Decorate a function to record each call's latency in the histogram for name"""
+
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            with _Timer(name):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def snapshot() -> dict:
+    """Everything recorded so far, as plain data"""
+    with _lock:
+        histograms = {
+            name: {
+                "count": sum(histogram[:-1]),
+                "sum": histogram[-1],
+                "buckets": dict(
+                    zip(
+                        [str(bound) for bound in LATENCY_BUCKETS] + ["+Inf"],
+                        histogram[:-1],
+                    )
+                ),
+            }
+            for name, histogram in _histograms.items()
+        }
+        counters = dict(_counters)
+        caches = {
+            name: {
+                "hits": hits,
+                "misses": misses,
+                "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+            }
+            for name, (hits, misses) in _cache.items()
+        }
+    return {"latency": histograms, "counters": counters, "caches": caches}
+
+
+def _prometheus_name(name: str) -> str:
+    return "{}_{}".format(
+        PROMETHEUS_PREFIX,
+        "".join(char if char.isalnum() else "_" for char in name),
+    )
+
+
+def prometheus_text(metrics: Optional[dict] = None) -> str:
+    """Render a snapshot in the Prometheus text exposition format"""
+    metrics = metrics or snapshot()
+    lines = []
+    for name, histogram in sorted(metrics["latency"].items()):
+        metric = _prometheus_name(name) + "_seconds"
+        lines.append("# TYPE {} histogram".format(metric))
+        cumulative = 0
+        for bound, bucket_count in histogram["buckets"].items():
+            cumulative += bucket_count
+            lines.append('{}_bucket{{le="{}"}} {}'.format(metric, bound, cumulative))
+        lines.append("{}_sum {}".format(metric, histogram["sum"]))
+        lines.append("{}_count {}".format(metric, histogram["count"]))
+    for name, value in sorted(metrics["counters"].items()):
+        metric = _prometheus_name(name) + "_total"
+        lines.append("# TYPE {} counter".format(metric))
+        lines.append("{} {}".format(metric, value))
+    for name, cache in sorted(metrics["caches"].items()):
+        metric = _prometheus_name(name)
+        lines.append("# TYPE {}_hits_total counter".format(metric))
+        lines.append("{}_hits_total {}".format(metric, cache["hits"]))
+        lines.append("# TYPE {}_misses_total counter".format(metric))
+        lines.append("{}_misses_total {}".format(metric, cache["misses"]))
+    return "\n".join(lines) + "\n"
+
+
+class Sink(object):
+    """Somewhere to send snapshots when flush is called"""
+
+    def emit(self, metrics: dict):
+        raise NotImplementedError
+
+
+class LoggingSink(Sink):
+    def __init__(self, logger: logging.Logger = log, level: int = logging.INFO):
+        self.logger = logger
+        self.level = level
+
+    def emit(self, metrics: dict):
+        for name, histogram in sorted(metrics["latency"].items()):
+            self.logger.log(
+                self.level,
+                "%s: %d calls, %.3f s total",
+                name,
+                histogram["count"],
+                histogram["sum"],
+            )
+        for name, value in sorted(metrics["counters"].items()):
+            self.logger.log(self.level, "%s: %s", name, value)
+        for name, cache in sorted(metrics["caches"].items()):
+            self.logger.log(
+                self.level,
+                "%s: %d hits, %d misses",
+                name,
+                cache["hits"],
+                cache["misses"],
+            )
+
+
+class JsonSink(Sink):
+    def __init__(self, path: str):
+        """Write each snapshot to a JSON file, replacing the last one"""
+        self.path = path
+
+    def emit(self, metrics: dict):
+        with open(self.path + ".tmp", "w") as f:
+            json.dump(metrics, f, indent=2, sort_keys=True)
+        os.replace(self.path + ".tmp", self.path)
+
+
+class PrometheusSink(Sink):
+    def __init__(self, path: str):
+        """Write each snapshot to a file in the Prometheus text format, such as for the node exporter's textfile collector"""
+        self.path = path
+
+    def emit(self, metrics: dict):
+        with open(self.path + ".tmp", "w") as f:
+            f.write(prometheus_text(metrics))
+        os.replace(self.path + ".tmp", self.path)
+
+
+def flush():
+    """Send a snapshot of everything recorded so far to every sink"""
+    if not _sinks:
+        return
+    metrics = snapshot()
+    for sink in _sinks:
+        sink.emit(metrics)
@@ -0,0 +1,288 @@
+import io
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+
+class AnnotationArrays(object):
+    """Columnar storage for the annotations in a Raster Foundry annotation group
+
+    Each annotation's vertices live in one shared (m, 2) coords array of map
+    coordinates, and annotation i owns the rows offsets[i]:offsets[i + 1]. Labels are
+    stored once in a vocabulary of Raster Foundry label ids, which label_indices points
+    into, so that class ids can be derived for any class map without reparsing.
+
+    Like Raster Vision's own GeoJSON handling, each part of a MultiPolygon becomes its
+    own row, so one annotation id can appear more than once.
+
+    Every annotation's map coordinate bounds are kept in an (n, 4) bounds array of
+    (xmin, ymin, xmax, ymax). The rings themselves are optional: without them, coords
+    and offsets are None and each annotation is treated as its bounding box, which is
+    all object detection needs and a fraction of the memory.
+    """
+
+    def __init__(
+        self,
+        ids: np.ndarray,
+        labels: np.ndarray,
+        label_indices: np.ndarray,
+        scores: np.ndarray,
+        coords: Optional[np.ndarray] = None,
+        offsets: Optional[np.ndarray] = None,
+        bounds: Optional[np.ndarray] = None,
+    ):
+        self.ids = ids
+        self.labels = labels
+        self.label_indices = label_indices
+        self.scores = scores
+        self.coords = coords
+        self.offsets = offsets
+        if bounds is None:
+            if coords is None or offsets is None:
+                raise ValueError("Annotations need either their rings or their bounds")
+            bounds = _ring_bounds(coords, offsets)
+        self.bounds = bounds
+
+    @classmethod
+    def from_features(
+        cls, features: Iterable[dict], rings: bool = True
+    ) -> "AnnotationArrays":
+        """Build arrays from Raster Foundry's annotation GeoJSON features
+
+        Args:
+            features (Iterable[dict]): Annotation GeoJSON features, consumed once
+            rings (bool): Whether to keep every vertex, or only each annotation's bounds
+        """
+        ids = []
+        labels = {}  # type: dict
+        label_indices = []
+        scores = []
+        coords = []
+        offsets = [0]
+        for feature in features:
+            properties = feature["properties"]
+            annotation_id = feature.get("id") or properties.get("id") or ""
+            label_index = labels.setdefault(properties["label"], len(labels))
+            confidence = properties.get("confidence")
+            for ring in _exterior_rings(feature["geometry"]):
+                ids.append(annotation_id)
+                label_indices.append(label_index)
+                scores.append(1.0 if confidence is None else confidence)
+                coords.extend(ring)
+                offsets.append(offsets[-1] + len(ring))
+        arrays = cls(
+            np.array(ids, dtype=str),
+            np.array(list(labels), dtype=str),
+            np.array(label_indices, dtype=np.int32),
+            np.array(scores, dtype=float),
+            np.array(coords, dtype=float).reshape(-1, 2),
+            np.array(offsets, dtype=np.int64),
+        )
+        return arrays if rings else arrays.without_rings()
+
+    @property
+    def has_rings(self) -> bool:
+        return self.coords is not None
+
+    def without_rings(self) -> "AnnotationArrays":
+        """Drop every vertex, keeping only each annotation's bounds"""
+        return AnnotationArrays(
+            self.ids, self.labels, self.label_indices, self.scores, bounds=self.bounds
+        )
+
+    @classmethod
+    def concatenate(cls, parts: List["AnnotationArrays"]) -> "AnnotationArrays":
+        """Join several sets of annotations, merging their label vocabularies"""
+        if not parts:
+            return cls.from_features([])
+        labels = {}  # type: dict
+        label_indices = []
+        for part in parts:
+            vocabulary = np.array(
+                [labels.setdefault(label, len(labels)) for label in part.labels],
+                dtype=np.int32,
+            )
+            label_indices.append(vocabulary[part.label_indices])
+        rings = [
+            (part.coords, part.offsets)
+            for part in parts
+            if part.coords is not None and part.offsets is not None
+        ]
+        coords = offsets = None  # type: Optional[np.ndarray]
+        if len(rings) == len(parts):
+            coords = np.concatenate([ring_coords for ring_coords, _ in rings]).reshape(
+                -1, 2
+            )
+            ends = np.cumsum([len(ring_coords) for ring_coords, _ in rings])
+            offsets = np.concatenate(
+                [np.zeros(1, dtype=np.int64)]
+                + [
+                    ring_offsets[1:] + end - len(ring_coords)
+                    for (ring_coords, ring_offsets), end in zip(rings, ends)
+                ]
+            )
+        return cls(
+            np.concatenate([part.ids for part in parts]),
+            np.array(list(labels), dtype=str),
+            np.concatenate(label_indices).astype(np.int32),
+            np.concatenate([part.scores for part in parts]),
+            coords,
+            offsets,
+            np.concatenate([part.bounds for part in parts]).reshape(-1, 4),
+        )
+
+    def take(self, rows: np.ndarray) -> "AnnotationArrays":
+        """Select some rows, in the order given"""
+        rows = np.asarray(rows, dtype=np.int64)
+        if self.coords is None or self.offsets is None:
+            return AnnotationArrays(
+                self.ids[rows],
+                self.labels,
+                self.label_indices[rows],
+                self.scores[rows],
+                bounds=self.bounds[rows],
+            )
+        starts = self.offsets[:-1][rows]
+        lengths = self.offsets[1:][rows] - starts
+        offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        coord_rows = np.repeat(starts - offsets[:-1], lengths) + np.arange(offsets[-1])
+        return AnnotationArrays(
+            self.ids[rows],
+            self.labels,
+            self.label_indices[rows],
+            self.scores[rows],
+            self.coords[coord_rows],
+            offsets,
+            self.bounds[rows],
+        )
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def class_ids(self, class_map: dict) -> np.ndarray:
+        """Map each annotation's label to a Raster Vision class id"""
+        vocabulary = np.array([class_map[label] for label in self.labels], dtype=int)
+        return vocabulary[self.label_indices]
+
+    def to_npboxes(self, crs_transformer) -> np.ndarray:
+        """Find every annotation's bounding box in pixel coordinates
+
+        All vertices go through the CRS transformer's map_to_pixel in one call, and each
+        annotation's box is then reduced from its own slice of the result. Without
+        rings, the corners of each annotation's bounds stand in for its vertices.
+
+        Args:
+            crs_transformer (CRSTransformer): The transformer for the scene the boxes are in
+
+        Returns:
+            An (n, 4) array of (ymin, xmin, ymax, xmax) boxes
+        """
+
+        if not len(self):
+            return np.empty((0, 4))
+        if self.coords is not None and self.offsets is not None:
+            coords, starts = self.coords, self.offsets[:-1]
+        else:
+            coords, starts = _bounds_corners(self.bounds), np.arange(
+                0, 4 * len(self), 4
+            )
+        xs, ys = crs_transformer.map_to_pixel((coords[:, 0], coords[:, 1]))
+        xs = np.asarray(xs, dtype=float)
+        ys = np.asarray(ys, dtype=float)
+        return np.column_stack(
+            [
+                np.minimum.reduceat(ys, starts),
+                np.minimum.reduceat(xs, starts),
+                np.maximum.reduceat(ys, starts),
+                np.maximum.reduceat(xs, starts),
+            ]
+        )
+
+    def to_rv_geojson(self, class_map: dict) -> dict:
+        """Build the minimal map coordinate GeoJSON Raster Vision expects"""
+        return {
+            "features": [
+                {
+                    "geometry": {"type": "Polygon", "coordinates": [ring.tolist()]},
+                    "properties": {"class_id": int(class_id)},
+                }
+                for ring, class_id in zip(self._rings(), self.class_ids(class_map))
+            ]
+        }
+
+    def _rings(self) -> Iterator[np.ndarray]:
+        if self.coords is None or self.offsets is None:
+            corners = _bounds_corners(self.bounds).reshape(-1, 4, 2)
+            for box in corners:
+                yield np.concatenate([box, box[:1]])
+            return
+        for start, end in zip(self.offsets[:-1], self.offsets[1:]):
+            yield self.coords[start:end]
+
+    def to_bytes(self) -> bytes:
+        arrays = {
+            "ids": self.ids,
+            "labels": self.labels,
+            "label_indices": self.label_indices,
+            "scores": self.scores,
+            "bounds": self.bounds,
+        }  # type: Dict[str, Any]
+        if self.has_rings:
+            arrays.update(coords=self.coords, offsets=self.offsets)
+        buf = io.BytesIO()
+        np.savez(buf, **arrays)
+        return buf.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "AnnotationArrays":
+        with np.load(io.BytesIO(data)) as arrays:
+            return cls(
+                arrays["ids"],
+                arrays["labels"],
+                arrays["label_indices"],
+                arrays["scores"],
+                arrays["coords"] if "coords" in arrays else None,
+                arrays["offsets"] if "offsets" in arrays else None,
+                arrays["bounds"] if "bounds" in arrays else None,
+            )
+
+
+def _ring_bounds(coords: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+    """Reduce each ring's slice of coords to its (xmin, ymin, xmax, ymax) bounds"""
+    if not len(offsets) > 1:
+        return np.empty((0, 4))
+    starts = offsets[:-1]
+    return np.column_stack(
+        [
+            np.minimum.reduceat(coords[:, 0], starts),
+            np.minimum.reduceat(coords[:, 1], starts),
+            np.maximum.reduceat(coords[:, 0], starts),
+            np.maximum.reduceat(coords[:, 1], starts),
+        ]
+    )
+
+
+def _bounds_corners(bounds: np.ndarray) -> np.ndarray:
+    """List the four corners of each box in bounds, as a (4n, 2) array"""
+    xmin, ymin, xmax, ymax = bounds.T
+    return np.stack(
+        [
+            np.column_stack([xmin, ymin]),
+            np.column_stack([xmin, ymax]),
+            np.column_stack([xmax, ymax]),
+            np.column_stack([xmax, ymin]),
+        ],
+        axis=1,
+    ).reshape(-1, 2)
+
+
+def _exterior_rings(geometry: dict) -> list:
+    """List the exterior rings of a Polygon or each part of a MultiPolygon"""
+    if geometry["type"] == "Polygon":
+        return [geometry["coordinates"][0]]
+    if geometry["type"] == "MultiPolygon":
+        return [polygon[0] for polygon in geometry["coordinates"]]
+    raise ValueError(
+        "Unsupported annotation geometry type: {}".format(geometry["type"])
+    )
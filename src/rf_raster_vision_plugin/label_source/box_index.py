@@ -0,0 +1,79 @@
+from typing import Optional
+
+import numpy as np
+
+
+class BoxIndex(object):
+    """A packed index of axis-aligned boxes for fast window queries
+
+    Boxes are kept in Raster Vision's npbox order (ymin, xmin, ymax, xmax). A sorted
+    copy of the ymin column lets a query skip straight to the band of rows that could
+    reach the window, and only that band is tested for intersection.
+    """
+
+    def __init__(
+        self,
+        npboxes: np.ndarray,
+        class_ids: np.ndarray,
+        scores: Optional[np.ndarray] = None,
+    ):
+        """Construct a new BoxIndex
+
+        Args:
+            npboxes (np.ndarray): An nx4 float array of boxes in pixel coordinates
+            class_ids (np.ndarray): An array of n integer class ids
+            scores (Optional[np.ndarray]): An optional array of n scores, defaulting to 1
+        """
+
+        self.npboxes = np.asarray(npboxes, dtype=float).reshape(-1, 4)
+        self.class_ids = np.asarray(class_ids).reshape(-1)
+        self.scores = (
+            np.ones(len(self.npboxes))
+            if scores is None
+            else np.asarray(scores, dtype=float).reshape(-1)
+        )
+        self._order = np.argsort(self.npboxes[:, 0], kind="stable")
+        self._sorted_ymins = self.npboxes[self._order, 0]
+        self._max_height = (
+            float((self.npboxes[:, 2] - self.npboxes[:, 0]).max())
+            if len(self.npboxes)
+            else 0.0
+        )
+
+    @classmethod
+    def from_geojson(cls, geojson: dict) -> "BoxIndex":
+        """Build an index from Raster Vision's normalized pixel coordinate GeoJSON"""
+        from shapely.geometry import shape
+
+        features = geojson["features"]
+        npboxes = np.empty((len(features), 4))
+        class_ids = np.empty(len(features), dtype=int)
+        scores = np.empty(len(features))
+        for idx, feature in enumerate(features):
+            xmin, ymin, xmax, ymax = shape(feature["geometry"]).bounds
+            npboxes[idx] = (ymin, xmin, ymax, xmax)
+            class_ids[idx] = feature["properties"]["class_id"]
+            scores[idx] = feature["properties"].get("score", 1.0)
+        return cls(npboxes, class_ids, scores)
+
+    def __len__(self) -> int:
+        return len(self.npboxes)
+
+    def query(self, ymin: float, xmin: float, ymax: float, xmax: float) -> np.ndarray:
+        """Find the boxes that intersect a window
+
+        Returns:
+            The indices of the intersecting boxes, in the order they were indexed
+        """
+
+        lo = np.searchsorted(self._sorted_ymins, ymin - self._max_height, side="left")
+        hi = np.searchsorted(self._sorted_ymins, ymax, side="right")
+        candidates = self._order[lo:hi]
+        boxes = self.npboxes[candidates]
+        mask = (
+            (boxes[:, 0] <= ymax)
+            & (boxes[:, 2] >= ymin)
+            & (boxes[:, 1] <= xmax)
+            & (boxes[:, 3] >= xmin)
+        )
+        return np.sort(candidates[mask])
@@ -1,25 +1,18 @@
+from typing import Optional, Union
 from uuid import UUID
 
-from mypy.types import Optional
-import rastervision as rv
+import numpy as np
 from rastervision.core import Box
 from rastervision.data.crs_transformer import CRSTransformer
 from rastervision.data.label.object_detection_labels import ObjectDetectionLabels
 from rastervision.data.label_source import LabelSource
-from rastervision.data.vector_source.vector_source import transform_geojson
-from shapely.geometry import Polygon, shape
 
-import rf_raster_vision_plugin.http.raster_foundry as rf
-
-
-def _to_rv_feature(annotation: dict, class_map: dict) -> dict:
-    """Convert the geojson from Raster Foundry's API into the minimum dict required by Raster Vision
-    """
-
-    return {
-        "geometry": annotation["geometry"],
-        "properties": {"class_id": class_map[annotation["properties"]["label"]]},
-    }
+from rf_raster_vision_plugin import instrumentation
+from rf_raster_vision_plugin.cache.annotation_cache import AnnotationCache
+from rf_raster_vision_plugin.http.client import RfClient, get_client
+from rf_raster_vision_plugin.http.metadata import class_map
+from .annotation_arrays import AnnotationArrays
+from .box_index import BoxIndex
 
 
 class RfAnnotationGroupLabelSource(LabelSource):
@@ -31,6 +24,13 @@ class RfAnnotationGroupLabelSource(LabelSource):
         refresh_token: str,
         crs_transformer: CRSTransformer,
         rf_api_host: str = "app.staging.rasterfoundry.com",
+        client: Optional[RfClient] = None,
+        cache_dir: Optional[str] = None,
+        offline: bool = False,
+        project: Optional[dict] = None,
+        annotations: Optional[AnnotationArrays] = None,
+        extent: Optional[Box] = None,
+        fetch_tile_size: Optional[int] = None,
     ):
         """Construct a new LabelSource
 
@@ -40,49 +40,148 @@ class RfAnnotationGroupLabelSource(LabelSource):
             project_layer_id (UUID): A Raster Foundry project layer id in this project
             refresh_token (str): A Raster Foundry refresh token to use to obtain an auth token
             rf_api_host (str): The url host name to use for communicating with Raster Foundry
+            client (Optional[RfClient]): A client to share, defaulting to the process-wide client for this token and host
+            cache_dir (Optional[str]): A directory to cache annotation groups in between runs
+            offline (bool): Whether to read annotations only from cache_dir, never touching the network
+            project (Optional[dict]): The project's metadata, if it's already been fetched
+            annotations (Optional[AnnotationArrays]): The annotation group's annotations, if they've already been fetched
+            extent (Optional[Box]): The scene's extent, to fetch only the annotations intersecting it instead of the whole group
+            fetch_tile_size (Optional[int]): If set, fetch the extent's annotations in tiles of this many pixels, one request per tile
         """
 
-        self._token = ""
-        self._labels = None  # dict
+        self._project = project
+        self._annotations = annotations
         self.annotation_group = annotation_group
         self.project_id = project_id
         self.project_layer_id = project_layer_id
         self.crs_transformer = crs_transformer
         self.rf_api_host = rf_api_host
+        self._client = client or get_client(refresh_token, rf_api_host)
+        self._cache = AnnotationCache(cache_dir) if cache_dir else None
+        self._offline = offline
+        self._extent = extent
+        self._fetch_tile_size = fetch_tile_size
 
-        self._get_api_token(refresh_token)
-        self._set_labels()
+        with instrumentation.timer("label_source.fetch"):
+            self._set_labels()
         self._set_class_map()
-        self._set_rv_labels()
+        with instrumentation.timer("label_source.index"):
+            self._set_rv_labels()
+        assert self._annotations is not None
+        if self._annotations.has_rings:
+            self._annotations = self._annotations.without_rings()
 
     def _set_rv_labels(self, window=None) -> ObjectDetectionLabels:
-        self._rv_label_geojson = transform_geojson(
-            {
-                "features": [
-                    _to_rv_feature(feat, self._class_map)
-                    for feat in self._raw_labels["features"]
-                ]
-            },
-            self.crs_transformer,
+        assert self._annotations is not None
+        self._label_index = BoxIndex(
+            self._annotations.to_npboxes(self.crs_transformer),
+            self._annotations.class_ids(self._class_map),
         )
 
-    def _get_api_token(self, refresh_token: str):
-        self._token = rf.get_api_token(refresh_token, self.rf_api_host)
-
     def _set_labels(self):
-        self._raw_labels = rf.get_labels(
-            self._token,
-            self.rf_api_host,
-            self.project_id,
-            self.project_layer_id,
-            self.annotation_group,
-            None,
+        if self._project is not None and self._annotations is not None:
+            return
+        if self._annotations is None:
+            if self._extent is None:
+                windows = [None]
+            elif self._fetch_tile_size:
+                windows = [
+                    self._map_bbox(tile)
+                    for tile in self._extent.get_windows(
+                        self._fetch_tile_size, self._fetch_tile_size
+                    )
+                ]
+            else:
+                windows = [self._map_bbox(self._extent)]
+            self._annotations = self._fetch_windows(windows)
+        if self._project is None:
+            self._project = self._client.get_project(self.project_id)
+
+    def _map_bbox(self, box: Box) -> str:
+        """Format the map coordinate bounds of a pixel box as an API bbox filter
+
+        The box is padded by a pixel, since pixel_to_map maps pixel centers.
+        """
+
+        xs, ys = zip(
+            *(
+                self.crs_transformer.pixel_to_map((x, y))
+                for x in (box.xmin - 1, box.xmax + 1)
+                for y in (box.ymin - 1, box.ymax + 1)
+            )
+        )
+        return ",".join(str(coord) for coord in (min(xs), min(ys), max(xs), max(ys)))
+
+    def _fetch_window(self, window: Optional[str]) -> AnnotationArrays:
+        if self._cache is not None:
+            self._project, annotations = self._cache.sync(
+                self._client,
+                self.project_id,
+                self.project_layer_id,
+                self.annotation_group,
+                offline=self._offline,
+                window=window,
+            )
+            return annotations
+        return AnnotationArrays.from_features(
+            self._client.iter_labels(
+                self.project_id, self.project_layer_id, self.annotation_group, window
+            ),
+            rings=False,
         )
 
+    def _fetch_windows(self, windows: list) -> AnnotationArrays:
+        """Fetch the annotations in each window, keeping one copy of any that span several
+
+        Annotations are told apart by id, or by label and bounds if they have no id.
+        """
+
+        parts = []
+        seen = set()  # type: set
+        for window in windows:
+            part = self._fetch_window(window)
+            keys = [
+                annotation_id or (part.labels[label_index], tuple(bounds))
+                for annotation_id, label_index, bounds in zip(
+                    part.ids.tolist(),
+                    part.label_indices.tolist(),
+                    part.bounds.tolist(),
+                )
+            ]
+            new = [row for row, key in enumerate(keys) if key not in seen]
+            seen.update(keys)
+            parts.append(part if len(new) == len(part) else part.take(np.array(new)))
+        return parts[0] if len(parts) == 1 else AnnotationArrays.concatenate(parts)
+
     def _set_class_map(self):
-        project = rf.get_project(self._token, self.rf_api_host, self.project_id)
-        class_map = project["extras"]["annotate"]["labels"]
-        self._class_map = {item["id"]: idx + 1 for idx, item in enumerate(class_map)}
+        self._class_map = class_map(self._project)
+
+    def get_annotations(self) -> AnnotationArrays:
+        """The annotations without their rings, in the same order as get_labels() without a window"""
+        assert self._annotations is not None
+        return self._annotations
 
+    @instrumentation.timed("label_source.get_labels")
     def get_labels(self, window: Box = None):
-        return ObjectDetectionLabels.from_geojson(self._rv_label_geojson, window)
+        """Get the labels that overlap a window, or all labels if there is no window
+
+        Candidate boxes come from the spatial index built in _set_rv_labels, and are
+        then pruned and clipped the same way ObjectDetectionLabels.from_geojson does.
+        """
+
+        index = self._label_index
+        if window is None:
+            selected = slice(None)  # type: Union[slice, np.ndarray]
+        else:
+            selected = index.query(window.ymin, window.xmin, window.ymax, window.xmax)
+        npboxes = index.npboxes[selected]
+        if not len(npboxes):
+            return ObjectDetectionLabels.make_empty()
+        labels = ObjectDetectionLabels(
+            npboxes, index.class_ids[selected], scores=index.scores[selected]
+        )
+        if window is None:
+            return labels
+        return ObjectDetectionLabels.get_overlapping(
+            labels, window, ioa_thresh=0.8, clip=True
+        )
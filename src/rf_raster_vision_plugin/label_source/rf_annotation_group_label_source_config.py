@@ -0,0 +1,124 @@
+from copy import deepcopy
+from typing import Optional
+
+from google.protobuf import json_format
+import rastervision as rv
+from rastervision.data.label_source import LabelSourceConfig, LabelSourceConfigBuilder
+
+from ..plugin_config import RF_ANNOTATION_GROUP_LABEL_SOURCE, resolve_refresh_token
+
+
+class RfAnnotationGroupLabelSourceConfig(LabelSourceConfig):
+    def __init__(
+        self,
+        project_id: str,
+        project_layer_id: str,
+        annotation_group_id: str,
+        refresh_token: Optional[str] = None,
+        rf_api_host: str = "app.staging.rasterfoundry.com",
+    ):
+        super().__init__(source_type=RF_ANNOTATION_GROUP_LABEL_SOURCE)
+        self.project_id = project_id
+        self.project_layer_id = project_layer_id
+        self.annotation_group_id = annotation_group_id
+        self.refresh_token = refresh_token
+        self.rf_api_host = rf_api_host
+
+    def to_proto(self):
+        msg = super().to_proto()
+        custom_config = {
+            "project_id": str(self.project_id),
+            "project_layer_id": str(self.project_layer_id),
+            "annotation_group_id": str(self.annotation_group_id),
+            "rf_api_host": self.rf_api_host,
+        }
+        if self.refresh_token:
+            custom_config["refresh_token"] = self.refresh_token
+        msg.custom_config.update(custom_config)
+        return msg
+
+    def create_source(self, task_config, extent, crs_transformer, tmp_dir):
+        from ..http.client import get_client
+        from ..http.metadata import get_project, pop_annotations
+        from .rf_annotation_group_label_source import RfAnnotationGroupLabelSource
+
+        refresh_token = resolve_refresh_token(self.refresh_token)
+        client = get_client(refresh_token, self.rf_api_host)
+        return RfAnnotationGroupLabelSource(
+            self.annotation_group_id,
+            self.project_id,
+            self.project_layer_id,
+            refresh_token,
+            crs_transformer,
+            rf_api_host=self.rf_api_host,
+            client=client,
+            extent=extent,
+            project=get_project(client, self.project_id),
+            annotations=pop_annotations(
+                client, self.project_id, self.project_layer_id, self.annotation_group_id
+            ),
+        )
+
+    def report_io(self, command_type, io_def):
+        pass
+
+
+class RfAnnotationGroupLabelSourceConfigBuilder(LabelSourceConfigBuilder):
+    def __init__(self, prev=None):
+        config = {}
+        if prev:
+            config = {
+                "project_id": prev.project_id,
+                "project_layer_id": prev.project_layer_id,
+                "annotation_group_id": prev.annotation_group_id,
+                "refresh_token": prev.refresh_token,
+                "rf_api_host": prev.rf_api_host,
+            }
+        super().__init__(RfAnnotationGroupLabelSourceConfig, config)
+
+    def validate(self):
+        super().validate()
+        if not all(
+            self.config.get(key)
+            for key in ("project_id", "project_layer_id", "annotation_group_id")
+        ):
+            raise rv.ConfigError(
+                "You must specify an annotation group for the "
+                'RfAnnotationGroupLabelSourceConfig. Use "with_annotation_group".'
+            )
+
+    def from_proto(self, msg):
+        custom_config = json_format.MessageToDict(msg.custom_config)
+        return (
+            self.with_annotation_group(
+                custom_config["project_id"],
+                custom_config["project_layer_id"],
+                custom_config["annotation_group_id"],
+            )
+            .with_rf_api_host(custom_config["rf_api_host"])
+            .with_refresh_token(custom_config.get("refresh_token"))
+        )
+
+    def with_annotation_group(self, project_id, project_layer_id, annotation_group_id):
+        """Set the Raster Foundry annotation group to read labels from"""
+        b = deepcopy(self)
+        b.config["project_id"] = project_id
+        b.config["project_layer_id"] = project_layer_id
+        b.config["annotation_group_id"] = annotation_group_id
+        return b
+
+    def with_refresh_token(self, refresh_token):
+        """Set the Raster Foundry refresh token to authenticate with
+
+        Without one, the token is read from the RF_REFRESH_TOKEN environment variable
+        when the source is created.
+        """
+        b = deepcopy(self)
+        b.config["refresh_token"] = refresh_token
+        return b
+
+    def with_rf_api_host(self, rf_api_host):
+        """Set the Raster Foundry API host"""
+        b = deepcopy(self)
+        b.config["rf_api_host"] = rf_api_host
+        return b
@@ -0,0 +1,100 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import os
+import threading
+from typing import Callable, List, Optional
+
+import numpy as np
+
+
+class UploadProgress(object):
+    def __init__(self, path: str):
+        """Record which batches of one save have been posted
+
+        Each completed batch index is appended to the file at path as soon as its post
+        succeeds, so a save interrupted partway can be rerun without posting them again.
+
+        Args:
+            path (str): The file to record progress in
+        """
+
+        self.path = path
+        self._lock = threading.Lock()
+        self._done = set()
+        if os.path.exists(path):
+            with open(path) as f:
+                self._done = {int(line) for line in f if line.strip()}
+
+    @classmethod
+    def for_save(
+        cls,
+        progress_dir: str,
+        annotation_group: str,
+        batch_size: int,
+        arrays: List[np.ndarray],
+    ) -> "UploadProgress":
+        """Find the progress file for saving some label arrays to an annotation group"""
+        digest = hashlib.sha256(
+            "{}:{}".format(annotation_group, batch_size).encode("utf-8")
+        )
+        for array in arrays:
+            digest.update(np.ascontiguousarray(array).tobytes())
+        os.makedirs(progress_dir, exist_ok=True)
+        return cls(os.path.join(progress_dir, digest.hexdigest() + ".progress"))
+
+    def is_done(self, batch: int) -> bool:
+        return batch in self._done
+
+    def mark_done(self, batch: int):
+        with self._lock:
+            self._done.add(batch)
+            with open(self.path, "a") as f:
+                f.write("{}\n".format(batch))
+
+    def finish(self):
+        """Forget this save's progress once every batch is posted"""
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def upload_batches(
+    post_batch: Callable[[List[dict]], object],
+    make_batch: Callable[[int], List[dict]],
+    num_batches: int,
+    max_workers: int = 4,
+    progress: Optional[UploadProgress] = None,
+):
+    """Post batches of features concurrently, each on its own
+
+    Batches are only built when they're about to be posted, so at most max_workers
+    batches of features are held in memory at once. Batches aren't retried here, since
+    an RfClient's transport already retries each request, and only retries a POST when
+    the API certainly didn't create its annotations.
+
+    Args:
+        post_batch (Callable[[List[dict]], object]): A function posting one batch of features
+        make_batch (Callable[[int], List[dict]]): A function building the features of the batch at an index
+        num_batches (int): How many batches there are
+        max_workers (int): The maximum number of batches to post concurrently
+        progress (Optional[UploadProgress]): Where to record posted batches, and skip ones posted already
+    """
+
+    def upload(batch):
+        post_batch(make_batch(batch))
+        if progress is not None:
+            progress.mark_done(batch)
+
+    remaining = deque(
+        batch
+        for batch in range(num_batches)
+        if progress is None or not progress.is_done(batch)
+    )
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        pending = deque()  # type: deque
+        while remaining or pending:
+            while remaining and len(pending) < max_workers:
+                pending.append(pool.submit(upload, remaining.popleft()))
+            pending.popleft().result()
+    if progress is not None:
+        progress.finish()
@@ -0,0 +1,118 @@
+"""Vectorized box overlap and non-maximum suppression
+
+Boxes here are (n, 4) arrays of (xmin, ymin, xmax, ymax), in any one coordinate
+system. Finding which boxes overlap sorts them by xmin and sweeps, so it never builds
+an n by n matrix, and suppression then only visits boxes that overlap something.
+"""
+
+from typing import Optional, Tuple
+
+import numpy as np
+
+
+def area(boxes: np.ndarray) -> np.ndarray:
+    return np.clip(boxes[:, 2] - boxes[:, 0], 0, None) * np.clip(
+        boxes[:, 3] - boxes[:, 1], 0, None
+    )
+
+
+def iou(boxes: np.ndarray, others: np.ndarray) -> np.ndarray:
+    """The intersection over union of each box with the box in the same row of others"""
+    widths = np.minimum(boxes[:, 2], others[:, 2]) - np.maximum(
+        boxes[:, 0], others[:, 0]
+    )
+    heights = np.minimum(boxes[:, 3], others[:, 3]) - np.maximum(
+        boxes[:, 1], others[:, 1]
+    )
+    intersection = np.clip(widths, 0, None) * np.clip(heights, 0, None)
+    union = area(boxes) + area(others) - intersection
+    return np.divide(intersection, union, out=np.zeros(len(boxes)), where=union > 0)
+
+
+def overlapping_pairs(
+    boxes: np.ndarray, others: Optional[np.ndarray] = None
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Find every pair of intersecting boxes
+
+    Args:
+        boxes (np.ndarray): An (n, 4) array of boxes
+        others (Optional[np.ndarray]): An (m, 4) array of boxes to pair them with, or None to pair boxes with each other
+
+    Returns:
+        Row indices into boxes and into others (or boxes) of each intersecting pair.
+        Without others, each pair appears once, with the first index the smaller.
+    """
+
+    self_pairs = others is None
+    if others is None:
+        others = boxes
+    if not len(boxes) or not len(others):
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+    # Sort others by xmin. Every box that can reach a box's xmax starts at or before
+    # it, and is no further back than the widest box in others.
+    order = np.argsort(others[:, 0], kind="stable")
+    xmins = others[order, 0]
+    max_width = float((others[:, 2] - others[:, 0]).max())
+    starts = np.searchsorted(xmins, boxes[:, 0] - max_width, side="left")
+    ends = np.searchsorted(xmins, boxes[:, 2], side="right")
+    counts = ends - starts
+
+    rows = np.repeat(np.arange(len(boxes)), counts)
+    # Each row's candidates are its own run of positions, starts[row] up to ends[row]
+    run_starts = np.repeat(starts - np.cumsum(counts) + counts, counts)
+    candidates = order[run_starts + np.arange(len(rows))]
+
+    a, b = boxes[rows], others[candidates]
+    keep = (
+        (a[:, 0] <= b[:, 2])
+        & (b[:, 0] <= a[:, 2])
+        & (a[:, 1] <= b[:, 3])
+        & (b[:, 1] <= a[:, 3])
+    )
+    if self_pairs:
+        keep &= rows < candidates
+    return rows[keep], candidates[keep]
+
+
+def nms(
+    boxes: np.ndarray,
+    scores: np.ndarray,
+    class_ids: Optional[np.ndarray] = None,
+    iou_threshold: float = 0.5,
+) -> np.ndarray:
+    """Greedily keep the highest scoring boxes, dropping any that overlap a kept one
+
+    Args:
+        boxes (np.ndarray): An (n, 4) array of boxes
+        scores (np.ndarray): An array of n scores
+        class_ids (Optional[np.ndarray]): An array of n class ids, so only boxes of the same class suppress each other, or None for no classes
+        iou_threshold (float): The IoU above which the lower scoring box is dropped
+
+    Returns:
+        The sorted indices of the boxes kept
+    """
+
+    rows, others = overlapping_pairs(boxes)
+    duplicate = iou(boxes[rows], boxes[others]) > iou_threshold
+    if class_ids is not None:
+        duplicate &= class_ids[rows] == class_ids[others]
+    rows, others = rows[duplicate], others[duplicate]
+
+    # Point each pair from its higher scoring box to its lower scoring one, breaking
+    # ties by index, then group the pairs by their higher scoring box
+    rank = np.empty(len(boxes), dtype=np.int64)
+    rank[np.lexsort((np.arange(len(boxes)), -scores))] = np.arange(len(boxes))
+    swap = rank[others] < rank[rows]
+    winners = np.where(swap, others, rows)
+    losers = np.where(swap, rows, others)
+    order = np.argsort(rank[winners], kind="stable")
+    winners, losers = winners[order], losers[order]
+    bounds = np.searchsorted(rank[winners], np.arange(len(boxes) + 1))
+
+    suppressed = np.zeros(len(boxes), dtype=bool)
+    for position in np.unique(rank[winners]):
+        winner = winners[bounds[position]]
+        if not suppressed[winner]:
+            suppressed[losers[bounds[position] : bounds[position + 1]]] = True
+    return np.flatnonzero(~suppressed)
@@ -0,0 +1,158 @@
+"""Working out the fewest changes that turn an annotation group into new predictions
+
+Old and new boxes of the same class are paired by IoU, and only the differences are
+sent: new boxes without a pair are created, paired boxes that moved or changed score
+are updated in place, and old boxes without a pair are deleted.
+"""
+
+from typing import Tuple
+
+import numpy as np
+
+from .box_ops import iou, overlapping_pairs
+
+
+class LabelDiff(object):
+    def __init__(
+        self,
+        creates: np.ndarray,
+        update_rows: np.ndarray,
+        update_targets: np.ndarray,
+        deletes: np.ndarray,
+    ):
+        """The changes that sync new boxes to old ones
+
+        Args:
+            creates (np.ndarray): Rows of the new boxes to create
+            update_rows (np.ndarray): Rows of the new boxes to update old boxes with
+            update_targets (np.ndarray): Rows of the old boxes each of update_rows replaces
+            deletes (np.ndarray): Rows of the old boxes to delete
+        """
+
+        self.creates = creates
+        self.update_rows = update_rows
+        self.update_targets = update_targets
+        self.deletes = deletes
+
+
+def match_boxes(
+    boxes: np.ndarray,
+    classes: np.ndarray,
+    old_boxes: np.ndarray,
+    old_classes: np.ndarray,
+    iou_threshold: float = 0.5,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Pair boxes with old boxes of the same class, each with at most one other
+
+    Pairs are taken greedily from the highest IoU down. Candidate pairs involving a box
+    in no other candidate pair can't conflict, so they're taken all at once, and only
+    the rest are visited one at a time.
+
+    Args:
+        boxes (np.ndarray): An (n, 4) array of (xmin, ymin, xmax, ymax) boxes
+        classes (np.ndarray): The class of each box
+        old_boxes (np.ndarray): An (m, 4) array of boxes to pair them with
+        old_classes (np.ndarray): The class of each old box
+        iou_threshold (float): The IoU two boxes need to be paired
+
+    Returns:
+        Row indices into boxes and into old_boxes of each pair
+    """
+
+    rows, others = overlapping_pairs(boxes, old_boxes)
+    same_class = classes[rows] == old_classes[others]
+    rows, others = rows[same_class], others[same_class]
+    ious = iou(boxes[rows], old_boxes[others])
+    close = ious >= iou_threshold
+    rows, others, ious = rows[close], others[close], ious[close]
+
+    unique = (np.bincount(rows, minlength=len(boxes))[rows] == 1) & (
+        np.bincount(others, minlength=len(old_boxes))[others] == 1
+    )
+    matched_rows, matched_others = [rows[unique]], [others[unique]]
+    rows, others, ious = rows[~unique], others[~unique], ious[~unique]
+    row_taken = np.zeros(len(boxes), dtype=bool)
+    other_taken = np.zeros(len(old_boxes), dtype=bool)
+    for idx in np.argsort(-ious, kind="stable"):
+        row, other = rows[idx], others[idx]
+        if not row_taken[row] and not other_taken[other]:
+            row_taken[row] = other_taken[other] = True
+            matched_rows.append(rows[idx : idx + 1])
+            matched_others.append(others[idx : idx + 1])
+    return np.concatenate(matched_rows), np.concatenate(matched_others)
+
+
+def merge_parts(
+    ids: np.ndarray, boxes: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Merge the boxes of each annotation's polygons into one box per annotation
+
+    A MultiPolygon annotation has a box for each of its polygons, all with its id, but
+    it's created, updated and deleted as a whole, so it's diffed as the box around them.
+
+    Args:
+        ids (np.ndarray): The annotation id of each box
+        boxes (np.ndarray): An (n, 4) array of (xmin, ymin, xmax, ymax) boxes
+
+    Returns:
+        The unique ids, the first row of each, and an array of the box around each one's boxes
+    """
+
+    boxes = np.asarray(boxes, dtype=float).reshape(-1, 4)
+    unique_ids, first, inverse = np.unique(ids, return_index=True, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    merged = boxes[first].copy()
+    np.minimum.at(merged[:, :2], inverse, boxes[:, :2])
+    np.maximum.at(merged[:, 2:], inverse, boxes[:, 2:])
+    return unique_ids, first, merged
+
+
+def diff_labels(
+    boxes: np.ndarray,
+    classes: np.ndarray,
+    scores: np.ndarray,
+    old_boxes: np.ndarray,
+    old_classes: np.ndarray,
+    old_scores: np.ndarray,
+    iou_threshold: float = 0.5,
+    tolerance: float = 0.5,
+) -> LabelDiff:
+    """Find the creates, updates and deletes that turn old boxes into new ones
+
+    Args:
+        boxes (np.ndarray): An (n, 4) array of the new (xmin, ymin, xmax, ymax) boxes
+        classes (np.ndarray): The class of each new box
+        scores (np.ndarray): The score of each new box
+        old_boxes (np.ndarray): An (m, 4) array of the boxes there are now
+        old_classes (np.ndarray): The class of each old box
+        old_scores (np.ndarray): The score of each old box
+        iou_threshold (float): The IoU a new box needs with an old one to replace it, rather than being created beside it
+        tolerance (float): How far a paired box's coordinates can move without it being updated
+
+    Returns:
+        The changes, as a LabelDiff
+    """
+
+    boxes = np.asarray(boxes, dtype=float).reshape(-1, 4)
+    old_boxes = np.asarray(old_boxes, dtype=float).reshape(-1, 4)
+    rows, others = match_boxes(
+        boxes,
+        np.asarray(classes),
+        old_boxes,
+        np.asarray(old_classes),
+        iou_threshold,
+    )
+    changed = (np.abs(boxes[rows] - old_boxes[others]) > tolerance).any(axis=1) | (
+        ~np.isclose(np.asarray(scores)[rows], np.asarray(old_scores)[others])
+    )
+
+    created = np.ones(len(boxes), dtype=bool)
+    created[rows] = False
+    deleted = np.ones(len(old_boxes), dtype=bool)
+    deleted[others] = False
+    return LabelDiff(
+        np.flatnonzero(created),
+        rows[changed],
+        others[changed],
+        np.flatnonzero(deleted),
+    )
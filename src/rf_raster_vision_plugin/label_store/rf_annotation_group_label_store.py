@@ -1,13 +1,21 @@
+from concurrent.futures import ThreadPoolExecutor
+import os
+from tempfile import gettempdir
+from typing import Dict, List, Optional
+from uuid import UUID
+
+import numpy as np
 from rastervision.data.crs_transformer import CRSTransformer
 from rastervision.data.label.object_detection_labels import ObjectDetectionLabels
 from rastervision.data.label_store import LabelStore
 
-from mypy.types import Dict
-from uuid import UUID
-
-from ..http import raster_foundry as rf
-from ..http.converters import annotation_features_from_labels
+from .. import instrumentation
+from ..http.client import RfClient, get_client
+from ..http.converters import annotation_features_from_labels, map_boxes_from_labels
 from ..label_source.rf_annotation_group_label_source import RfAnnotationGroupLabelSource
+from .batch_upload import UploadProgress, upload_batches
+from .label_sync import diff_labels, merge_parts
+from .spool import LabelSpool
 
 
 class RfAnnotationGroupLabelStore(LabelStore):
@@ -20,7 +28,33 @@ class RfAnnotationGroupLabelStore(LabelStore):
         crs_transformer: CRSTransformer,
         class_map: Dict[int, str],
         rf_api_host: str = "app.staging.rasterfoundry.com",
+        client: Optional[RfClient] = None,
+        batch_size: int = 1000,
+        upload_workers: int = 4,
+        progress_dir: Optional[str] = None,
+        spool_dir: Optional[str] = None,
+        sync: bool = False,
+        sync_iou: float = 0.5,
     ):
+        """Construct a new LabelStore
+
+        Args:
+            annotation_group (UUID): The annotation group to store labels in
+            project_id (UUID): A Raster Foundry project id
+            project_layer_id (UUID): A Raster Foundry project layer id in this project
+            refresh_token (str): A Raster Foundry refresh token to use to obtain an auth token
+            crs_transformer (CRSTransformer): The transformer from the scene's pixel coordinates to map coordinates
+            class_map (Dict[int, str]): A mapping from Raster Vision class ids to Raster Foundry label ids
+            rf_api_host (str): The url host name to use for communicating with Raster Foundry
+            client (Optional[RfClient]): A client to share, defaulting to the process-wide client for this token and host
+            batch_size (int): How many annotations to post per request
+            upload_workers (int): How many batches to post concurrently
+            progress_dir (Optional[str]): Where to record which batches of an interrupted save were posted, defaulting to a temporary directory
+            spool_dir (Optional[str]): If set, save writes labels to a shard in this spool for upload_spool to post, instead of posting them
+            sync (bool): Whether save should change the annotation group to match the labels, instead of adding them to it
+            sync_iou (float): The IoU a saved box needs with an existing annotation of its label to update it rather than being created beside it
+        """
+
         self.annotation_group = annotation_group
         self.project_id = project_id
         self.project_layer_id = project_layer_id
@@ -28,13 +62,17 @@ class RfAnnotationGroupLabelStore(LabelStore):
         self.class_map = class_map
         self.rf_api_host = rf_api_host
         self._refresh_token = refresh_token
+        self._client = client or get_client(refresh_token, rf_api_host)
+        self.batch_size = batch_size
+        self.upload_workers = upload_workers
+        self.progress_dir = progress_dir or os.path.join(
+            gettempdir(), "rf_raster_vision_plugin", "uploads"
+        )
+        self.spool_dir = spool_dir
+        self.sync = sync
+        self.sync_iou = sync_iou
 
-        self._get_api_token(refresh_token)
-
-    def _get_api_token(self, refresh_token: str):
-        self._token = rf.get_api_token(refresh_token, self.rf_api_host)
-
-    def get_labels(self) -> ObjectDetectionLabels:
+    def _label_source(self) -> RfAnnotationGroupLabelSource:
         return RfAnnotationGroupLabelSource(
             self.annotation_group,
             self.project_id,
@@ -42,21 +80,142 @@ class RfAnnotationGroupLabelStore(LabelStore):
             self._refresh_token,
             self.crs_transformer,
             self.rf_api_host,
-        ).get_labels()
+            client=self._client,
+        )
+
+    def get_labels(self) -> ObjectDetectionLabels:
+        return self._label_source().get_labels()
 
     def empty_labels(self) -> ObjectDetectionLabels:
         return ObjectDetectionLabels.make_empty()
 
+    @instrumentation.timed("label_store.save")
     def save(self, labels: ObjectDetectionLabels) -> None:
-        rf.post_labels(
-            self._token,
-            self.rf_api_host,
-            self.project_id,
-            self.project_layer_id,
-            annotation_features_from_labels(
-                labels,
+        """Post labels to the annotation group in batches, spool them, or sync the group to them
+
+        If an earlier save of the same labels was interrupted, only the batches it
+        didn't finish are posted.
+        """
+
+        npboxes = labels.get_npboxes()
+        class_ids = labels.get_class_ids()
+        scores = labels.get_scores()
+        instrumentation.count("label_store.annotations_saved", len(npboxes))
+
+        if self.spool_dir is not None:
+            map_boxes = map_boxes_from_labels(labels, self.crs_transformer)
+            label_ids = [self.class_map[class_id] for class_id in class_ids.tolist()]
+            # Workers predicting the same pixel boxes in different scenes write
+            # different map boxes, so name the shard by those and the group
+            shard = LabelSpool.shard_name(
+                [
+                    np.array([str(self.annotation_group)]),
+                    map_boxes,
+                    np.array(label_ids, dtype=str),
+                    scores,
+                ]
+            )
+            LabelSpool(self.spool_dir).write(shard, map_boxes, label_ids, scores)
+            return
+        if self.sync:
+            self._sync(labels)
+            return
+
+        def make_batch(batch):
+            rows = slice(batch * self.batch_size, (batch + 1) * self.batch_size)
+            return annotation_features_from_labels(
+                ObjectDetectionLabels(npboxes[rows], class_ids[rows], scores[rows]),
+                self.crs_transformer,
+                self.annotation_group,
+                self.class_map,
+            )
+
+        upload_batches(
+            lambda features: self._client.post_labels(
+                self.project_id, self.project_layer_id, features
+            ),
+            make_batch,
+            -(-len(npboxes) // self.batch_size),
+            max_workers=self.upload_workers,
+            progress=UploadProgress.for_save(
+                self.progress_dir,
+                str(self.annotation_group),
+                self.batch_size,
+                [npboxes, class_ids, scores],
+            ),
+        )
+
+    def _sync(self, labels: ObjectDetectionLabels):
+        """Change the annotation group to match labels with the fewest requests
+
+        The group is loaded once, and each saved box is paired with the existing
+        annotation of its label it overlaps most, if their IoU is at least sync_iou.
+        Only unpaired boxes are posted, only pairs that moved or changed score are
+        updated, and only unpaired annotations are deleted. A MultiPolygon annotation
+        is paired as the box around its polygons. New annotations are posted
+        in batches, but each update and delete is its own request, which the client
+        retries as idempotent. Rerunning an interrupted sync finishes it, since it
+        diffs against what the group holds by then.
+        """
+
+        source = self._label_source()
+        existing = source.get_labels()
+        annotations = source.get_annotations()
+        npboxes = labels.get_npboxes()
+        class_ids = labels.get_class_ids()
+        scores = labels.get_scores()
+        annotation_ids, first, old_boxes = merge_parts(
+            annotations.ids, existing.get_npboxes()[:, [1, 0, 3, 2]]
+        )
+        # Saved boxes come back truncated to whole pixels, as pixel_to_map_array
+        # truncates them, so that's how to compare them with what the group holds
+        diff = diff_labels(
+            np.trunc(npboxes)[:, [1, 0, 3, 2]],
+            np.array([self.class_map[class_id] for class_id in class_ids.tolist()]),
+            scores,
+            old_boxes,
+            annotations.labels[annotations.label_indices[first]],
+            annotations.scores[first],
+            iou_threshold=self.sync_iou,
+        )
+        instrumentation.count("label_store.annotations_created", len(diff.creates))
+        instrumentation.count("label_store.annotations_updated", len(diff.update_rows))
+        instrumentation.count("label_store.annotations_deleted", len(diff.deletes))
+
+        def features(rows: np.ndarray) -> List[dict]:
+            return annotation_features_from_labels(
+                ObjectDetectionLabels(npboxes[rows], class_ids[rows], scores[rows]),
                 self.crs_transformer,
                 self.annotation_group,
-                {v: k for k, v in self.class_map.items()},
+                self.class_map,
+            )
+
+        upload_batches(
+            lambda batch: self._client.post_labels(
+                self.project_id, self.project_layer_id, batch
             ),
+            lambda batch: features(
+                diff.creates[batch * self.batch_size : (batch + 1) * self.batch_size]
+            ),
+            -(-len(diff.creates) // self.batch_size),
+            max_workers=self.upload_workers,
         )
+
+        def put(feature: dict):
+            self._client.put_label(self.project_id, self.project_layer_id, feature)
+
+        def delete(annotation_id: str):
+            self._client.delete_label(
+                self.project_id, self.project_layer_id, annotation_id
+            )
+
+        with ThreadPoolExecutor(max_workers=self.upload_workers) as pool:
+            # Features are built a batch at a time, but each one is sent on its own
+            for start in range(0, len(diff.update_rows), self.batch_size):
+                rows = slice(start, start + self.batch_size)
+                updates = features(diff.update_rows[rows])
+                targets = annotation_ids[diff.update_targets[rows]].tolist()
+                for feature, annotation_id in zip(updates, targets):
+                    feature["id"] = annotation_id
+                list(pool.map(put, updates))
+            list(pool.map(delete, annotation_ids[diff.deletes].tolist()))
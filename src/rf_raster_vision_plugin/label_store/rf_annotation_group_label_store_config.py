@@ -0,0 +1,158 @@
+from copy import deepcopy
+from typing import Optional
+
+from google.protobuf import json_format
+import rastervision as rv
+from rastervision.data.label_store import LabelStoreConfig, LabelStoreConfigBuilder
+
+from ..plugin_config import RF_ANNOTATION_GROUP_LABEL_STORE, resolve_refresh_token
+
+
+class RfAnnotationGroupLabelStoreConfig(LabelStoreConfig):
+    def __init__(
+        self,
+        project_id: str,
+        project_layer_id: str,
+        annotation_group_id: str,
+        refresh_token: Optional[str] = None,
+        rf_api_host: str = "app.staging.rasterfoundry.com",
+        spool_dir: Optional[str] = None,
+        sync: bool = False,
+    ):
+        super().__init__(store_type=RF_ANNOTATION_GROUP_LABEL_STORE)
+        self.project_id = project_id
+        self.project_layer_id = project_layer_id
+        self.annotation_group_id = annotation_group_id
+        self.refresh_token = refresh_token
+        self.rf_api_host = rf_api_host
+        self.spool_dir = spool_dir
+        self.sync = sync
+
+    def to_proto(self):
+        msg = super().to_proto()
+        custom_config = {
+            "project_id": str(self.project_id),
+            "project_layer_id": str(self.project_layer_id),
+            "annotation_group_id": str(self.annotation_group_id),
+            "rf_api_host": self.rf_api_host,
+            "sync": self.sync,
+        }
+        if self.refresh_token:
+            custom_config["refresh_token"] = self.refresh_token
+        if self.spool_dir:
+            custom_config["spool_dir"] = self.spool_dir
+        msg.custom_config.update(custom_config)
+        return msg
+
+    def for_prediction(self, label_uri):
+        return self
+
+    def create_store(self, task_config, extent, crs_transformer, tmp_dir):
+        from ..http.client import get_client
+        from ..http.metadata import class_map, get_project
+        from .rf_annotation_group_label_store import RfAnnotationGroupLabelStore
+
+        refresh_token = resolve_refresh_token(self.refresh_token)
+        client = get_client(refresh_token, self.rf_api_host)
+        project = get_project(client, self.project_id)
+        return RfAnnotationGroupLabelStore(
+            self.annotation_group_id,
+            self.project_id,
+            self.project_layer_id,
+            refresh_token,
+            crs_transformer,
+            {class_id: label_id for label_id, class_id in class_map(project).items()},
+            rf_api_host=self.rf_api_host,
+            client=client,
+            spool_dir=self.spool_dir,
+            sync=self.sync,
+        )
+
+    def report_io(self, command_type, io_def):
+        pass
+
+
+class RfAnnotationGroupLabelStoreConfigBuilder(LabelStoreConfigBuilder):
+    def __init__(self, prev=None):
+        config = {}
+        if prev:
+            config = {
+                "project_id": prev.project_id,
+                "project_layer_id": prev.project_layer_id,
+                "annotation_group_id": prev.annotation_group_id,
+                "refresh_token": prev.refresh_token,
+                "rf_api_host": prev.rf_api_host,
+                "spool_dir": prev.spool_dir,
+                "sync": prev.sync,
+            }
+        super().__init__(RfAnnotationGroupLabelStoreConfig, config)
+
+    def validate(self):
+        super().validate()
+        if not all(
+            self.config.get(key)
+            for key in ("project_id", "project_layer_id", "annotation_group_id")
+        ):
+            raise rv.ConfigError(
+                "You must specify an annotation group for the "
+                'RfAnnotationGroupLabelStoreConfig. Use "with_annotation_group".'
+            )
+
+    def from_proto(self, msg):
+        custom_config = json_format.MessageToDict(msg.custom_config)
+        return (
+            self.with_annotation_group(
+                custom_config["project_id"],
+                custom_config["project_layer_id"],
+                custom_config["annotation_group_id"],
+            )
+            .with_rf_api_host(custom_config["rf_api_host"])
+            .with_refresh_token(custom_config.get("refresh_token"))
+            .with_spool_dir(custom_config.get("spool_dir"))
+            .with_sync(custom_config.get("sync", False))
+        )
+
+    def with_annotation_group(self, project_id, project_layer_id, annotation_group_id):
+        """Set the Raster Foundry annotation group to save predictions to"""
+        b = deepcopy(self)
+        b.config["project_id"] = project_id
+        b.config["project_layer_id"] = project_layer_id
+        b.config["annotation_group_id"] = annotation_group_id
+        return b
+
+    def with_refresh_token(self, refresh_token):
+        """Set the Raster Foundry refresh token to authenticate with
+
+        Without one, the token is read from the RF_REFRESH_TOKEN environment variable
+        when the store is created.
+        """
+        b = deepcopy(self)
+        b.config["refresh_token"] = refresh_token
+        return b
+
+    def with_rf_api_host(self, rf_api_host):
+        """Set the Raster Foundry API host"""
+        b = deepcopy(self)
+        b.config["rf_api_host"] = rf_api_host
+        return b
+
+    def with_spool_dir(self, spool_dir):
+        """Spool predictions to a directory instead of posting them
+
+        Each scene's predictions are written to a shard there, for one process to
+        merge, deduplicate and post with rf_raster_vision_plugin.label_store.spool.upload_spool.
+        """
+        b = deepcopy(self)
+        b.config["spool_dir"] = spool_dir
+        return b
+
+    def with_sync(self, sync=True):
+        """Make saving change the annotation group to match the predictions
+
+        Instead of adding every prediction to the group, each save pairs predictions
+        with the group's existing annotations by IoU, and only creates, updates and
+        deletes what differs, so rerunning predict doesn't pile up duplicates.
+        """
+        b = deepcopy(self)
+        b.config["sync"] = sync
+        return b
@@ -0,0 +1,180 @@
+"""Spooling predictions to local files, to be merged and uploaded by one process
+
+When many workers predict scenes of one project in parallel, each worker's label store
+writes its predictions to a shard in a shared spool directory instead of posting them.
+One uploader then reads every shard, drops boxes duplicated where scenes or windows
+overlapped, and posts what's left, so the API sees a single, steady uploader.
+"""
+
+import hashlib
+import os
+from tempfile import gettempdir
+from typing import List, Optional
+from uuid import UUID
+
+import numpy as np
+
+from ..label_source.annotation_arrays import AnnotationArrays
+from .batch_upload import UploadProgress, upload_batches
+from .box_ops import nms
+
+SHARD_SUFFIX = ".npz"
+
+
+class LabelSpool(object):
+    def __init__(self, spool_dir: str):
+        """Construct a new spool of predictions in a directory
+
+        Each shard is a ringless AnnotationArrays, holding lng/lat boxes, label ids
+        and scores, in its own file.
+
+        Args:
+            spool_dir (str): The directory to keep shards in
+        """
+
+        self.spool_dir = spool_dir
+
+    @staticmethod
+    def shard_name(arrays: List[np.ndarray]) -> str:
+        """Name a shard by the hash of its contents, so saving it again replaces it"""
+        digest = hashlib.sha256()
+        for array in arrays:
+            digest.update(np.ascontiguousarray(array).tobytes())
+        return digest.hexdigest()
+
+    def write(
+        self,
+        shard: str,
+        map_boxes: np.ndarray,
+        label_ids: List[str],
+        scores: np.ndarray,
+    ) -> str:
+        """Write one worker's predictions to a shard
+
+        Args:
+            shard (str): The shard's name, unique among the workers writing to this spool
+            map_boxes (np.ndarray): An (n, 4) array of (xmin, ymin, xmax, ymax) lng/lat boxes
+            label_ids (List[str]): The Raster Foundry label id of each box
+            scores (np.ndarray): The score of each box
+
+        Returns:
+            The path of the shard
+        """
+
+        labels, label_indices = np.unique(
+            np.array(label_ids, dtype=str), return_inverse=True
+        )
+        arrays = AnnotationArrays(
+            np.full(len(map_boxes), "", dtype=str),
+            labels,
+            label_indices.astype(np.int32),
+            np.asarray(scores, dtype=float),
+            bounds=np.asarray(map_boxes, dtype=float).reshape(-1, 4),
+        )
+        os.makedirs(self.spool_dir, exist_ok=True)
+        path = os.path.join(self.spool_dir, shard + SHARD_SUFFIX)
+        with open(path + ".tmp", "wb") as f:
+            f.write(arrays.to_bytes())
+        os.replace(path + ".tmp", path)
+        return path
+
+    def shards(self) -> List[str]:
+        if not os.path.isdir(self.spool_dir):
+            return []
+        return sorted(
+            os.path.join(self.spool_dir, name)
+            for name in os.listdir(self.spool_dir)
+            if name.endswith(SHARD_SUFFIX)
+        )
+
+    def read(self, shards: List[str]) -> AnnotationArrays:
+        """Read shards' predictions into one set of annotations
+
+        Args:
+            shards (List[str]): The shards to read, as listed by shards
+        """
+
+        parts = []
+        for path in shards:
+            with open(path, "rb") as f:
+                parts.append(AnnotationArrays.from_bytes(f.read()))
+        return AnnotationArrays.concatenate(parts).without_rings()
+
+    def clear(self, shards: List[str]):
+        for path in shards:
+            os.remove(path)
+
+
+def upload_spool(
+    client,
+    project_id: UUID,
+    project_layer_id: UUID,
+    annotation_group: UUID,
+    spool_dir: str,
+    iou_threshold: float = 0.5,
+    batch_size: int = 1000,
+    max_workers: int = 4,
+    progress_dir: Optional[str] = None,
+) -> int:
+    """Merge every shard in a spool, drop duplicate boxes, and post the rest in batches
+
+    Boxes of the same label overlapping by more than iou_threshold are duplicates, and
+    only the highest scoring of them is posted. Shards are deleted once every batch is
+    posted, and an interrupted upload of the same shards resumes where it stopped.
+
+    Args:
+        client (RfClient): The client to post with
+        project_id (UUID): A Raster Foundry project id
+        project_layer_id (UUID): A Raster Foundry project layer id in this project
+        annotation_group (UUID): The annotation group to post predictions to
+        spool_dir (str): The spool workers wrote their predictions to
+        iou_threshold (float): The IoU above which two boxes of one label are duplicates
+        batch_size (int): How many annotations to post per request
+        max_workers (int): How many batches to post concurrently
+        progress_dir (Optional[str]): Where to record which batches were posted, defaulting to a temporary directory
+
+    Returns:
+        The number of annotations posted
+    """
+
+    from ..http.converters import annotation_features_from_boxes
+
+    spool = LabelSpool(spool_dir)
+    shards = spool.shards()
+    annotations = spool.read(shards)
+    annotations = annotations.take(
+        nms(
+            annotations.bounds,
+            annotations.scores,
+            annotations.label_indices,
+            iou_threshold,
+        )
+    )
+    boxes = annotations.bounds
+    label_ids = annotations.labels[annotations.label_indices]
+    scores = annotations.scores
+
+    def make_batch(batch):
+        rows = slice(batch * batch_size, (batch + 1) * batch_size)
+        return annotation_features_from_boxes(
+            boxes[rows],
+            label_ids[rows].tolist(),
+            scores[rows].tolist(),
+            annotation_group,
+        )
+
+    upload_batches(
+        lambda features: client.post_labels(project_id, project_layer_id, features),
+        make_batch,
+        -(-len(boxes) // batch_size),
+        max_workers=max_workers,
+        progress=UploadProgress.for_save(
+            progress_dir
+            or os.path.join(gettempdir(), "rf_raster_vision_plugin", "uploads"),
+            str(annotation_group),
+            batch_size,
+            [boxes, annotations.label_indices, scores],
+        ),
+    )
+    spool.clear(shards)
+    return len(boxes)
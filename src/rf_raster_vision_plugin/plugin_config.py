@@ -1,20 +1,67 @@
-import rastervision as rv
+import os
+from typing import Optional
 
 RF_LAYER_RASTER_SOURCE = "RF_LAYER_RASTER_SOURCE"
+RF_STACKED_LAYER_RASTER_SOURCE = "RF_STACKED_LAYER_RASTER_SOURCE"
 RF_ANNOTATION_GROUP_LABEL_SOURCE = "RF_ANNOTATION_GROUP_LABEL_SOURCE"
 RF_ANNOTATION_GROUP_LABEL_STORE = "RF_ANNOTATION_GROUP_LABEL_STORE"
 
+# Where configs without a refresh token of their own read one from
+REFRESH_TOKEN_ENV = "RF_REFRESH_TOKEN"
+
+
+def resolve_refresh_token(refresh_token: Optional[str]) -> str:
+    """Use a config's own refresh token, or the one in the environment"""
+    if refresh_token:
+        return refresh_token
+    if REFRESH_TOKEN_ENV not in os.environ:
+        import rastervision as rv
+
+        raise rv.ConfigError(
+            "No refresh token was configured, and {} is not set".format(
+                REFRESH_TOKEN_ENV
+            )
+        )
+    return os.environ[REFRESH_TOKEN_ENV]
+
 
 def register_plugin(plugin_registry):
-    # TODO
+    """Register the plugin's config builders, without importing the sources they build
+
+    Raster Vision is already loaded when it calls this, and the builders import the
+    sources, with their heavier dependencies, only when a source is created.
+    """
+
+    import rastervision as rv
+
+    from .label_source.rf_annotation_group_label_source_config import (
+        RfAnnotationGroupLabelSourceConfigBuilder,
+    )
+    from .label_store.rf_annotation_group_label_store_config import (
+        RfAnnotationGroupLabelStoreConfigBuilder,
+    )
+    from .raster_source.rf_layer_raster_source_config import (
+        RfLayerRasterSourceConfigBuilder,
+    )
+    from .raster_source.rf_stacked_layer_raster_source_config import (
+        RfStackedLayerRasterSourceConfigBuilder,
+    )
+
+    plugin_registry.register_config_builder(
+        rv.RASTER_SOURCE, RF_LAYER_RASTER_SOURCE, RfLayerRasterSourceConfigBuilder
+    )
     plugin_registry.register_config_builder(
-        rv.RASTER_SOURCE, RF_LAYER_RASTER_SOURCE, None
+        rv.RASTER_SOURCE,
+        RF_STACKED_LAYER_RASTER_SOURCE,
+        RfStackedLayerRasterSourceConfigBuilder,
     )
-    # TODO
     plugin_registry.register_config_builder(
-        rv.LABEL_SOURCE, RF_ANNOTATION_GROUP_LABEL_SOURCE, None
+        rv.LABEL_SOURCE,
+        RF_ANNOTATION_GROUP_LABEL_SOURCE,
+        RfAnnotationGroupLabelSourceConfigBuilder,
     )
-    # TODO
     plugin_registry.register_config_builder(
-        rv.LABEL_STORE, RF_ANNOTATION_GROUP_LABEL_STORE, None
+        rv.LABEL_STORE,
+        RF_ANNOTATION_GROUP_LABEL_STORE,
+        RfAnnotationGroupLabelStoreConfigBuilder,
     )
@@ -0,0 +1,105 @@
+from typing import List, Optional
+from uuid import UUID
+
+import rastervision as rv
+
+from .http.client import get_client
+from .http import metadata
+from .plugin_config import (
+    RF_ANNOTATION_GROUP_LABEL_SOURCE,
+    RF_ANNOTATION_GROUP_LABEL_STORE,
+    RF_LAYER_RASTER_SOURCE,
+    resolve_refresh_token,
+)
+
+
+def build_project_scenes(
+    project_id: UUID,
+    scenes: List[dict],
+    refresh_token: Optional[str] = None,
+    rf_api_host: str = "app.staging.rasterfoundry.com",
+    rf_tile_host: str = "tiles.staging.rasterfoundry.com",
+    num_channels: int = 3,
+    channel_order: Optional[List[int]] = None,
+    chip_backend: str = "rasterio",
+    max_concurrency: Optional[int] = None,
+) -> List[rv.SceneConfig]:
+    """Build scene configs for many layers and annotation groups of one Raster Foundry project
+
+    Every scene's metadata is fetched concurrently up front, with requests scenes
+    share, like the project itself, made once. The sources these scenes create in
+    this process then take their metadata from what was fetched instead of fetching
+    it again, and share one client and API token.
+
+    Args:
+        project_id (UUID): A Raster Foundry project id
+        scenes (List[dict]): One dict per scene, with a project_layer_id, and optionally an annotation_group_id to read labels from, a prediction_annotation_group_id to save predictions to, and an id for the scene
+        refresh_token (Optional[str]): A Raster Foundry refresh token, defaulting to the RF_REFRESH_TOKEN environment variable, which keeps it out of saved configs
+        rf_api_host (str): The url host name to use for communicating with Raster Foundry
+        rf_tile_host (str): The url host name to use for communicating with the Raster Foundry tile server
+        num_channels (int): How many bands the layers' imagery has
+        channel_order (Optional[List[int]]): The order in which to return bands
+        chip_backend (str): Where to read chips from, either "rasterio" or "tiles"
+        max_concurrency (Optional[int]): The most metadata requests to run at once, defaulting to how many connections the client keeps to each host
+
+    Returns:
+        A scene config for each scene, in order
+    """
+
+    client = get_client(resolve_refresh_token(refresh_token), rf_api_host)
+    metadata.prefetch(
+        client,
+        [
+            {
+                "project_id": project_id,
+                "project_layer_id": scene["project_layer_id"],
+                "annotation_group_id": scene.get("annotation_group_id"),
+            }
+            for scene in scenes
+        ],
+        max_concurrency=max_concurrency,
+    )
+
+    scene_configs = []
+    for scene in scenes:
+        layer_id = scene["project_layer_id"]
+        group_id = scene.get("annotation_group_id")
+        raster_source = (
+            rv.RasterSourceConfig.builder(RF_LAYER_RASTER_SOURCE)
+            .with_project_layer(project_id, layer_id)
+            .with_source_annotation_group(group_id)
+            .with_num_channels(num_channels)
+            .with_channel_order(channel_order)
+            .with_refresh_token(refresh_token)
+            .with_rf_hosts(rf_api_host, rf_tile_host)
+            .with_chip_backend(chip_backend)
+            .build()
+        )
+        builder = (
+            rv.SceneConfig.builder()
+            .with_id(
+                scene.get("id")
+                or "-".join(str(part) for part in (layer_id, group_id) if part)
+            )
+            .with_raster_source(raster_source)
+        )
+        if group_id:
+            builder = builder.with_label_source(
+                rv.LabelSourceConfig.builder(RF_ANNOTATION_GROUP_LABEL_SOURCE)
+                .with_annotation_group(project_id, layer_id, group_id)
+                .with_refresh_token(refresh_token)
+                .with_rf_api_host(rf_api_host)
+                .build()
+            )
+        if scene.get("prediction_annotation_group_id"):
+            builder = builder.with_label_store(
+                rv.LabelStoreConfig.builder(RF_ANNOTATION_GROUP_LABEL_STORE)
+                .with_annotation_group(
+                    project_id, layer_id, scene["prediction_annotation_group_id"]
+                )
+                .with_refresh_token(refresh_token)
+                .with_rf_api_host(rf_api_host)
+                .build()
+            )
+        scene_configs.append(builder.build())
+    return scene_configs
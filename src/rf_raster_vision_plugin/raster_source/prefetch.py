@@ -0,0 +1,121 @@
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+from typing import Callable, Iterable, Tuple
+
+import numpy as np
+
+from .. import instrumentation
+
+# A window as (ymin, xmin, ymax, xmax) pixel coordinates
+WindowKey = Tuple[int, int, int, int]
+
+
+class ChipPrefetcher(object):
+    def __init__(
+        self,
+        read_chip: Callable[[WindowKey], np.ndarray],
+        windows: Iterable[WindowKey],
+        max_workers: int = 4,
+        queue_size: int = 8,
+    ):
+        """Read chips for a known sequence of windows ahead of when they're asked for
+
+        Up to queue_size upcoming windows are read in the background at any time, so
+        reading one chip overlaps with the consumer working on the ones before it. A
+        window that's asked for but was never queued, or was already dropped, is read
+        synchronously instead. Asking for a window drops every queued window before it,
+        since the consumer has moved past them.
+
+        Args:
+            read_chip (Callable[[WindowKey], np.ndarray]): A function reading the chip for a window
+            windows (Iterable[WindowKey]): The windows the consumer will ask for, in order
+            max_workers (int): How many chips to read concurrently
+            queue_size (int): The most chips to hold read or being read at once
+        """
+
+        self.read_chip = read_chip
+        self.queue_size = queue_size
+        self._windows = iter(windows)
+        self._queue = OrderedDict()  # type: OrderedDict
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers)
+        self._closed = False
+
+        self.hits = 0
+        self.misses = 0
+        self.stalls = 0
+        self.stall_seconds = 0.0
+        self.max_queue_depth = 0
+        self._fill()
+
+    def _fill(self):
+        while not self._closed and len(self._queue) < self.queue_size:
+            window = next(self._windows, None)
+            if window is None:
+                return
+            window = tuple(int(coord) for coord in window)
+            if window not in self._queue:
+                self._queue[window] = self._pool.submit(self.read_chip, window)
+
+    def queue_depth(self) -> int:
+        """How many queued chips have finished reading and are waiting to be asked for"""
+        with self._lock:
+            return sum(1 for future in self._queue.values() if future.done())
+
+    def get(self, window: WindowKey) -> np.ndarray:
+        """Get the chip for a window, waiting for its read if it's queued"""
+        ymin, xmin, ymax, xmax = window
+        window = (int(ymin), int(xmin), int(ymax), int(xmax))
+        with self._lock:
+            future = self._queue.get(window)
+            if future is None:
+                self.misses += 1
+            else:
+                depth = sum(1 for queued in self._queue.values() if queued.done())
+                self.max_queue_depth = max(self.max_queue_depth, depth)
+                while True:
+                    skipped, skipped_future = self._queue.popitem(last=False)
+                    if skipped == window:
+                        break
+                    skipped_future.cancel()
+                self._fill()
+
+        ready = future is not None and future.done()
+        instrumentation.cache_access("prefetch", ready)
+        if future is None:
+            return self.read_chip(window)
+        if ready:
+            self.hits += 1
+            return future.result()
+        self.stalls += 1
+        start = time.perf_counter()
+        chip = future.result()
+        self.stall_seconds += time.perf_counter() - start
+        return chip
+
+    def stats(self) -> dict:
+        """Report how well reads have kept ahead of the consumer
+
+        Hits are chips that were ready when asked for, stalls are queued chips the
+        consumer had to wait on, and misses are windows that were never queued.
+        """
+
+        return {
+            "hits": self.hits,
+            "stalls": self.stalls,
+            "misses": self.misses,
+            "stall_seconds": self.stall_seconds,
+            "queue_depth": self.queue_depth(),
+            "max_queue_depth": self.max_queue_depth,
+        }
+
+    def close(self):
+        """Stop queueing windows and drop any chips not asked for yet"""
+        with self._lock:
+            self._closed = True
+            for future in self._queue.values():
+                future.cancel()
+            self._queue.clear()
+        self._pool.shutdown(wait=False)
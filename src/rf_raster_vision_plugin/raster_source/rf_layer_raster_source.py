@@ -1,20 +1,25 @@
-from tempfile import gettempdir
+from typing import List, Optional, Tuple
 from uuid import UUID
 
-from mypy.types import List, Optional, Tuple
 import numpy as np
 import rasterio
-from rasterio.io import MemoryFile
-from rasterio.transform import xy
+from rasterio.warp import Resampling, reproject, transform_bounds
 import rastervision as rv
 from rastervision.core import Box
 from rastervision.data.crs_transformer import CRSTransformer, RasterioCRSTransformer
-from rastervision.data.raster_source.rasterio_source import RasterioSource
-import requests
-from shapely.geometry import shape
-from shapely.ops import cascaded_union
 
-from rf_raster_vision_plugin.http.raster_foundry import get_api_token
+from rf_raster_vision_plugin import instrumentation
+from rf_raster_vision_plugin.cache.chip_cache import (
+    DEFAULT_MAX_BYTES,
+    ChipCache,
+    scene_set_hash,
+)
+from rf_raster_vision_plugin.http.client import RfClient, get_client
+from .prefetch import ChipPrefetcher
+from .scene_mosaic import LayerGrid, SceneMosaic, prepare_scenes
+from .tiles import TileFetcher, zoom_for_resolution
+
+CHIP_BACKENDS = ("rasterio", "tiles")
 
 
 class RfLayerRasterSource(rv.data.RasterSource):
@@ -28,6 +33,17 @@ class RfLayerRasterSource(rv.data.RasterSource):
         num_channels: int,
         rf_api_host: str = "app.staging.rasterfoundry.com",
         rf_tile_host: str = "tiles.staging.rasterfoundry.com",
+        client: Optional[RfClient] = None,
+        chip_backend: str = "rasterio",
+        tile_cache_size: int = 512,
+        tile_workers: int = 8,
+        max_open_scenes: int = 16,
+        chip_cache_dir: Optional[str] = None,
+        chip_cache_bytes: int = DEFAULT_MAX_BYTES,
+        rf_scenes: Optional[List[dict]] = None,
+        raster_transformers: Optional[list] = None,
+        resolution: Optional[float] = None,
+        zoom: Optional[int] = None,
     ):
         """Construct a new RasterSource
 
@@ -40,68 +56,212 @@ class RfLayerRasterSource(rv.data.RasterSource):
             num_channels (int): How many bands this raster source expects to have
             rf_api_host (str): The url host name to use for communicating with Raster Foundry
             rf_tile_host (str): The url host name to use for communicating with the Raster Foundry tile server
+            client (Optional[RfClient]): A client to share, defaulting to the process-wide client for this token and host
+            chip_backend (str): Where to read chips from, either "rasterio" to read the scenes' ingested imagery or "tiles" to mosaic tiles from rf_tile_host
+            tile_cache_size (int): How many decoded tiles the "tiles" backend keeps in its LRU cache
+            tile_workers (int): How many tiles the "tiles" backend fetches concurrently
+            max_open_scenes (int): How many scene datasets the "rasterio" backend keeps open per reading thread
+            chip_cache_dir (Optional[str]): A directory to cache chips in between runs
+            chip_cache_bytes (int): The most bytes of chips to keep in chip_cache_dir
+            rf_scenes (Optional[List[dict]]): The layer's Raster Foundry scenes, if they've already been fetched
+            raster_transformers (Optional[list]): RasterTransformers to apply to each chip
+            resolution (Optional[float]): The size in meters of this source's pixels, to read coarser than the scenes' native resolution from their overviews
+            zoom (Optional[int]): A tile zoom level whose pixels this source should use, instead of a resolution
         """
 
-        self._token = None  # Optional[str]
-        self._crs_transformer = None  # Optional[str]
-        self.rf_scenes = None  # Optional[dict]
-        self.channel_order = channel_order
+        if chip_backend not in CHIP_BACKENDS:
+            raise ValueError(
+                "chip_backend must be one of {}, not {}".format(
+                    CHIP_BACKENDS, chip_backend
+                )
+            )
+        if resolution is not None and zoom is not None:
+            raise ValueError("Only one of resolution and zoom can be set")
+
+        super().__init__(channel_order, num_channels, raster_transformers or [])
+        self.chip_backend = chip_backend
         self.project_id = project_id
         self.project_layer_id = project_layer_id
         self.rf_api_host = rf_api_host
         self.rf_tile_host = rf_tile_host
-        self._get_api_token(refresh_token)
-
-        self.rf_scenes = self.get_rf_scenes()
-        self._rasterio_source = RasterioSource(
-            [
-                x["ingestLocation"]
-                for x in self.rf_scenes
-                if x["statusFields"]["ingestStatus"] == "INGESTED"
-            ],
-            [],
-            gettempdir(),
-            channel_order=self.channel_order,
+        self.resolution = resolution
+        self.zoom = zoom
+        self._client = client or get_client(refresh_token, rf_api_host)
+
+        self.rf_scenes = rf_scenes if rf_scenes is not None else self.get_rf_scenes()
+        scenes = prepare_scenes(self.rf_scenes)
+        if not scenes:
+            raise ValueError(
+                "Project layer {} has no ingested scenes".format(project_layer_id)
+            )
+        self._grid = LayerGrid.from_scenes(scenes, resolution=resolution, zoom=zoom)
+        self._crs_transformer = RasterioCRSTransformer(
+            self._grid.transform, self._grid.crs
+        )
+        self._scene_mosaic = SceneMosaic(
+            scenes, self._grid, num_channels, max_open_scenes=max_open_scenes
         )
-        self._rasterio_source._activate()
 
-    def _get_api_token(self, refresh_token):
-        """Use the refresh token on this raster source to obtain a bearer token"""
-        self._token = get_api_token(refresh_token, self.rf_api_host)
+        self._chip_cache = None  # type: Optional[ChipCache]
+        if chip_cache_dir is not None:
+            self._chip_cache = ChipCache(chip_cache_dir, max_bytes=chip_cache_bytes)
+            # Chips read from the other backend or at another resolution won't match
+            # these, so keep them apart
+            self._chip_cache_layer = "{}:{}".format(project_layer_id, chip_backend)
+            if resolution is not None or zoom is not None:
+                self._chip_cache_layer += ":{}".format(self._grid.transform.a)
+            self._chip_cache_scenes = scene_set_hash(scenes)
+            self._chip_cache.invalidate(self._chip_cache_layer, self._chip_cache_scenes)
+
+        self._prefetcher = None  # type: Optional[ChipPrefetcher]
+        self._tile_fetcher = None  # type: Optional[TileFetcher]
+        if chip_backend == "tiles":
+            self._tile_fetcher = TileFetcher(
+                lambda z, x, y: self._client.get_tile(
+                    self.rf_tile_host, self.project_id, self.project_layer_id, z, x, y
+                ),
+                num_channels,
+                max_workers=tile_workers,
+                cache_size=tile_cache_size,
+            )
 
     def get_rf_scenes(self):
         """Fetch all Raster Foundry scene metadata for this project layer"""
-        scenes_url = "https://{api_host}/api/projects/{project_id}/layers/{layer_id}/scenes".format(
-            api_host=self.rf_api_host,
-            project_id=self.project_id,
-            layer_id=self.project_layer_id,
+        return self._client.get_scenes(self.project_id, self.project_layer_id)
+
+    def prefetch(
+        self, windows: List[Box], max_workers: int = 4, queue_size: int = 8
+    ) -> ChipPrefetcher:
+        """Start reading chips for the windows a run will ask for, ahead of time
+
+        Later calls to get_chip for these windows, in this order, are served from the
+        chips read in the background. Windows that weren't prefetched are still read
+        synchronously.
+
+        Args:
+            windows (List[Box]): The windows get_chip will be called with, in order, such as from Box.get_windows
+            max_workers (int): How many chips to read concurrently
+            queue_size (int): The most chips to hold read or being read at once
+
+        Returns:
+            The prefetcher, whose stats report hits, stalls and queue depth
+        """
+
+        self.stop_prefetch()
+        keys = (self._window_key(window) for window in windows)
+        if self._chip_cache is not None:
+            keys = (key for key in keys if not self._chip_cache_contains(key))
+        self._prefetcher = ChipPrefetcher(
+            self._read_chip,
+            keys,
+            max_workers=max_workers,
+            queue_size=queue_size,
+        )
+        return self._prefetcher
+
+    def stop_prefetch(self):
+        """Stop prefetching and drop any chips that haven't been asked for"""
+        if self._prefetcher is not None:
+            self._prefetcher.close()
+        self._prefetcher = None
+
+    @staticmethod
+    def _window_key(window: Box) -> Tuple[int, int, int, int]:
+        return (int(window.ymin), int(window.xmin), int(window.ymax), int(window.xmax))
+
+    def _chip_cache_contains(self, key: Tuple[int, int, int, int]) -> bool:
+        assert self._chip_cache is not None
+        return self._chip_cache.contains(
+            self._chip_cache_layer, self._chip_cache_scenes, key, self.channel_order
+        )
+
+    def get_chip(self, window: Box) -> np.ndarray:
+        """Get a chip with channel_order and any raster transformers applied
+
+        With a chip cache, the chip is read from or saved to the cache after its
+        channels are selected and before it's transformed.
+        """
+
+        if self._chip_cache is None:
+            return super().get_chip(window)
+
+        key = self._window_key(window)
+        cache_key = (
+            self._chip_cache_layer,
+            self._chip_cache_scenes,
+            key,
+            self.channel_order,
         )
-        scenes_resp = requests.get(
-            scenes_url, headers={"Authorization": "Bearer " + self._token}
-        ).json()
-        scenes = scenes_resp["results"]
-        page = 1
-        while scenes_resp["hasNext"]:
-            scenes_resp = requests.get(
-                scenes_url,
-                headers={"Authorization": "Bearer " + self._token},
-                params={"page": page},
-            ).json()
-            scenes.append(next_resp["results"])
-            page += 1
-        return scenes
+        chip = self._chip_cache.get(*cache_key)
+        instrumentation.cache_access("chip_cache", chip is not None)
+        if chip is None:
+            chip = self._get_chip(window)
+            if self.channel_order:
+                chip = chip[:, :, self.channel_order]
+            chip = self._chip_cache.put(*cache_key, chip)
+        for transformer in self.raster_transformers:
+            chip = transformer.transform(chip, self.channel_order)
+        return chip
 
+    @instrumentation.timed("raster_source.get_chip")
     def _get_chip(self, window: Box):
         """Get a chip from a window (in pixel coordinates) for this raster source"""
-        return self._rasterio_source._get_chip(window)
+        key = self._window_key(window)
+        if self._prefetcher is not None:
+            return self._prefetcher.get(key)
+        return self._read_chip(key)
+
+    def _read_chip(self, window: Tuple[int, int, int, int]) -> np.ndarray:
+        if self._tile_fetcher is not None:
+            return self._get_tile_chip(Box(*window))
+        return self._scene_mosaic.read(*window)
+
+    def _get_tile_chip(self, window: Box) -> np.ndarray:
+        """Mosaic the web mercator tiles covering a window and warp them onto this source's pixel grid"""
+        assert self._tile_fetcher is not None
+        crs_transformer = self.get_crs_transformer()
+        image_crs = crs_transformer.get_image_crs()
+        window_transform = (
+            crs_transformer.get_affine_transform()
+            * rasterio.Affine.translation(window.xmin, window.ymin)
+        )
+        height, width = window.get_height(), window.get_width()
+        left, top = window_transform * (0, 0)
+        right, bottom = window_transform * (width, height)
+        bounds = transform_bounds(
+            image_crs,
+            "EPSG:3857",
+            min(left, right),
+            min(top, bottom),
+            max(left, right),
+            max(top, bottom),
+        )
+        zoom = self.zoom
+        if zoom is None:
+            zoom = zoom_for_resolution((bounds[2] - bounds[0]) / width)
+        mosaic, mosaic_transform = self._tile_fetcher.get_mosaic(bounds, zoom)
+
+        chip = np.zeros((mosaic.shape[2], height, width), dtype=mosaic.dtype)
+        reproject(
+            np.transpose(mosaic, axes=[2, 0, 1]),
+            chip,
+            src_transform=rasterio.Affine(*mosaic_transform),
+            src_crs="EPSG:3857",
+            dst_transform=window_transform,
+            dst_crs=image_crs,
+            resampling=Resampling.bilinear,
+        )
+        return np.transpose(chip, axes=[1, 2, 0])
 
     def get_extent(self):
         """Calculate the bounding box in pixels of this raster source"""
-        return self._rasterio_source.get_extent()
+        return Box(0, 0, self._grid.height, self._grid.width)
 
     def get_dtype(self) -> np.dtype:
         """Determine the highest density datatype in this raster source"""
-        return self._rasterio_source.get_dtype()
+        if self._tile_fetcher is not None:
+            return np.dtype(self._tile_fetcher.dtype)
+        return self._scene_mosaic.dtype
 
     def get_crs_transformer(self) -> CRSTransformer:
-        return self._rasterio_source.get_crs_transformer()
+        return self._crs_transformer
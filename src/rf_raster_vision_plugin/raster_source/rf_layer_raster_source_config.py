@@ -0,0 +1,204 @@
+from copy import deepcopy
+from typing import List, Optional
+
+from google.protobuf import json_format
+import rastervision as rv
+from rastervision.data.raster_source.raster_source_config import (
+    RasterSourceConfig,
+    RasterSourceConfigBuilder,
+)
+
+from ..plugin_config import RF_LAYER_RASTER_SOURCE, resolve_refresh_token
+
+
+class RfLayerRasterSourceConfig(RasterSourceConfig):
+    def __init__(
+        self,
+        project_id: str,
+        project_layer_id: str,
+        source_annotation_group_id: Optional[str] = None,
+        num_channels: int = 3,
+        refresh_token: Optional[str] = None,
+        rf_api_host: str = "app.staging.rasterfoundry.com",
+        rf_tile_host: str = "tiles.staging.rasterfoundry.com",
+        chip_backend: str = "rasterio",
+        resolution: Optional[float] = None,
+        zoom: Optional[int] = None,
+        transformers: Optional[list] = None,
+        channel_order: Optional[List[int]] = None,
+    ):
+        super().__init__(
+            source_type=RF_LAYER_RASTER_SOURCE,
+            transformers=transformers,
+            channel_order=channel_order,
+        )
+        self.project_id = project_id
+        self.project_layer_id = project_layer_id
+        self.source_annotation_group_id = source_annotation_group_id
+        self.num_channels = num_channels
+        self.refresh_token = refresh_token
+        self.rf_api_host = rf_api_host
+        self.rf_tile_host = rf_tile_host
+        self.chip_backend = chip_backend
+        self.resolution = resolution
+        self.zoom = zoom
+
+    def to_proto(self):
+        msg = super().to_proto()
+        custom_config = {
+            "project_id": str(self.project_id),
+            "project_layer_id": str(self.project_layer_id),
+            "num_channels": self.num_channels,
+            "rf_api_host": self.rf_api_host,
+            "rf_tile_host": self.rf_tile_host,
+            "chip_backend": self.chip_backend,
+        }
+        if self.source_annotation_group_id:
+            custom_config["source_annotation_group_id"] = str(
+                self.source_annotation_group_id
+            )
+        if self.refresh_token:
+            custom_config["refresh_token"] = self.refresh_token
+        if self.resolution is not None:
+            custom_config["resolution"] = self.resolution
+        if self.zoom is not None:
+            custom_config["zoom"] = self.zoom
+        msg.custom_config.update(custom_config)
+        return msg
+
+    def for_prediction(self, image_uri):
+        return self
+
+    def create_local(self, tmp_dir):
+        return self
+
+    def create_source(self, tmp_dir, crs_transformer=None, extent=None):
+        from ..http.client import get_client
+        from ..http.metadata import get_rf_scenes
+        from .rf_layer_raster_source import RfLayerRasterSource
+
+        refresh_token = resolve_refresh_token(self.refresh_token)
+        client = get_client(refresh_token, self.rf_api_host)
+        return RfLayerRasterSource(
+            self.project_id,
+            self.project_layer_id,
+            self.source_annotation_group_id,
+            refresh_token,
+            self.channel_order,
+            self.num_channels,
+            rf_api_host=self.rf_api_host,
+            rf_tile_host=self.rf_tile_host,
+            client=client,
+            chip_backend=self.chip_backend,
+            rf_scenes=get_rf_scenes(client, self.project_id, self.project_layer_id),
+            raster_transformers=self.create_transformers(),
+            resolution=self.resolution,
+            zoom=self.zoom,
+        )
+
+
+class RfLayerRasterSourceConfigBuilder(RasterSourceConfigBuilder):
+    def __init__(self, prev=None):
+        config = {}
+        if prev:
+            config = {
+                "project_id": prev.project_id,
+                "project_layer_id": prev.project_layer_id,
+                "source_annotation_group_id": prev.source_annotation_group_id,
+                "num_channels": prev.num_channels,
+                "refresh_token": prev.refresh_token,
+                "rf_api_host": prev.rf_api_host,
+                "rf_tile_host": prev.rf_tile_host,
+                "chip_backend": prev.chip_backend,
+                "resolution": prev.resolution,
+                "zoom": prev.zoom,
+                "transformers": prev.transformers,
+                "channel_order": prev.channel_order,
+            }
+        super().__init__(RfLayerRasterSourceConfig, config)
+
+    def validate(self):
+        super().validate()
+        if not self.config.get("project_id") or not self.config.get("project_layer_id"):
+            raise rv.ConfigError(
+                "You must specify a project and project layer for the "
+                'RfLayerRasterSourceConfig. Use "with_project_layer".'
+            )
+
+    def from_proto(self, msg):
+        b = super().from_proto(msg)
+        custom_config = json_format.MessageToDict(msg.custom_config)
+        b = b.with_project_layer(
+            custom_config["project_id"], custom_config["project_layer_id"]
+        )
+        b = b.with_rf_hosts(custom_config["rf_api_host"], custom_config["rf_tile_host"])
+        b = b.with_num_channels(int(custom_config["num_channels"]))
+        b = b.with_chip_backend(custom_config["chip_backend"])
+        b = b.with_source_annotation_group(
+            custom_config.get("source_annotation_group_id")
+        )
+        if "zoom" in custom_config:
+            b = b.with_zoom(int(custom_config["zoom"]))
+        else:
+            b = b.with_resolution(custom_config.get("resolution"))
+        return b.with_refresh_token(custom_config.get("refresh_token"))
+
+    def with_project_layer(self, project_id, project_layer_id):
+        """Set the Raster Foundry project and project layer to read imagery from"""
+        b = deepcopy(self)
+        b.config["project_id"] = project_id
+        b.config["project_layer_id"] = project_layer_id
+        return b
+
+    def with_source_annotation_group(self, annotation_group_id):
+        """Set the annotation group in the project layer that labels this imagery"""
+        b = deepcopy(self)
+        b.config["source_annotation_group_id"] = annotation_group_id
+        return b
+
+    def with_num_channels(self, num_channels):
+        """Set how many bands the project layer's imagery has"""
+        b = deepcopy(self)
+        b.config["num_channels"] = num_channels
+        return b
+
+    def with_refresh_token(self, refresh_token):
+        """Set the Raster Foundry refresh token to authenticate with
+
+        Without one, the token is read from the RF_REFRESH_TOKEN environment variable
+        when the source is created, which keeps it out of saved experiment configs.
+        """
+        b = deepcopy(self)
+        b.config["refresh_token"] = refresh_token
+        return b
+
+    def with_rf_hosts(self, rf_api_host, rf_tile_host):
+        """Set the Raster Foundry API and tile server hosts"""
+        b = deepcopy(self)
+        b.config["rf_api_host"] = rf_api_host
+        b.config["rf_tile_host"] = rf_tile_host
+        return b
+
+    def with_chip_backend(self, chip_backend):
+        """Set where chips are read from, which is either rasterio or tiles"""
+        b = deepcopy(self)
+        b.config["chip_backend"] = chip_backend
+        return b
+
+    def with_resolution(self, resolution):
+        """Set the size in meters of the pixels to read, coarser than the imagery's own
+
+        Chips are then read decimated from the scenes' overviews, or from the matching
+        tile zoom, and pixel windows and the CRS transformer are at this resolution.
+        """
+        b = deepcopy(self)
+        b.config["resolution"] = resolution
+        b.config["zoom"] = None
+        return b
+
+    def with_zoom(self, zoom):
+        """Set a tile zoom level whose pixels to read, instead of a resolution"""
+        b = deepcopy(self)
+        b.config["zoom"] = zoom
+        b.config["resolution"] = None
+        return b
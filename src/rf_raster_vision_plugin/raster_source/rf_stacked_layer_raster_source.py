@@ -0,0 +1,125 @@
+from typing import Dict, List, Optional, Union
+from uuid import UUID
+
+import numpy as np
+import rastervision as rv
+from rastervision.core import Box
+from rastervision.data.crs_transformer import CRSTransformer, RasterioCRSTransformer
+
+from rf_raster_vision_plugin import instrumentation
+from rf_raster_vision_plugin.http import metadata
+from rf_raster_vision_plugin.http.client import RfClient, get_client
+from .scene_mosaic import LayerGrid, MosaicStack, SceneMosaic, prepare_scenes
+
+
+class RfStackedLayerRasterSource(rv.data.RasterSource):
+    def __init__(
+        self,
+        project_id: UUID,
+        project_layer_ids: List[UUID],
+        refresh_token: str,
+        channel_order: List[int],
+        num_channels: Union[int, List[int]],
+        rf_api_host: str = "app.staging.rasterfoundry.com",
+        client: Optional[RfClient] = None,
+        max_open_scenes: int = 16,
+        rf_scenes: Optional[Dict[str, List[dict]]] = None,
+        raster_transformers: Optional[list] = None,
+        resolution: Optional[float] = None,
+        zoom: Optional[int] = None,
+    ):
+        """Construct a new RasterSource stacking the bands of several project layers
+
+        Every layer is read onto one pixel grid covering them all, so each chip holds
+        the same ground in every layer, as change detection between layers needs.
+        Scenes already on the grid's pixels are read without warping.
+
+        Args:
+            project_id (UUID): A Raster Foundry project id
+            project_layer_ids (List[UUID]): The project layers to stack, in the order their bands are stacked
+            refresh_token (str): A Raster Foundry refresh token to use to obtain an auth token
+            channel_order (List[int]): The order in which to return the stacked bands
+            num_channels (Union[int, List[int]]): How many bands each layer has, or a list of how many each one has
+            rf_api_host (str): The url host name to use for communicating with Raster Foundry
+            client (Optional[RfClient]): A client to share, defaulting to the process-wide client for this token and host
+            max_open_scenes (int): How many scene datasets each layer keeps open per reading thread
+            rf_scenes (Optional[Dict[str, List[dict]]]): Each layer's Raster Foundry scenes by layer id, if they've already been fetched
+            raster_transformers (Optional[list]): RasterTransformers to apply to each chip
+            resolution (Optional[float]): The size in meters of this source's pixels, instead of the layers' finest resolution
+            zoom (Optional[int]): A tile zoom level whose pixels this source should use, instead of a resolution
+        """
+
+        if resolution is not None and zoom is not None:
+            raise ValueError("Only one of resolution and zoom can be set")
+        layer_channels = (
+            list(num_channels)
+            if isinstance(num_channels, (list, tuple))
+            else [num_channels] * len(project_layer_ids)
+        )
+        if len(layer_channels) != len(project_layer_ids):
+            raise ValueError("num_channels must have one entry per project layer")
+
+        super().__init__(channel_order, sum(layer_channels), raster_transformers or [])
+        self.project_id = project_id
+        self.project_layer_ids = project_layer_ids
+        self.rf_api_host = rf_api_host
+        self._client = client or get_client(refresh_token, rf_api_host)
+
+        if rf_scenes is None:
+            metadata.prefetch(
+                self._client,
+                [
+                    {"project_id": project_id, "project_layer_id": layer_id}
+                    for layer_id in project_layer_ids
+                ],
+            )
+            rf_scenes = {
+                str(layer_id): metadata.get_rf_scenes(
+                    self._client, project_id, layer_id
+                )
+                for layer_id in project_layer_ids
+            }
+        self.rf_scenes = rf_scenes
+        layer_scenes = [
+            prepare_scenes(rf_scenes[str(layer_id)]) for layer_id in project_layer_ids
+        ]
+        for layer_id, scenes in zip(project_layer_ids, layer_scenes):
+            if not scenes:
+                raise ValueError(
+                    "Project layer {} has no ingested scenes".format(layer_id)
+                )
+
+        self._grid = LayerGrid.from_scenes(
+            [scene for scenes in layer_scenes for scene in scenes],
+            resolution=resolution,
+            zoom=zoom,
+        )
+        self._crs_transformer = RasterioCRSTransformer(
+            self._grid.transform, self._grid.crs
+        )
+        self._mosaic_stack = MosaicStack(
+            [
+                SceneMosaic(
+                    scenes, self._grid, channels, max_open_scenes=max_open_scenes
+                )
+                for scenes, channels in zip(layer_scenes, layer_channels)
+            ]
+        )
+
+    @instrumentation.timed("raster_source.get_chip")
+    def _get_chip(self, window: Box) -> np.ndarray:
+        """Get a chip of every layer's bands from a window (in pixel coordinates)"""
+        return self._mosaic_stack.read(
+            int(window.ymin), int(window.xmin), int(window.ymax), int(window.xmax)
+        )
+
+    def get_extent(self):
+        """Calculate the bounding box in pixels of this raster source"""
+        return Box(0, 0, self._grid.height, self._grid.width)
+
+    def get_dtype(self) -> np.dtype:
+        """Determine a datatype holding every layer's values"""
+        return self._mosaic_stack.dtype
+
+    def get_crs_transformer(self) -> CRSTransformer:
+        return self._crs_transformer
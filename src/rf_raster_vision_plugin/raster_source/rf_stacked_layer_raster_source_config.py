@@ -0,0 +1,168 @@
+from copy import deepcopy
+from typing import List, Optional
+
+from google.protobuf import json_format
+import rastervision as rv
+from rastervision.data.raster_source.raster_source_config import (
+    RasterSourceConfig,
+    RasterSourceConfigBuilder,
+)
+
+from ..plugin_config import RF_STACKED_LAYER_RASTER_SOURCE, resolve_refresh_token
+
+
+class RfStackedLayerRasterSourceConfig(RasterSourceConfig):
+    def __init__(
+        self,
+        project_id: str,
+        project_layer_ids: List[str],
+        num_channels: List[int],
+        refresh_token: Optional[str] = None,
+        rf_api_host: str = "app.staging.rasterfoundry.com",
+        resolution: Optional[float] = None,
+        zoom: Optional[int] = None,
+        transformers: Optional[list] = None,
+        channel_order: Optional[List[int]] = None,
+    ):
+        super().__init__(
+            source_type=RF_STACKED_LAYER_RASTER_SOURCE,
+            transformers=transformers,
+            channel_order=channel_order,
+        )
+        self.project_id = project_id
+        self.project_layer_ids = project_layer_ids
+        self.num_channels = num_channels
+        self.refresh_token = refresh_token
+        self.rf_api_host = rf_api_host
+        self.resolution = resolution
+        self.zoom = zoom
+
+    def to_proto(self):
+        msg = super().to_proto()
+        custom_config = {
+            "project_id": str(self.project_id),
+            "project_layer_ids": [str(layer_id) for layer_id in self.project_layer_ids],
+            "num_channels": list(self.num_channels),
+            "rf_api_host": self.rf_api_host,
+        }
+        if self.refresh_token:
+            custom_config["refresh_token"] = self.refresh_token
+        if self.resolution is not None:
+            custom_config["resolution"] = self.resolution
+        if self.zoom is not None:
+            custom_config["zoom"] = self.zoom
+        msg.custom_config.update(custom_config)
+        return msg
+
+    def for_prediction(self, image_uri):
+        return self
+
+    def create_local(self, tmp_dir):
+        return self
+
+    def create_source(self, tmp_dir, crs_transformer=None, extent=None):
+        from ..http.client import get_client
+        from .rf_stacked_layer_raster_source import RfStackedLayerRasterSource
+
+        refresh_token = resolve_refresh_token(self.refresh_token)
+        return RfStackedLayerRasterSource(
+            self.project_id,
+            self.project_layer_ids,
+            refresh_token,
+            self.channel_order,
+            self.num_channels,
+            rf_api_host=self.rf_api_host,
+            client=get_client(refresh_token, self.rf_api_host),
+            raster_transformers=self.create_transformers(),
+            resolution=self.resolution,
+            zoom=self.zoom,
+        )
+
+
+class RfStackedLayerRasterSourceConfigBuilder(RasterSourceConfigBuilder):
+    def __init__(self, prev=None):
+        config = {}
+        if prev:
+            config = {
+                "project_id": prev.project_id,
+                "project_layer_ids": prev.project_layer_ids,
+                "num_channels": prev.num_channels,
+                "refresh_token": prev.refresh_token,
+                "rf_api_host": prev.rf_api_host,
+                "resolution": prev.resolution,
+                "zoom": prev.zoom,
+                "transformers": prev.transformers,
+                "channel_order": prev.channel_order,
+            }
+        super().__init__(RfStackedLayerRasterSourceConfig, config)
+
+    def validate(self):
+        super().validate()
+        if not self.config.get("project_id") or not self.config.get(
+            "project_layer_ids"
+        ):
+            raise rv.ConfigError(
+                "You must specify a project and project layers for the "
+                'RfStackedLayerRasterSourceConfig. Use "with_project_layers".'
+            )
+
+    def from_proto(self, msg):
+        b = super().from_proto(msg)
+        custom_config = json_format.MessageToDict(msg.custom_config)
+        b = b.with_project_layers(
+            custom_config["project_id"],
+            custom_config["project_layer_ids"],
+            [int(channels) for channels in custom_config["num_channels"]],
+        )
+        b = b.with_rf_api_host(custom_config["rf_api_host"])
+        if "zoom" in custom_config:
+            b = b.with_zoom(int(custom_config["zoom"]))
+        else:
+            b = b.with_resolution(custom_config.get("resolution"))
+        return b.with_refresh_token(custom_config.get("refresh_token"))
+
+    def with_project_layers(self, project_id, project_layer_ids, num_channels=3):
+        """Set the project layers to stack, and how many bands each has
+
+        num_channels is either one band count for every layer, or a list of each
+        layer's band count.
+        """
+        b = deepcopy(self)
+        b.config["project_id"] = project_id
+        b.config["project_layer_ids"] = list(project_layer_ids)
+        b.config["num_channels"] = (
+            list(num_channels)
+            if isinstance(num_channels, (list, tuple))
+            else [num_channels] * len(project_layer_ids)
+        )
+        return b
+
+    def with_refresh_token(self, refresh_token):
+        """Set the Raster Foundry refresh token to authenticate with
+
+        Without one, the token is read from the RF_REFRESH_TOKEN environment variable
+        when the source is created.
+        """
+        b = deepcopy(self)
+        b.config["refresh_token"] = refresh_token
+        return b
+
+    def with_rf_api_host(self, rf_api_host):
+        """Set the Raster Foundry API host"""
+        b = deepcopy(self)
+        b.config["rf_api_host"] = rf_api_host
+        return b
+
+    def with_resolution(self, resolution):
+        """Set the size in meters of the pixels to read, instead of the layers' finest"""
+        b = deepcopy(self)
+        b.config["resolution"] = resolution
+        b.config["zoom"] = None
+        return b
+
+    def with_zoom(self, zoom):
+        """Set a tile zoom level whose pixels to read, instead of a resolution"""
+        b = deepcopy(self)
+        b.config["zoom"] = zoom
+        b.config["resolution"] = None
+        return b
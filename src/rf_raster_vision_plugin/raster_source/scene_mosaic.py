@@ -0,0 +1,375 @@
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import math
+import threading
+from typing import List, Optional, Tuple
+
+import numpy as np
+import rasterio
+from rasterio.crs import CRS
+from rasterio.warp import Resampling, reproject, transform_bounds
+from rasterio.windows import Window, from_bounds
+
+from .. import instrumentation
+from .tiles import ORIGIN_SHIFT, TILE_SIZE, tile_span
+
+WEB_MERCATOR = CRS.from_epsg(3857)
+WGS84 = CRS.from_epsg(4326)
+
+
+def _footprint_bounds(geometry: dict) -> tuple:
+    """Find the (xmin, ymin, xmax, ymax) of a GeoJSON Polygon or MultiPolygon"""
+    polygons = (
+        [geometry["coordinates"]]
+        if geometry["type"] == "Polygon"
+        else geometry["coordinates"]
+    )
+    vertices = np.array(
+        [vertex for polygon in polygons for vertex in polygon[0]], dtype=float
+    )
+    return (
+        vertices[:, 0].min(),
+        vertices[:, 1].min(),
+        vertices[:, 0].max(),
+        vertices[:, 1].max(),
+    )
+
+
+def _scene_resolution(scene: dict) -> Optional[float]:
+    resolutions = [
+        image["resolutionMeters"]
+        for image in scene.get("images") or []
+        if image.get("resolutionMeters")
+    ]
+    return min(resolutions) if resolutions else None
+
+
+class LayerGrid(object):
+    def __init__(self, transform: rasterio.Affine, width: int, height: int):
+        """A web mercator pixel grid covering a project layer
+
+        Args:
+            transform (rasterio.Affine): The grid's affine transform into web mercator
+            width (int): The grid's width in pixels
+            height (int): The grid's height in pixels
+        """
+
+        self.crs = WEB_MERCATOR
+        self.transform = transform
+        self.width = width
+        self.height = height
+
+    @classmethod
+    def from_scenes(
+        cls,
+        scenes: List[dict],
+        resolution: Optional[float] = None,
+        zoom: Optional[int] = None,
+    ) -> "LayerGrid":
+        """Build the grid from scene metadata alone, without opening any imagery
+
+        The grid spans the union of the scenes' data footprints, by default at the
+        finest resolution any scene reports, scaled to web mercator at the grid's
+        center. At a zoom, pixels are that zoom's tile pixels, and the grid is aligned
+        with them.
+
+        Args:
+            scenes (List[dict]): Scenes as returned by prepare_scenes
+            resolution (Optional[float]): The size in meters of the grid's pixels, instead of the scenes' finest resolution
+            zoom (Optional[int]): A tile zoom level whose pixels the grid should use, instead of a resolution
+        """
+
+        bounds = np.array([scene["footprint_bounds"] for scene in scenes])
+        xmin, ymin = bounds[:, 0].min(), bounds[:, 1].min()
+        xmax, ymax = bounds[:, 2].max(), bounds[:, 3].max()
+        if zoom is not None:
+            pixel_size = tile_span(zoom) / TILE_SIZE
+            left_col = math.floor((xmin + ORIGIN_SHIFT) / pixel_size)
+            top_row = math.floor((ORIGIN_SHIFT - ymax) / pixel_size)
+            xmin = left_col * pixel_size - ORIGIN_SHIFT
+            ymax = ORIGIN_SHIFT - top_row * pixel_size
+        else:
+            if resolution is None:
+                resolutions = [
+                    scene["resolution"] for scene in scenes if scene["resolution"]
+                ]
+                if not resolutions:
+                    raise ValueError("None of the layer's scenes report a resolution")
+                resolution = min(resolutions)
+            lng_lat_bounds = transform_bounds(
+                WEB_MERCATOR, WGS84, xmin, ymin, xmax, ymax
+            )
+            center_lat = math.radians((lng_lat_bounds[1] + lng_lat_bounds[3]) / 2)
+            pixel_size = resolution / math.cos(center_lat)
+        return cls(
+            rasterio.Affine(pixel_size, 0, xmin, 0, -pixel_size, ymax),
+            int(math.ceil((xmax - xmin) / pixel_size)),
+            int(math.ceil((ymax - ymin) / pixel_size)),
+        )
+
+    def pixel_bounds(self, bounds: tuple) -> tuple:
+        """Convert web mercator (xmin, ymin, xmax, ymax) to pixel (ymin, xmin, ymax, xmax)"""
+        inverse = ~self.transform
+        col_min, row_min = inverse * (bounds[0], bounds[3])
+        col_max, row_max = inverse * (bounds[2], bounds[1])
+        return (row_min, col_min, row_max, col_max)
+
+    def window_transform(self, ymin: float, xmin: float) -> rasterio.Affine:
+        return self.transform * rasterio.Affine.translation(xmin, ymin)
+
+
+def prepare_scenes(rf_scenes: List[dict]) -> List[dict]:
+    """Pick out the ingested scenes and the footprint and resolution metadata the mosaic needs"""
+    scenes = []
+    for scene in rf_scenes:
+        if scene["statusFields"]["ingestStatus"] != "INGESTED":
+            continue
+        footprint = _footprint_bounds(scene["dataFootprint"])
+        scenes.append(
+            {
+                "id": scene["id"],
+                "uri": scene["ingestLocation"],
+                "footprint_bounds": transform_bounds(WGS84, WEB_MERCATOR, *footprint),
+                "resolution": _scene_resolution(scene),
+            }
+        )
+    return scenes
+
+
+class SceneMosaic(object):
+    def __init__(
+        self,
+        scenes: List[dict],
+        grid: LayerGrid,
+        num_channels: int,
+        max_open_scenes: int = 16,
+    ):
+        """Read windows of a layer grid from only the scenes whose footprints intersect them
+
+        Scenes are opened the first time a window needs them, and each reading thread
+        keeps its own LRU cache of open datasets, since rasterio datasets can't be read
+        from several threads at once. Where scenes overlap, earlier scenes win.
+
+        Args:
+            scenes (List[dict]): Scenes as returned by prepare_scenes
+            grid (LayerGrid): The pixel grid windows are expressed in
+            num_channels (int): How many bands each scene has
+            max_open_scenes (int): How many datasets each thread keeps open
+        """
+
+        self.scenes = scenes
+        self.grid = grid
+        self.num_channels = num_channels
+        self.max_open_scenes = max_open_scenes
+        self._pixel_bounds = np.array(
+            [grid.pixel_bounds(scene["footprint_bounds"]) for scene in scenes]
+        ).reshape(-1, 4)
+        self._local = threading.local()
+        self._dtype = None  # type: Optional[np.dtype]
+
+    def _open(self, scene: dict):
+        datasets = getattr(self._local, "datasets", None)
+        if datasets is None:
+            datasets = self._local.datasets = OrderedDict()
+        if scene["id"] in datasets:
+            datasets.move_to_end(scene["id"])
+            return datasets[scene["id"]]
+        dataset = rasterio.open(scene["uri"])
+        datasets[scene["id"]] = dataset
+        while len(datasets) > self.max_open_scenes:
+            datasets.popitem(last=False)[1].close()
+        return dataset
+
+    @property
+    def dtype(self) -> np.dtype:
+        """The scenes' datatype, read from the first scene's header"""
+        if self._dtype is None:
+            self._dtype = np.dtype(self._open(self.scenes[0]).dtypes[0])
+        return self._dtype
+
+    def scenes_in(
+        self, ymin: float, xmin: float, ymax: float, xmax: float
+    ) -> np.ndarray:
+        """Find the indices of the scenes whose footprints intersect a pixel window"""
+        bounds = self._pixel_bounds
+        return np.flatnonzero(
+            (bounds[:, 0] < ymax)
+            & (bounds[:, 2] > ymin)
+            & (bounds[:, 1] < xmax)
+            & (bounds[:, 3] > xmin)
+        )
+
+    def _aligned_offset(
+        self, dataset, dst_transform: rasterio.Affine, dtype: np.dtype
+    ) -> Optional[Tuple[int, int]]:
+        """Find a window's top left pixel in a scene, if the scene shares the grid's pixels"""
+        src_transform = dataset.transform
+        if dataset.crs != self.grid.crs or np.dtype(dataset.dtypes[0]) != dtype:
+            return None
+        if not np.allclose(
+            src_transform[:2] + src_transform[3:5],
+            dst_transform[:2] + dst_transform[3:5],
+            rtol=1e-9,
+            atol=0,
+        ):
+            return None
+        col, row = ~src_transform * (dst_transform.c, dst_transform.f)
+        if abs(col - round(col)) > 1e-6 or abs(row - round(row)) > 1e-6:
+            return None
+        return int(round(row)), int(round(col))
+
+    @instrumentation.timed("raster_source.read_scene")
+    def _read_scene(self, scene: dict, ymin: int, xmin: int, out: np.ndarray) -> bool:
+        """Warp the part of one scene under a window into out, returning whether any of it was
+
+        Scenes already on the grid's pixels, as scenes ingested in web mercator at the
+        grid's zoom are, are read straight into out without warping.
+        """
+
+        dataset = self._open(scene)
+        height, width = out.shape[1:]
+        dst_transform = self.grid.window_transform(ymin, xmin)
+        offset = self._aligned_offset(dataset, dst_transform, out.dtype)
+        if offset is not None:
+            row, col = offset
+            row_off, col_off = max(row, 0), max(col, 0)
+            row_end = min(row + height, dataset.height)
+            col_end = min(col + width, dataset.width)
+            if col_end <= col_off or row_end <= row_off:
+                return False
+            part = out[:, row_off - row : row_end - row, col_off - col : col_end - col]
+            dataset.read(
+                out=part,
+                window=Window(col_off, row_off, col_end - col_off, row_end - row_off),
+            )
+            if dataset.nodata not in (None, 0):
+                part[part == dataset.nodata] = 0
+            return True
+        left, top = dst_transform * (0, 0)
+        right, bottom = dst_transform * (width, height)
+        src_bounds = transform_bounds(
+            self.grid.crs, dataset.crs, left, bottom, right, top
+        )
+        src_window = from_bounds(*src_bounds, transform=dataset.transform)
+        col_off = max(math.floor(src_window.col_off), 0)
+        row_off = max(math.floor(src_window.row_off), 0)
+        col_end = min(math.ceil(src_window.col_off + src_window.width), dataset.width)
+        row_end = min(math.ceil(src_window.row_off + src_window.height), dataset.height)
+        if col_end <= col_off or row_end <= row_off:
+            return False
+        # When the grid is coarser than the scene, read the window decimated by a whole
+        # factor that's still no coarser than the grid, which GDAL serves from the
+        # scene's overviews instead of reading every native pixel
+        decimation = max(
+            int(min(src_window.width / width, src_window.height / height)), 1
+        )
+        src_window = Window(col_off, row_off, col_end - col_off, row_end - row_off)
+        out_shape = (
+            dataset.count,
+            int(math.ceil(src_window.height / decimation)),
+            int(math.ceil(src_window.width / decimation)),
+        )
+        data = dataset.read(window=src_window, out_shape=out_shape, masked=True)
+        src_transform = dataset.window_transform(src_window) * rasterio.Affine.scale(
+            src_window.width / out_shape[2], src_window.height / out_shape[1]
+        )
+        reproject(
+            np.ma.filled(data, fill_value=0),
+            out,
+            src_transform=src_transform,
+            src_crs=dataset.crs,
+            src_nodata=0,
+            dst_transform=dst_transform,
+            dst_crs=self.grid.crs,
+            dst_nodata=0,
+            resampling=Resampling.nearest,
+        )
+        return True
+
+    def read(
+        self,
+        ymin: int,
+        xmin: int,
+        ymax: int,
+        xmax: int,
+        out: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
+        """Read a pixel window into a (height, width, channels) array
+
+        Args:
+            out (Optional[np.ndarray]): An optional (height, width, channels) array to read into
+        """
+
+        height, width = ymax - ymin, xmax - xmin
+        if out is None:
+            out = np.zeros((height, width, self.num_channels), dtype=self.dtype)
+        else:
+            out[:] = 0
+        filled = np.zeros((height, width), dtype=bool)
+        scene_chip = None
+        for idx in self.scenes_in(ymin, xmin, ymax, xmax):
+            if scene_chip is None:
+                scene_chip = np.zeros((out.shape[2], height, width), dtype=out.dtype)
+            else:
+                scene_chip[:] = 0
+            if not self._read_scene(self.scenes[idx], ymin, xmin, scene_chip):
+                continue
+            valid = scene_chip.any(axis=0) & ~filled
+            out[valid] = np.transpose(scene_chip, axes=[1, 2, 0])[valid]
+            filled |= valid
+            if filled.all():
+                break
+        return out
+
+
+class MosaicStack(object):
+    def __init__(self, mosaics: List[SceneMosaic], max_workers: Optional[int] = None):
+        """Read the same window of several layers into one array of all their bands
+
+        Every mosaic must share one grid, so windows mean the same pixels in each.
+        Layers are read concurrently, each straight into its own bands of one output
+        array, instead of being read separately and concatenated.
+
+        Args:
+            mosaics (List[SceneMosaic]): One mosaic per layer, in the order their bands are stacked
+            max_workers (Optional[int]): How many layers to read at once, defaulting to all of them
+        """
+
+        self.mosaics = mosaics
+        self.num_channels = sum(mosaic.num_channels for mosaic in mosaics)
+        self._band_offsets = np.cumsum([0] + [m.num_channels for m in mosaics])
+        self._pool = ThreadPoolExecutor(max_workers=max_workers or len(mosaics))
+
+    @property
+    def dtype(self) -> np.dtype:
+        """A datatype that holds every layer's values"""
+        return np.result_type(*(mosaic.dtype for mosaic in self.mosaics))
+
+    def read(
+        self,
+        ymin: int,
+        xmin: int,
+        ymax: int,
+        xmax: int,
+        out: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
+        """Read a pixel window of every layer into a (height, width, channels) array
+
+        Args:
+            out (Optional[np.ndarray]): An optional (height, width, channels) array to read into
+        """
+
+        if out is None:
+            out = np.empty((ymax - ymin, xmax - xmin, self.num_channels), self.dtype)
+        reads = [
+            self._pool.submit(mosaic.read, ymin, xmin, ymax, xmax, out[:, :, start:end])
+            for mosaic, start, end in zip(
+                self.mosaics, self._band_offsets[:-1], self._band_offsets[1:]
+            )
+        ]
+        for read in reads:
+            read.result()
+        return out
+
+    def close(self):
+        self._pool.shutdown()
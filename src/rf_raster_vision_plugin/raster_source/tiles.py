@@ -0,0 +1,156 @@
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+import math
+import threading
+from typing import Callable, Optional, Tuple
+
+import numpy as np
+
+from .. import instrumentation
+
+# Half the width of the web mercator world, in meters
+ORIGIN_SHIFT = 20037508.342789244
+TILE_SIZE = 256
+MAX_ZOOM = 22
+
+
+def tile_span(z: int) -> float:
+    """The width of a tile at zoom z, in web mercator meters"""
+    return 2 * ORIGIN_SHIFT / 2**z
+
+
+def zoom_for_resolution(resolution: float) -> int:
+    """The shallowest zoom whose pixels are at least as fine as a resolution in meters"""
+    # Allow for rounding, so a zoom's own pixel size maps back to that zoom
+    zoom = math.ceil(math.log2(2 * ORIGIN_SHIFT / (TILE_SIZE * resolution)) - 1e-9)
+    return min(max(zoom, 0), MAX_ZOOM)
+
+
+def tile_range(
+    bounds: Tuple[float, float, float, float], z: int
+) -> Tuple[int, int, int, int]:
+    """Find the tiles at zoom z that cover web mercator bounds
+
+    Args:
+        bounds (Tuple[float, float, float, float]): (xmin, ymin, xmax, ymax) in web mercator
+        z (int): The zoom level
+
+    Returns:
+        The inclusive tile range (xmin, ymin, xmax, ymax), with y counting down from the top
+    """
+
+    span = tile_span(z)
+    last = 2**z - 1
+
+    def clamp(tile):
+        return min(max(int(tile), 0), last)
+
+    xmin, ymin, xmax, ymax = bounds
+    return (
+        clamp(math.floor((xmin + ORIGIN_SHIFT) / span)),
+        clamp(math.floor((ORIGIN_SHIFT - ymax) / span)),
+        clamp(math.floor((xmax + ORIGIN_SHIFT) / span)),
+        clamp(math.floor((ORIGIN_SHIFT - ymin) / span)),
+    )
+
+
+def decode_image(data: bytes) -> np.ndarray:
+    """Decode a tile image into a (height, width, channels) array"""
+    from rasterio.io import MemoryFile
+
+    with MemoryFile(data) as memfile:
+        with memfile.open() as dataset:
+            return np.transpose(dataset.read(), axes=[1, 2, 0])
+
+
+class TileFetcher(object):
+    def __init__(
+        self,
+        fetch_tile: Callable[[int, int, int], Optional[bytes]],
+        num_channels: int,
+        dtype: np.dtype = np.dtype(np.uint8),
+        decode: Callable[[bytes], np.ndarray] = decode_image,
+        max_workers: int = 8,
+        cache_size: int = 512,
+    ):
+        """Construct a new TileFetcher
+
+        Args:
+            fetch_tile (Callable[[int, int, int], Optional[bytes]]): A function of (z, x, y) returning encoded tile bytes, or None where there is no data
+            num_channels (int): How many bands to fill with zeros when no tile has data
+            dtype (np.dtype): The datatype to fill with when no tile has data
+            decode (Callable[[bytes], np.ndarray]): A function decoding tile bytes into a (height, width, channels) array
+            max_workers (int): The maximum number of tiles to fetch concurrently
+            cache_size (int): How many decoded tiles to keep in the LRU cache
+        """
+
+        self.fetch_tile = fetch_tile
+        self.num_channels = num_channels
+        self.dtype = dtype
+        self.decode = decode
+        self.max_workers = max_workers
+        self.cache_size = cache_size
+        self._cache = OrderedDict()  # type: OrderedDict
+        self._cache_lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_workers)
+
+    def get_tile(self, z: int, x: int, y: int) -> Optional[np.ndarray]:
+        """Get one decoded tile, from the cache if possible, or None if it has no data"""
+        key = (z, x, y)
+        with self._cache_lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                instrumentation.cache_access("tile_cache", True)
+                return self._cache[key]
+        instrumentation.cache_access("tile_cache", False)
+
+        data = self.fetch_tile(z, x, y)
+        tile = None if data is None else self.decode(data)
+
+        with self._cache_lock:
+            self._cache[key] = tile
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return tile
+
+    def get_mosaic(
+        self, bounds: Tuple[float, float, float, float], z: int
+    ) -> Tuple[np.ndarray, Tuple[float, float, float, float, float, float]]:
+        """Fetch and stitch together the tiles at zoom z that cover web mercator bounds
+
+        Returns:
+            A (height, width, channels) array and the (a, b, c, d, e, f) coefficients of
+            its affine transform into web mercator
+        """
+
+        xmin, ymin, xmax, ymax = tile_range(bounds, z)
+        keys = [(x, y) for y in range(ymin, ymax + 1) for x in range(xmin, xmax + 1)]
+        tiles = list(self._pool.map(lambda key: self.get_tile(z, key[0], key[1]), keys))
+
+        found = [tile for tile in tiles if tile is not None]
+        mosaic = np.zeros(
+            (
+                (ymax - ymin + 1) * TILE_SIZE,
+                (xmax - xmin + 1) * TILE_SIZE,
+                found[0].shape[2] if found else self.num_channels,
+            ),
+            dtype=found[0].dtype if found else self.dtype,
+        )
+        for (x, y), tile in zip(keys, tiles):
+            if tile is None:
+                continue
+            row = (y - ymin) * TILE_SIZE
+            col = (x - xmin) * TILE_SIZE
+            mosaic[row : row + TILE_SIZE, col : col + TILE_SIZE] = tile
+
+        span = tile_span(z)
+        pixel_size = span / TILE_SIZE
+        transform = (
+            pixel_size,
+            0.0,
+            xmin * span - ORIGIN_SHIFT,
+            0.0,
+            -pixel_size,
+            ORIGIN_SHIFT - ymin * span,
+        )
+        return mosaic, transform
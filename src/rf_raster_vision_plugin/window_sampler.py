@@ -0,0 +1,236 @@
+"""Choosing training windows from label and footprint coverage, without reading chips
+
+Windows are laid out the way Box.get_windows lays them out, as a grid of rows and
+columns of square windows. Per-window label counts come from a 2D difference array, so
+each label costs a constant amount of work however many windows it falls in, and
+per-window footprint coverage comes from a summed-area table over the scenes' data
+footprints rasterized at the coarsest resolution that lines up with every window.
+"""
+
+from math import gcd
+from typing import TYPE_CHECKING, List, Optional, Tuple
+
+import numpy as np
+
+# Counting labels and choosing windows need only numpy, so rasterio is imported when
+# footprints are rasterized
+if TYPE_CHECKING:
+    import rasterio
+
+
+def grid_shape(height: int, width: int, stride: int) -> Tuple[int, int]:
+    """How many rows and columns of windows Box.get_windows makes for an extent"""
+    return -(-height // stride), -(-width // stride)
+
+
+def label_counts(
+    npboxes: np.ndarray, shape: Tuple[int, int], chip_size: int, stride: int
+) -> np.ndarray:
+    """Count the boxes intersecting each window of a grid of windows
+
+    Args:
+        npboxes (np.ndarray): An (n, 4) array of (ymin, xmin, ymax, xmax) pixel boxes
+        shape (Tuple[int, int]): The number of rows and columns of windows
+        chip_size (int): The height and width of each window
+        stride (int): How far apart windows start
+
+    Returns:
+        An array of the given shape, of how many boxes intersect each window
+    """
+
+    num_rows, num_cols = shape
+    npboxes = np.asarray(npboxes, dtype=float).reshape(-1, 4)
+    # Window r spans [r * stride, r * stride + chip_size), so it intersects a box when
+    # r * stride < box max and r * stride + chip_size > box min
+    row_mins = np.floor((npboxes[:, 0] - chip_size) / stride).astype(int) + 1
+    row_maxs = np.ceil(npboxes[:, 2] / stride).astype(int) - 1
+    col_mins = np.floor((npboxes[:, 1] - chip_size) / stride).astype(int) + 1
+    col_maxs = np.ceil(npboxes[:, 3] / stride).astype(int) - 1
+    row_mins, col_mins = np.maximum(row_mins, 0), np.maximum(col_mins, 0)
+    row_maxs = np.minimum(row_maxs, num_rows - 1)
+    col_maxs = np.minimum(col_maxs, num_cols - 1)
+    inside = (row_mins <= row_maxs) & (col_mins <= col_maxs)
+    row_mins, row_maxs = row_mins[inside], row_maxs[inside] + 1
+    col_mins, col_maxs = col_mins[inside], col_maxs[inside] + 1
+
+    # Mark the corners of each box's rectangle of windows, and sum the marks up
+    diff = np.zeros((num_rows + 1, num_cols + 1), dtype=np.int64)
+    np.add.at(diff, (row_mins, col_mins), 1)
+    np.add.at(diff, (row_mins, col_maxs), -1)
+    np.add.at(diff, (row_maxs, col_mins), -1)
+    np.add.at(diff, (row_maxs, col_maxs), 1)
+    return diff.cumsum(axis=0).cumsum(axis=1)[:num_rows, :num_cols]
+
+
+def footprint_coverage(
+    footprints: List[dict],
+    transform: "rasterio.Affine",
+    crs,
+    shape: Tuple[int, int],
+    chip_size: int,
+    stride: int,
+) -> np.ndarray:
+    """Find what fraction of each window of a grid is covered by data footprints
+
+    Args:
+        footprints (List[dict]): GeoJSON geometries of where the scenes have data, in lng/lat
+        transform (rasterio.Affine): The affine transform of the pixel grid windows are in
+        crs: The CRS of the pixel grid
+        shape (Tuple[int, int]): The number of rows and columns of windows
+        chip_size (int): The height and width of each window
+        stride (int): How far apart windows start
+
+    Returns:
+        An array of the given shape, of the covered fraction of each window
+    """
+
+    import rasterio
+    from rasterio.features import rasterize
+    from rasterio.warp import transform_geom
+
+    num_rows, num_cols = shape
+    # Cells this size line up with the edges of every window
+    cell = gcd(chip_size, stride)
+    out_shape = (
+        ((num_rows - 1) * stride + chip_size) // cell,
+        ((num_cols - 1) * stride + chip_size) // cell,
+    )
+    geometries = [
+        transform_geom("EPSG:4326", crs, footprint) for footprint in footprints
+    ]
+    covered = (
+        rasterize(
+            [(geometry, 1) for geometry in geometries],
+            out_shape=out_shape,
+            transform=transform * rasterio.Affine.scale(cell),
+            fill=0,
+            dtype="uint8",
+        )
+        if geometries
+        else np.zeros(out_shape, dtype=np.uint8)
+    )
+
+    sums = np.zeros((out_shape[0] + 1, out_shape[1] + 1), dtype=np.int64)
+    sums[1:, 1:] = covered.cumsum(axis=0).cumsum(axis=1)
+    y0 = (np.arange(num_rows) * stride // cell)[:, np.newaxis]
+    x0 = (np.arange(num_cols) * stride // cell)[np.newaxis, :]
+    y1, x1 = y0 + chip_size // cell, x0 + chip_size // cell
+    window_sums = sums[y1, x1] - sums[y0, x1] - sums[y1, x0] + sums[y0, x0]
+    return window_sums / float((chip_size // cell) ** 2)
+
+
+def choose_windows(
+    counts: np.ndarray,
+    coverage: np.ndarray,
+    min_labels: int = 1,
+    min_coverage: float = 0.5,
+    neg_ratio: Optional[float] = 1.0,
+    seed: Optional[int] = None,
+) -> np.ndarray:
+    """Pick positive windows and a random share of negative ones
+
+    Args:
+        counts (np.ndarray): How many labels each window holds, as from label_counts
+        coverage (np.ndarray): How much of each window has data, as from footprint_coverage
+        min_labels (int): How many labels a window needs to be positive
+        min_coverage (float): The fraction of a window that must have data for it to be used at all
+        neg_ratio (Optional[float]): How many negative windows, which hold no labels, to pick per positive one, or None for every one
+        seed (Optional[int]): A seed for picking negative windows
+
+    Returns:
+        A mask of the windows picked, in the shape of counts
+    """
+
+    has_data = coverage >= min_coverage
+    positive = has_data & (counts >= min_labels)
+    negative = has_data & (counts == 0)
+    if neg_ratio is None:
+        return positive | negative
+
+    candidates = np.flatnonzero(negative)
+    num_negative = min(len(candidates), int(round(neg_ratio * positive.sum())))
+    picked = np.random.RandomState(seed).choice(candidates, num_negative, replace=False)
+    chosen = positive.ravel().copy()
+    chosen[picked] = True
+    return chosen.reshape(counts.shape)
+
+
+class WindowSampler(object):
+    def __init__(
+        self,
+        raster_source,
+        label_source,
+        chip_size: int,
+        stride: Optional[int] = None,
+        min_labels: int = 1,
+        min_coverage: float = 0.5,
+        neg_ratio: Optional[float] = 1.0,
+        seed: Optional[int] = None,
+    ):
+        """Choose the windows of a layer worth making chips from
+
+        Windows are those Box.get_windows makes over the raster source's extent. A
+        window is used if enough of it is covered by the scenes' data footprints, and
+        if it either intersects at least min_labels labels or is one of the negative
+        windows picked at random, neg_ratio of them per positive window.
+
+        Args:
+            raster_source (RfLayerRasterSource): The layer to sample windows of
+            label_source (RfAnnotationGroupLabelSource): The labels for the layer
+            chip_size (int): The height and width of each window
+            stride (Optional[int]): How far apart windows start, defaulting to chip_size
+            min_labels (int): How many labels a window needs to be positive
+            min_coverage (float): The fraction of a window that must have data for it to be used at all
+            neg_ratio (Optional[float]): How many negative windows to pick per positive one, or None for every one
+            seed (Optional[int]): A seed for picking negative windows
+        """
+
+        self.chip_size = chip_size
+        self.stride = stride or chip_size
+        self.min_labels = min_labels
+        self.min_coverage = min_coverage
+        self.neg_ratio = neg_ratio
+        self.seed = seed
+
+        extent = raster_source.get_extent()
+        self.shape = grid_shape(extent.get_height(), extent.get_width(), self.stride)
+        crs_transformer = raster_source.get_crs_transformer()
+        self.counts = label_counts(
+            label_source.get_labels().get_npboxes(),
+            self.shape,
+            self.chip_size,
+            self.stride,
+        )
+        self.coverage = footprint_coverage(
+            [
+                scene["dataFootprint"]
+                for scene in raster_source.rf_scenes
+                if scene["statusFields"]["ingestStatus"] == "INGESTED"
+            ],
+            crs_transformer.get_affine_transform(),
+            crs_transformer.get_image_crs(),
+            self.shape,
+            self.chip_size,
+            self.stride,
+        )
+
+    def mask(self) -> np.ndarray:
+        """Which windows of the grid to use"""
+        return choose_windows(
+            self.counts,
+            self.coverage,
+            self.min_labels,
+            self.min_coverage,
+            self.neg_ratio,
+            self.seed,
+        )
+
+    def get_windows(self) -> list:
+        """List the windows to use, in the row-major order Box.get_windows uses"""
+        from rastervision.core import Box
+
+        rows, cols = np.nonzero(self.mask())
+        return [
+            Box.make_square(row * self.stride, col * self.stride, self.chip_size)
+            for row, col in zip(rows.tolist(), cols.tolist())
+        ]
@@ -0,0 +1,155 @@
+import json
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from itertools import count
+import re
+import threading
+import time
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+
+def intersects(feature, bbox):
+    """Whether a feature's exterior ring's bounds intersect a "xmin,ymin,xmax,ymax" bbox"""
+    xmin, ymin, xmax, ymax = (float(coord) for coord in bbox.split(","))
+    xs, ys = zip(*feature["geometry"]["coordinates"][0])
+    return min(xs) <= xmax and max(xs) >= xmin and min(ys) <= ymax and max(ys) >= ymin
+
+
+class StubRasterFoundry(object):
+    """A local stand-in for the Raster Foundry API that adds artificial latency"""
+
+    def __init__(self, annotations=None, scenes=None, latency=0.0):
+        self.project = {"extras": {"annotate": {"labels": []}}}
+        self.annotations = annotations or []
+        self.scenes = scenes or []
+        self.tiles = {}  # (z, x, y) -> encoded tile bytes
+        self.latency = latency
+        self.requests = []  # list of (method, path, query)
+        self.posted = []
+        self.put = []
+        self.deleted = []
+        self.failures = []  # (status, headers) to answer the next requests with
+        self._created_ids = count()
+
+    def paginate(self, results, results_key, query):
+        page = int(query.get("page", ["0"])[0])
+        page_size = int(query.get("pageSize", ["30"])[0])
+        start = page * page_size
+        return {
+            "count": len(results),
+            "page": page,
+            "pageSize": page_size,
+            "hasNext": start + page_size < len(results),
+            results_key: results[start : start + page_size],
+        }
+
+    def handle(self, method, path, query, body):
+        self.requests.append((method, path, query))
+        time.sleep(self.latency)
+        if method == "POST" and path == "/api/tokens":
+            return {"id_token": "jwt-for-" + body["refresh_token"]}
+        if method == "GET" and re.match(r"^/api/projects/[^/]+$", path):
+            return self.project
+        if method == "GET" and re.match(
+            r"^/api/projects/[^/]+/layers/[^/]+/annotations$", path
+        ):
+            annotations = self.annotations
+            if "bbox" in query:
+                annotations = [
+                    feature
+                    for feature in annotations
+                    if intersects(feature, query["bbox"][0])
+                ]
+            return dict(
+                self.paginate(annotations, "features", query),
+                type="FeatureCollection",
+            )
+        if method == "POST" and re.match(
+            r"^/api/projects/[^/]+/layers/[^/]+/annotations$", path
+        ):
+            self.posted.extend(body["features"])
+            self.annotations.extend(
+                dict(feature, id="created-{}".format(next(self._created_ids)))
+                for feature in body["features"]
+            )
+            return body
+        annotation = re.match(
+            r"^/api/projects/[^/]+/layers/[^/]+/annotations/([^/]+)$", path
+        )
+        if method == "PUT" and annotation:
+            self.put.append(body)
+            self.annotations = [
+                body if feature.get("id") == annotation.group(1) else feature
+                for feature in self.annotations
+            ]
+            return {}
+        if method == "DELETE" and annotation:
+            self.deleted.append(annotation.group(1))
+            self.annotations = [
+                feature
+                for feature in self.annotations
+                if feature.get("id") != annotation.group(1)
+            ]
+            return {}
+        if method == "GET" and re.match(
+            r"^/api/projects/[^/]+/layers/[^/]+/scenes$", path
+        ):
+            return self.paginate(self.scenes, "results", query)
+        tile = re.match(r"^/[^/]+/layers/[^/]+/(\d+)/(\d+)/(\d+)/$", path)
+        if method == "GET" and tile:
+            return self.tiles.get(tuple(int(part) for part in tile.groups()))
+        return None
+
+
+@pytest.fixture
+def rf_stub():
+    stub = StubRasterFoundry()
+
+    class Handler(BaseHTTPRequestHandler):
+        def _respond(self, method):
+            url = urlparse(self.path)
+            length = int(self.headers.get("Content-Length") or 0)
+            body = json.loads(self.rfile.read(length)) if length else None
+            if stub.failures:
+                stub.requests.append((method, url.path, parse_qs(url.query)))
+                status, headers = stub.failures.pop(0)
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            result = stub.handle(method, url.path, parse_qs(url.query), body)
+            if isinstance(result, bytes):
+                payload, content_type = result, "application/octet-stream"
+            else:
+                payload, content_type = json.dumps(result).encode(), "application/json"
+            self.send_response(404 if result is None else 200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            self._respond("GET")
+
+        def do_POST(self):
+            self._respond("POST")
+
+        def do_PUT(self):
+            self._respond("PUT")
+
+        def do_DELETE(self):
+            self._respond("DELETE")
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    stub.host = "http://127.0.0.1:{}".format(server.server_address[1])
+    yield stub
+    server.shutdown()
+    server.server_close()
@@ -0,0 +1,109 @@
+import numpy as np
+from shapely.geometry import shape
+
+from rf_raster_vision_plugin.label_source.annotation_arrays import AnnotationArrays
+
+
+class ScaleTransformer(object):
+    """A CRS transformer mapping map coordinates to pixels with a fixed scale and offset"""
+
+    def map_to_pixel(self, map_point):
+        xs, ys = map_point
+        return (np.asarray(xs) - 10) * 4, (20 - np.asarray(ys)) * 4
+
+
+def polygon(ring):
+    return {"type": "Polygon", "coordinates": [ring]}
+
+
+def test_npboxes_match_per_geometry_bounds():
+    rng = np.random.RandomState(0)
+    features = []
+    for idx in range(50):
+        ring = rng.uniform(10, 20, size=(int(rng.randint(3, 8)), 2)).tolist()
+        features.append(
+            {
+                "id": str(idx),
+                "geometry": polygon(ring + ring[:1]),
+                "properties": {"label": "car"},
+            }
+        )
+    features.append(
+        {
+            "id": "multi",
+            "geometry": {
+                "type": "MultiPolygon",
+                "coordinates": [
+                    [[[11, 11], [11, 12], [12, 12], [11, 11]]],
+                    [[[15, 15], [15, 17], [16, 17], [15, 15]]],
+                ],
+            },
+            "properties": {"label": "truck"},
+        }
+    )
+    arrays = AnnotationArrays.from_features(features)
+    transformer = ScaleTransformer()
+
+    expected = []
+    for feature in features:
+        geoms = getattr(shape(feature["geometry"]), "geoms", None) or [
+            shape(feature["geometry"])
+        ]
+        for geom in geoms:
+            xs, ys = transformer.map_to_pixel(np.array(geom.exterior.coords).T)
+            expected.append([ys.min(), xs.min(), ys.max(), xs.max()])
+    np.testing.assert_allclose(arrays.to_npboxes(transformer), expected)
+
+
+def test_no_annotations_have_no_npboxes():
+    arrays = AnnotationArrays.from_features([])
+    assert arrays.to_npboxes(ScaleTransformer()).shape == (0, 4)
+
+
+def test_take_and_concatenate_round_trip():
+    features = [
+        {
+            "id": str(idx),
+            "geometry": polygon([[idx, idx]] * (idx + 3)),
+            "properties": {"label": label},
+        }
+        for idx, label in enumerate(["car", "truck", "car", "bus"])
+    ]
+    arrays = AnnotationArrays.from_features(features)
+    joined = AnnotationArrays.concatenate([arrays.take([3, 1]), arrays.take([0, 2])])
+
+    expected = AnnotationArrays.from_features([features[i] for i in (3, 1, 0, 2)])
+    assert joined.ids.tolist() == expected.ids.tolist()
+    assert joined.labels[joined.label_indices].tolist() == [
+        "bus",
+        "truck",
+        "car",
+        "car",
+    ]
+    np.testing.assert_array_equal(joined.coords, expected.coords)
+    np.testing.assert_array_equal(joined.offsets, expected.offsets)
+
+
+def test_ringless_arrays_keep_boxes_and_round_trip():
+    features = [
+        {
+            "id": str(idx),
+            "geometry": polygon(
+                [[x, y], [x, y + 1], [x + 2, y + 1], [x + 2, y], [x, y]]
+            ),
+            "properties": {"label": "car", "confidence": 0.5},
+        }
+        for idx, (x, y) in enumerate([(11, 12), (13.5, 15), (17, 11)])
+    ]
+    full = AnnotationArrays.from_features(features)
+    ringless = AnnotationArrays.from_features(iter(features), rings=False)
+    transformer = ScaleTransformer()
+
+    assert ringless.coords is None and ringless.offsets is None
+    np.testing.assert_array_equal(ringless.bounds, full.bounds)
+    np.testing.assert_allclose(
+        ringless.to_npboxes(transformer), full.to_npboxes(transformer)
+    )
+    restored = AnnotationArrays.from_bytes(ringless.to_bytes())
+    assert not restored.has_rings
+    np.testing.assert_array_equal(restored.take([2, 0]).bounds, full.bounds[[2, 0]])
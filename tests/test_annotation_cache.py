@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+from rf_raster_vision_plugin.cache.annotation_cache import (
+    AnnotationCache,
+    AnnotationCacheMiss,
+)
+from rf_raster_vision_plugin.http.client import RfClient
+
+
+def annotation(idx, label):
+    x, y = float(idx), float(idx)
+    return {
+        "id": "annotation-{}".format(idx),
+        "properties": {"label": label, "confidence": None},
+        "geometry": {
+            "type": "Polygon",
+            "coordinates": [[[x, y], [x, y + 1], [x + 1, y + 1], [x + 1, y], [x, y]]],
+        },
+    }
+
+
+def annotation_requests(stub):
+    return [req for req in stub.requests if req[1].endswith("/annotations")]
+
+
+def test_sync_downloads_only_when_the_group_changes(rf_stub, tmpdir):
+    rf_stub.annotations = [
+        annotation(idx, "car" if idx % 2 else "truck") for idx in range(5)
+    ]
+    cache = AnnotationCache(str(tmpdir))
+    client = RfClient("refresh", rf_stub.host)
+
+    _, first = cache.sync(client, "project", "layer", "group")
+    downloads = len(annotation_requests(rf_stub))
+    _, second = cache.sync(client, "project", "layer", "group")
+
+    # The second sync only asks for the group's count
+    assert len(annotation_requests(rf_stub)) == downloads + 1
+    np.testing.assert_array_equal(first.coords, second.coords)
+    np.testing.assert_array_equal(
+        second.class_ids({"car": 1, "truck": 2}), [2, 1, 2, 1, 2]
+    )
+
+    rf_stub.annotations.append(annotation(5, "car"))
+    _, third = cache.sync(client, "project", "layer", "group")
+    assert len(third) == 6
+
+
+def test_offline_sync_never_touches_the_network(rf_stub, tmpdir):
+    rf_stub.annotations = [annotation(0, "car")]
+    cache = AnnotationCache(str(tmpdir))
+    client = RfClient("refresh", rf_stub.host)
+
+    with pytest.raises(AnnotationCacheMiss):
+        cache.sync(client, "project", "layer", "group", offline=True)
+    cache.sync(client, "project", "layer", "group")
+    seen = len(rf_stub.requests)
+
+    project, annotations = cache.sync(client, "project", "layer", "group", offline=True)
+
+    assert len(rf_stub.requests) == seen
+    assert project == rf_stub.project
+    assert list(annotations.ids) == ["annotation-0"]
+
+
+def test_windowed_syncs_filter_on_the_server_and_cache_separately(rf_stub, tmpdir):
+    rf_stub.annotations = [annotation(idx, "car") for idx in range(10)]
+    cache = AnnotationCache(str(tmpdir))
+    client = RfClient("refresh", rf_stub.host)
+
+    _, near = cache.sync(client, "project", "layer", "group", window="0,0,2.5,2.5")
+    _, far = cache.sync(client, "project", "layer", "group", window="7.5,7.5,20,20")
+
+    assert near.ids.tolist() == ["annotation-{}".format(idx) for idx in range(3)]
+    assert far.ids.tolist() == ["annotation-{}".format(idx) for idx in range(7, 10)]
+    assert all("bbox" in req[2] for req in annotation_requests(rf_stub))
@@ -0,0 +1,45 @@
+import time
+
+from rf_raster_vision_plugin.http.async_client import load_scene_metadata
+from rf_raster_vision_plugin.http.client import RfClient
+
+
+def test_scene_metadata_loads_concurrently_and_once(rf_stub, caplog):
+    rf_stub.scenes = [{"id": "scene"}]
+    rf_stub.annotations = [
+        {
+            "id": "annotation",
+            "geometry": {
+                "type": "Polygon",
+                "coordinates": [[[0, 0], [0, 1], [1, 1], [0, 0]]],
+            },
+            "properties": {"label": "car"},
+        }
+    ]
+    client = RfClient("refresh", rf_stub.host)
+    client.token
+    rf_stub.latency = 0.2
+    scenes = [
+        {
+            "project_id": "project",
+            "project_layer_id": "layer-{}".format(idx),
+            "annotation_group_id": "group" if idx % 2 else None,
+        }
+        for idx in range(20)
+    ]
+
+    start = time.perf_counter()
+    metadata = load_scene_metadata(client, scenes)
+    elapsed = time.perf_counter() - start
+
+    # 1 project, 20 scene lists and 10 annotation groups, 8 at a time
+    assert elapsed < 31 * rf_stub.latency / 4
+    project_requests = [
+        req for req in rf_stub.requests if req[1] == "/api/projects/project"
+    ]
+    assert len(project_requests) == 1
+    assert [len(scene["rf_scenes"]) for scene in metadata] == [1] * 20
+    assert metadata[0]["annotations"] is None
+    assert len(metadata[1]["annotations"]) == 1
+    # Running as many requests as the client keeps connections for reuses them all
+    assert "Connection pool is full" not in caplog.text
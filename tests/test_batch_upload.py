@@ -0,0 +1,87 @@
+import numpy as np
+import pytest
+import requests
+
+from rf_raster_vision_plugin.http.client import RfClient
+from rf_raster_vision_plugin.http.retry import RetryPolicy
+from rf_raster_vision_plugin.label_store.batch_upload import (
+    UploadProgress,
+    upload_batches,
+)
+
+
+def make_batch(batch):
+    return [{"batch": batch}]
+
+
+def rf_client(rf_stub, max_retries=5):
+    client = RfClient(
+        "refresh",
+        rf_stub.host,
+        retry_policy=RetryPolicy(max_retries=max_retries, backoff=0),
+    )
+    client.token
+    rf_stub.requests.clear()
+    return client
+
+
+def post_requests(rf_stub):
+    return [req for req in rf_stub.requests if req[0] == "POST"]
+
+
+def test_failed_batches_are_retried_alone(rf_stub):
+    client = rf_client(rf_stub)
+    rf_stub.failures = [(503, {}), (429, {})]
+
+    upload_batches(
+        lambda features: client.post_labels("project", "layer", features),
+        make_batch,
+        10,
+        max_workers=3,
+    )
+
+    assert sorted(feature["batch"] for feature in rf_stub.posted) == list(range(10))
+    assert len(post_requests(rf_stub)) == 12
+
+
+def test_interrupted_saves_resume_without_duplicates(tmpdir):
+    arrays = [np.arange(8.0).reshape(2, 4)]
+    progress = UploadProgress.for_save(str(tmpdir), "group", 1, arrays)
+    posted = []
+
+    def flaky_post(features):
+        if features[0]["batch"] == 5:
+            raise requests.ConnectionError()
+        posted.append(features[0]["batch"])
+
+    with pytest.raises(requests.ConnectionError):
+        upload_batches(flaky_post, make_batch, 8, max_workers=1, progress=progress)
+    first_run = list(posted)
+
+    resumed = UploadProgress.for_save(str(tmpdir), "group", 1, arrays)
+    upload_batches(
+        lambda features: posted.append(features[0]["batch"]),
+        make_batch,
+        8,
+        progress=resumed,
+    )
+
+    assert first_run == [0, 1, 2, 3, 4]
+    assert sorted(posted) == list(range(8))
+    assert not tmpdir.listdir()
+
+
+def test_batches_are_only_retried_by_the_client(rf_stub):
+    client = rf_client(rf_stub, max_retries=1)
+    rf_stub.failures = [(503, {}), (503, {}), (503, {})]
+
+    with pytest.raises(requests.HTTPError):
+        upload_batches(
+            lambda features: client.post_labels("project", "layer", features),
+            make_batch,
+            1,
+        )
+
+    # The client tries the batch twice, and nothing retries it on top of that
+    assert len(post_requests(rf_stub)) == 2
+    assert not rf_stub.posted
@@ -0,0 +1,27 @@
+import numpy as np
+
+from rf_raster_vision_plugin.label_source.box_index import BoxIndex
+
+
+def test_query_matches_brute_force():
+    rng = np.random.RandomState(0)
+    corners = rng.uniform(0, 1000, size=(500, 2))
+    sizes = rng.uniform(1, 40, size=(500, 2))
+    npboxes = np.hstack([corners, corners + sizes])
+    index = BoxIndex(npboxes, np.arange(500))
+
+    for ymin, xmin in rng.uniform(-50, 1000, size=(50, 2)):
+        ymax, xmax = ymin + 100, xmin + 100
+        expected = np.flatnonzero(
+            (npboxes[:, 0] <= ymax)
+            & (npboxes[:, 2] >= ymin)
+            & (npboxes[:, 1] <= xmax)
+            & (npboxes[:, 3] >= xmin)
+        )
+        np.testing.assert_array_equal(index.query(ymin, xmin, ymax, xmax), expected)
+
+
+def test_empty_index():
+    index = BoxIndex(np.empty((0, 4)), np.empty(0, dtype=int))
+    assert len(index) == 0
+    assert len(index.query(0, 0, 10, 10)) == 0
@@ -0,0 +1,51 @@
+import numpy as np
+
+from rf_raster_vision_plugin.label_store import box_ops
+
+
+def brute_force_nms(boxes, scores, class_ids, iou_threshold):
+    suppressed = np.zeros(len(boxes), dtype=bool)
+    for idx in np.lexsort((np.arange(len(boxes)), -scores)):
+        if suppressed[idx]:
+            continue
+        ious = box_ops.iou(np.repeat(boxes[idx : idx + 1], len(boxes), 0), boxes)
+        duplicates = (ious > iou_threshold) & (class_ids == class_ids[idx])
+        duplicates[idx] = False
+        suppressed |= duplicates
+    return np.flatnonzero(~suppressed)
+
+
+def random_boxes(rng, num_boxes):
+    corners = rng.uniform(0, 50, (num_boxes, 2))
+    return np.hstack([corners, corners + rng.uniform(1, 8, (num_boxes, 2))])
+
+
+def test_overlapping_pairs_match_brute_force():
+    rng = np.random.RandomState(0)
+    boxes = random_boxes(rng, 200)
+
+    rows, others = box_ops.overlapping_pairs(boxes)
+
+    expected = {
+        (i, j)
+        for i in range(len(boxes))
+        for j in range(i + 1, len(boxes))
+        if boxes[i, 0] <= boxes[j, 2]
+        and boxes[j, 0] <= boxes[i, 2]
+        and boxes[i, 1] <= boxes[j, 3]
+        and boxes[j, 1] <= boxes[i, 3]
+    }
+    assert set(zip(rows.tolist(), others.tolist())) == expected
+
+
+def test_nms_matches_greedy_brute_force():
+    rng = np.random.RandomState(1)
+    for num_boxes in (0, 1, 50, 300):
+        boxes = random_boxes(rng, num_boxes)
+        scores = rng.uniform(size=num_boxes).round(1)
+        class_ids = rng.randint(0, 2, num_boxes)
+
+        np.testing.assert_array_equal(
+            box_ops.nms(boxes, scores, class_ids, 0.3),
+            brute_force_nms(boxes, scores, class_ids, 0.3),
+        )
@@ -0,0 +1,99 @@
+import numpy as np
+
+from rf_raster_vision_plugin.cache.chip_cache import ChipCache, scene_set_hash
+
+SCENES = [
+    {"id": "a", "uri": "s3://bucket/a.tif"},
+    {"id": "b", "uri": "s3://bucket/b.tif"},
+]
+
+
+def chip(value):
+    return np.full((16, 16, 3), value, dtype=np.uint8)
+
+
+def test_chips_round_trip_as_memory_maps(tmpdir):
+    cache = ChipCache(str(tmpdir))
+    scenes = scene_set_hash(SCENES)
+    assert cache.get("layer", scenes, (0, 0, 16, 16), [0, 1, 2]) is None
+
+    cache.put("layer", scenes, (0, 0, 16, 16), [0, 1, 2], chip(7))
+    cached = ChipCache(str(tmpdir)).get("layer", scenes, (0, 0, 16, 16), [0, 1, 2])
+    assert isinstance(cached, np.memmap)
+    np.testing.assert_array_equal(cached, chip(7))
+    # Other channel orders are other chips
+    assert cache.get("layer", scenes, (0, 0, 16, 16), [2, 1, 0]) is None
+
+
+def test_least_recently_used_chips_are_evicted(tmpdir):
+    one_chip = ChipCache(str(tmpdir.mkdir("probe")))
+    one_chip.put("layer", "scenes", (0, 0, 16, 16), None, chip(0))
+    chip_bytes = one_chip.size()
+
+    cache = ChipCache(str(tmpdir), max_bytes=3 * chip_bytes)
+    windows = [(0, 16 * idx, 16, 16 * (idx + 1)) for idx in range(4)]
+    for idx, window in enumerate(windows[:3]):
+        cache.put("layer", "scenes", window, None, chip(idx))
+    cache.get("layer", "scenes", windows[0], None)
+    cache.put("layer", "scenes", windows[3], None, chip(3))
+
+    assert cache.size() == 3 * chip_bytes
+    assert cache.get("layer", "scenes", windows[1], None) is None
+    for window in (windows[0], windows[2], windows[3]):
+        assert cache.get("layer", "scenes", window, None) is not None
+
+
+def test_scene_changes_invalidate_a_layer(tmpdir):
+    cache = ChipCache(str(tmpdir))
+    old_scenes = scene_set_hash(SCENES)
+    new_scenes = scene_set_hash(SCENES + [{"id": "c", "uri": "s3://bucket/c.tif"}])
+    assert scene_set_hash(SCENES[::-1]) == old_scenes
+    cache.put("layer", old_scenes, (0, 0, 16, 16), None, chip(1))
+    cache.put("other", old_scenes, (0, 0, 16, 16), None, chip(1))
+
+    ChipCache(str(tmpdir)).invalidate("layer", new_scenes)
+    reopened = ChipCache(str(tmpdir))
+    assert reopened.get("layer", old_scenes, (0, 0, 16, 16), None) is None
+    assert reopened.get("other", old_scenes, (0, 0, 16, 16), None) is not None
+
+
+def test_recency_survives_a_restart(tmpdir):
+    probe = ChipCache(str(tmpdir.mkdir("probe")))
+    probe.put("layer", "scenes", (0, 0, 16, 16), None, chip(0))
+    chip_bytes = probe.size()
+
+    windows = [(0, 16 * idx, 16, 16 * (idx + 1)) for idx in range(4)]
+    cache = ChipCache(str(tmpdir), max_bytes=3 * chip_bytes)
+    for idx, window in enumerate(windows[:3]):
+        cache.put("layer", "scenes", window, None, chip(idx))
+    cache.get("layer", "scenes", windows[0], None)
+    cache.flush()
+
+    reopened = ChipCache(str(tmpdir), max_bytes=3 * chip_bytes)
+    reopened.put("layer", "scenes", windows[3], None, chip(3))
+    assert reopened.get("layer", "scenes", windows[1], None) is None
+    assert reopened.get("layer", "scenes", windows[0], None) is not None
+
+
+def test_caches_sharing_a_directory_keep_each_others_chips(tmpdir):
+    first, second = ChipCache(str(tmpdir)), ChipCache(str(tmpdir))
+    first.put("layer", "scenes", (0, 0, 16, 16), None, chip(1))
+    second.put("layer", "scenes", (0, 16, 16, 32), None, chip(2))
+    first.put("layer", "scenes", (0, 32, 16, 48), None, chip(3))
+
+    reopened = ChipCache(str(tmpdir))
+    assert reopened.size() == first.size()
+    for window in [(0, 0, 16, 16), (0, 16, 16, 32), (0, 32, 16, 48)]:
+        assert reopened.get("layer", "scenes", window, None) is not None
+
+
+def test_the_index_log_is_compacted(tmpdir):
+    cache = ChipCache(str(tmpdir))
+    cache.put("layer", "scenes", (0, 0, 16, 16), None, chip(0))
+    for _ in range(5000):
+        cache.get("layer", "scenes", (0, 0, 16, 16), None)
+    cache.flush()
+
+    with open(str(tmpdir.join("chips", "index.log"))) as f:
+        assert len(f.readlines()) < 2000
+    assert ChipCache(str(tmpdir)).size() == cache.size()
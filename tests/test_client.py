@@ -0,0 +1,49 @@
+import base64
+import json
+import time
+
+from rf_raster_vision_plugin.http.client import _token_expiry, get_client
+
+
+def test_shared_client_exchanges_its_token_once(rf_stub):
+    rf_stub.scenes = [{"id": "scene"}]
+
+    for _ in range(3):
+        client = get_client("refresh", rf_stub.host)
+        client.get_scenes("project", "layer")
+
+    assert client is get_client("refresh", rf_stub.host)
+    token_requests = [req for req in rf_stub.requests if req[1] == "/api/tokens"]
+    assert len(token_requests) == 1
+
+
+def test_token_expiry_reads_the_exp_claim():
+    claims = base64.urlsafe_b64encode(json.dumps({"exp": 1234}).encode()).decode()
+    assert _token_expiry("header.{}.signature".format(claims.rstrip("="))) == 1234
+    assert _token_expiry("not-a-jwt") > time.time()
+
+
+def test_annotations_are_updated_and_deleted_by_id(rf_stub):
+    client = get_client("refresh", rf_stub.host)
+
+    client.put_label("project", "layer", {"id": "a", "properties": {"label": "car"}})
+    client.delete_label("project", "layer", "b")
+
+    assert rf_stub.put == [{"id": "a", "properties": {"label": "car"}}]
+    assert rf_stub.deleted == ["b"]
+    methods = [(method, path) for method, path, _ in rf_stub.requests]
+    assert ("PUT", "/api/projects/project/layers/layer/annotations/a") in methods
+    assert ("DELETE", "/api/projects/project/layers/layer/annotations/b") in methods
+
+
+def test_deleting_an_annotation_thats_already_gone_succeeds(rf_stub):
+    client = get_client("refresh", rf_stub.host)
+    client.token
+    rf_stub.failures = [(404, {})]
+
+    client.delete_label("project", "layer", "gone")
+
+    assert rf_stub.requests[-1][:2] == (
+        "DELETE",
+        "/api/projects/project/layers/layer/annotations/gone",
+    )
@@ -0,0 +1,67 @@
+import json
+
+import pytest
+
+from rf_raster_vision_plugin import instrumentation
+from rf_raster_vision_plugin.http.client import RfClient
+
+
+@pytest.fixture
+def metrics():
+    instrumentation.reset()
+    instrumentation.enable()
+    yield instrumentation
+    instrumentation.disable()
+    instrumentation.reset()
+    instrumentation.enable(sinks=[])
+    instrumentation.disable()
+
+
+def test_nothing_is_recorded_while_disabled():
+    instrumentation.disable()
+    instrumentation.reset()
+    with instrumentation.timer("block"):
+        pass
+    instrumentation.count("requests")
+    instrumentation.cache_access("cache", True)
+    assert instrumentation.snapshot() == {"latency": {}, "counters": {}, "caches": {}}
+
+
+def test_http_requests_are_counted_and_timed(rf_stub, metrics):
+    rf_stub.scenes = [{"id": "scene-{}".format(idx)} for idx in range(250)]
+    RfClient("refresh", rf_stub.host).get_scenes("project", "layer", page_size=100)
+
+    snapshot = metrics.snapshot()
+    assert snapshot["counters"]["http.get_scenes.requests"] == 3
+    assert snapshot["counters"]["http.get_api_token.requests"] == 1
+    assert snapshot["counters"]["http.bytes_received"] > 0
+    assert snapshot["latency"]["http.get_scenes"]["count"] == 3
+
+
+def test_sinks(metrics, tmpdir):
+    json_path = str(tmpdir.join("metrics.json"))
+    prometheus_path = str(tmpdir.join("metrics.prom"))
+    metrics.enable(
+        sinks=[
+            metrics.JsonSink(json_path),
+            metrics.PrometheusSink(prometheus_path),
+        ]
+    )
+    metrics.observe("raster_source.get_chip", 0.02)
+    metrics.observe("raster_source.get_chip", 3.0)
+    metrics.cache_access("chip_cache", True)
+    metrics.cache_access("chip_cache", False)
+    metrics.flush()
+
+    with open(json_path) as f:
+        dumped = json.load(f)
+    assert dumped["caches"]["chip_cache"]["hit_rate"] == 0.5
+    assert dumped["latency"]["raster_source.get_chip"]["count"] == 2
+
+    with open(prometheus_path) as f:
+        text = f.read()
+    metric = "rf_raster_vision_plugin_raster_source_get_chip_seconds"
+    assert '{}_bucket{{le="0.025"}} 1'.format(metric) in text
+    assert '{}_bucket{{le="+Inf"}} 2'.format(metric) in text
+    assert "{}_count 2".format(metric) in text
+    assert "rf_raster_vision_plugin_chip_cache_hits_total 1" in text
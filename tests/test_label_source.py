@@ -0,0 +1,52 @@
+import pytest
+
+pytest.importorskip("rastervision")
+
+import rasterio
+from rastervision.core import Box
+from rastervision.data.crs_transformer import RasterioCRSTransformer
+
+from rf_raster_vision_plugin.http.client import RfClient
+from rf_raster_vision_plugin.label_source.rf_annotation_group_label_source import (
+    RfAnnotationGroupLabelSource,
+)
+
+
+def feature(xmin, ymin, xmax, ymax, annotation_id=None):
+    ring = [[xmin, ymin], [xmin, ymax], [xmax, ymax], [xmax, ymin], [xmin, ymin]]
+    result = {
+        "geometry": {"type": "Polygon", "coordinates": [ring]},
+        "properties": {"label": "car"},
+    }
+    if annotation_id is not None:
+        result["id"] = annotation_id
+    return result
+
+
+def test_tiled_fetches_keep_annotations_without_ids(rf_stub):
+    rf_stub.project = {"extras": {"annotate": {"labels": [{"id": "car"}]}}}
+    rf_stub.annotations = [
+        # Without ids, in the first and last of four tiles
+        feature(0.2, 1.6, 0.4, 1.8),
+        feature(1.2, 0.2, 1.4, 0.4),
+        # With an id, spanning the first two tiles
+        feature(0.9, 1.6, 1.2, 1.8, "spanning"),
+    ]
+    # 0.1 degree pixels, so the 20 pixel extent covers 0 to 2 degrees
+    crs_transformer = RasterioCRSTransformer(
+        rasterio.Affine(0.1, 0, 0, 0, -0.1, 2), "EPSG:4326"
+    )
+
+    source = RfAnnotationGroupLabelSource(
+        "group",
+        "project",
+        "layer",
+        "refresh",
+        crs_transformer,
+        client=RfClient("refresh", rf_stub.host),
+        extent=Box(0, 0, 20, 20),
+        fetch_tile_size=10,
+    )
+
+    assert sorted(source.get_annotations().ids.tolist()) == ["", "", "spanning"]
+    assert len(source.get_labels()) == 3
@@ -0,0 +1,158 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("rastervision")
+
+import rasterio
+from rastervision.data.crs_transformer import RasterioCRSTransformer
+from rastervision.data.label.object_detection_labels import ObjectDetectionLabels
+
+from rf_raster_vision_plugin.http.client import RfClient
+from rf_raster_vision_plugin.http.converters import annotation_features_from_labels
+from rf_raster_vision_plugin.label_store.rf_annotation_group_label_store import (
+    RfAnnotationGroupLabelStore,
+)
+from rf_raster_vision_plugin.label_store.rf_annotation_group_label_store_config import (
+    RfAnnotationGroupLabelStoreConfigBuilder,
+)
+from rf_raster_vision_plugin.label_store.spool import LabelSpool
+
+CRS_TRANSFORMER_ARGS = (rasterio.Affine(10, 0, 500000, 0, -10, 4000000), "EPSG:32618")
+
+
+def test_stores_built_from_configs_save_labels(rf_stub, tmpdir):
+    rf_stub.project = {
+        "extras": {"annotate": {"labels": [{"id": "car"}, {"id": "truck"}]}}
+    }
+    config = (
+        RfAnnotationGroupLabelStoreConfigBuilder()
+        .with_annotation_group("project", "layer", "group")
+        .with_refresh_token("refresh")
+        .with_rf_api_host(rf_stub.host)
+        .build()
+    )
+    store = config.create_store(
+        None, None, RasterioCRSTransformer(*CRS_TRANSFORMER_ARGS), str(tmpdir)
+    )
+
+    store.save(
+        ObjectDetectionLabels(
+            np.array([[0, 0, 10, 10], [20, 20, 40, 40]], dtype=float),
+            np.array([1, 2]),
+            np.array([0.9, 0.8]),
+        )
+    )
+
+    assert [feature["properties"]["label"] for feature in rf_stub.posted] == [
+        "car",
+        "truck",
+    ]
+
+
+def test_syncing_saved_labels_again_changes_nothing(rf_stub, tmpdir):
+    rf_stub.project = {"extras": {"annotate": {"labels": [{"id": "car"}]}}}
+    rng = np.random.RandomState(0)
+    corners = rng.uniform(0, 1000, (32, 2))
+    npboxes = np.hstack([corners, corners + rng.uniform(20, 40, (32, 2))])
+    labels = ObjectDetectionLabels(
+        npboxes, np.ones(32, dtype=int), rng.uniform(size=32)
+    )
+    store = RfAnnotationGroupLabelStore(
+        "group",
+        "project",
+        "layer",
+        "refresh",
+        RasterioCRSTransformer(*CRS_TRANSFORMER_ARGS),
+        {1: "car"},
+        client=RfClient("refresh", rf_stub.host),
+        progress_dir=str(tmpdir),
+        sync=True,
+    )
+
+    store.save(labels)
+    assert len(rf_stub.posted) == 32
+    store.save(labels)
+    assert len(rf_stub.posted) == 32
+    assert not rf_stub.put and not rf_stub.deleted
+
+    # Moving a box updates its annotation, and dropping one deletes it
+    npboxes[0] += 2
+    store.save(
+        ObjectDetectionLabels(
+            npboxes[:-1], labels.get_class_ids()[:-1], labels.get_scores()[:-1]
+        )
+    )
+    assert len(rf_stub.posted) == 32
+    assert len(rf_stub.put) == len(rf_stub.deleted) == 1
+
+
+def test_syncing_replaces_a_multipolygon_annotation_once(rf_stub, tmpdir):
+    rf_stub.project = {"extras": {"annotate": {"labels": [{"id": "car"}]}}}
+    crs_transformer = RasterioCRSTransformer(*CRS_TRANSFORMER_ARGS)
+    parts = annotation_features_from_labels(
+        ObjectDetectionLabels(
+            np.array([[0, 0, 20, 20], [100, 100, 120, 120]], dtype=float),
+            np.array([1, 1]),
+            np.array([0.9, 0.9]),
+        ),
+        crs_transformer,
+        "group",
+        {1: "car"},
+    )
+    multipolygon = dict(parts[0], id="mp-1")
+    multipolygon["geometry"] = {
+        "type": "MultiPolygon",
+        "coordinates": [part["geometry"]["coordinates"] for part in parts],
+    }
+    rf_stub.annotations = [multipolygon]
+    store = RfAnnotationGroupLabelStore(
+        "group",
+        "project",
+        "layer",
+        "refresh",
+        crs_transformer,
+        {1: "car"},
+        client=RfClient("refresh", rf_stub.host),
+        progress_dir=str(tmpdir),
+        sync=True,
+    )
+
+    store.save(
+        ObjectDetectionLabels(
+            np.array([[0, 0, 20, 20]], dtype=float), np.array([1]), np.array([0.9])
+        )
+    )
+
+    # The box around both polygons doesn't match the saved box, so it's replaced
+    assert len(rf_stub.annotations) == 1
+    assert len(rf_stub.posted) == 1
+    assert rf_stub.deleted == ["mp-1"] and not rf_stub.put
+    store.save(
+        ObjectDetectionLabels(
+            np.array([[0, 0, 20, 20]], dtype=float), np.array([1]), np.array([0.9])
+        )
+    )
+    assert len(rf_stub.annotations) == 1
+
+
+def test_spooling_the_same_pixel_boxes_from_two_scenes_keeps_both(rf_stub, tmpdir):
+    labels = ObjectDetectionLabels(
+        np.array([[0, 0, 10, 10]], dtype=float), np.array([1]), np.array([0.9])
+    )
+    spool_dir = str(tmpdir.join("spool"))
+    for west in (500000, 600000):
+        store = RfAnnotationGroupLabelStore(
+            "group",
+            "project",
+            "layer",
+            "refresh",
+            RasterioCRSTransformer(
+                rasterio.Affine(10, 0, west, 0, -10, 4000000), "EPSG:32618"
+            ),
+            {1: "car"},
+            client=RfClient("refresh", rf_stub.host),
+            spool_dir=spool_dir,
+        )
+        store.save(labels)
+
+    assert len(LabelSpool(spool_dir).shards()) == 2
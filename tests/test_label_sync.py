@@ -0,0 +1,86 @@
+import numpy as np
+
+from rf_raster_vision_plugin.label_store.label_sync import (
+    diff_labels,
+    match_boxes,
+    merge_parts,
+)
+
+
+def test_unchanged_labels_need_no_changes():
+    rng = np.random.RandomState(0)
+    corners = rng.uniform(0, 1000, (300, 2))
+    boxes = np.hstack([corners, corners + rng.uniform(5, 30, (300, 2))])
+    classes = rng.choice(["car", "truck"], 300)
+    scores = rng.uniform(size=300)
+    order = rng.permutation(300)
+
+    diff = diff_labels(
+        boxes + 0.1, classes, scores, boxes[order], classes[order], scores[order]
+    )
+
+    assert len(diff.creates) == len(diff.update_rows) == len(diff.deletes) == 0
+
+
+def test_diff_creates_updates_and_deletes():
+    old_boxes = np.array(
+        [[0, 0, 10, 10], [20, 20, 30, 30], [40, 40, 50, 50], [60, 60, 70, 70]],
+        dtype=float,
+    )
+    old_classes = np.array(["car", "car", "car", "truck"])
+    old_scores = np.array([0.9, 0.8, 0.7, 0.6])
+    boxes = np.array(
+        [
+            [0, 0, 10, 10],  # unchanged
+            [21, 21, 31, 31],  # moved
+            [40, 40, 50, 50],  # rescored
+            [60, 60, 70, 70],  # relabeled, so a new box beside a deleted one
+            [80, 80, 90, 90],  # new
+        ],
+        dtype=float,
+    )
+    classes = np.array(["car", "car", "car", "car", "car"])
+    scores = np.array([0.9, 0.8, 0.5, 0.6, 0.5])
+
+    diff = diff_labels(boxes, classes, scores, old_boxes, old_classes, old_scores)
+
+    assert sorted(diff.creates.tolist()) == [3, 4]
+    assert sorted(zip(diff.update_rows.tolist(), diff.update_targets.tolist())) == [
+        (1, 1),
+        (2, 2),
+    ]
+    assert diff.deletes.tolist() == [3]
+
+
+def test_match_boxes_pairs_each_box_once_by_highest_iou():
+    old_boxes = np.array([[0, 0, 10, 10], [2, 0, 12, 10]], dtype=float)
+    boxes = np.array([[1, 0, 11, 10], [2, 0, 12, 10], [0, 0, 10, 10]], dtype=float)
+    classes = np.array(["car"] * 3)
+
+    rows, others = match_boxes(boxes, classes, old_boxes, classes[:2])
+
+    assert sorted(zip(rows.tolist(), others.tolist())) == [(1, 1), (2, 0)]
+
+
+def test_diff_without_old_boxes_creates_everything():
+    diff = diff_labels(
+        np.array([[0, 0, 1, 1]], dtype=float),
+        np.array(["car"]),
+        np.array([1.0]),
+        np.empty((0, 4)),
+        np.array([], dtype=str),
+        np.empty(0),
+    )
+
+    assert diff.creates.tolist() == [0] and not len(diff.deletes)
+
+
+def test_an_annotations_polygons_merge_into_one_box():
+    ids, first, boxes = merge_parts(
+        np.array(["mp-1", "b", "mp-1"]),
+        np.array([[0, 0, 10, 10], [5, 5, 6, 6], [20, 30, 40, 50]], dtype=float),
+    )
+
+    assert ids.tolist() == ["b", "mp-1"]
+    assert first.tolist() == [1, 0]
+    np.testing.assert_array_equal(boxes, [[5, 5, 6, 6], [0, 0, 40, 50]])
@@ -0,0 +1,36 @@
+from rf_raster_vision_plugin.http import metadata
+from rf_raster_vision_plugin.http.client import RfClient
+
+
+def test_prefetched_metadata_is_shared(rf_stub):
+    rf_stub.project = {"extras": {"annotate": {"labels": [{"id": "car"}]}}}
+    rf_stub.scenes = [{"id": "scene"}]
+    client = RfClient("refresh", rf_stub.host)
+    scenes = [
+        {
+            "project_id": "shared-project",
+            "project_layer_id": "layer-{}".format(idx),
+            "annotation_group_id": "group",
+        }
+        for idx in range(5)
+    ]
+
+    metadata.prefetch(client, scenes)
+    fetched = len(rf_stub.requests)
+    for scene in scenes:
+        project = metadata.get_project(client, "shared-project")
+        assert metadata.get_rf_scenes(
+            client, "shared-project", scene["project_layer_id"]
+        )
+        assert (
+            metadata.pop_annotations(
+                client, "shared-project", scene["project_layer_id"], "group"
+            )
+            is not None
+        )
+    assert len(rf_stub.requests) == fetched
+    assert metadata.class_map(project) == {"car": 1}
+    # Annotations are only handed out once
+    assert (
+        metadata.pop_annotations(client, "shared-project", "layer-0", "group") is None
+    )
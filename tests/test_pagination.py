@@ -0,0 +1,56 @@
+import time
+
+from rf_raster_vision_plugin.http import raster_foundry as rf
+from rf_raster_vision_plugin.http.pagination import iter_pages
+
+
+def test_get_labels_merges_concurrent_pages_in_order(rf_stub):
+    rf_stub.annotations = [{"id": str(idx)} for idx in range(1000)]
+    rf_stub.latency = 0.1
+
+    start = time.perf_counter()
+    geojson = rf.get_labels(
+        "jwt", rf_stub.host, "project", "layer", "group", None, page_size=100
+    )
+    elapsed = time.perf_counter() - start
+
+    assert [feat["id"] for feat in geojson["features"]] == [
+        str(idx) for idx in range(1000)
+    ]
+    assert not geojson["hasNext"]
+    assert len(rf_stub.requests) == 10
+    # One round trip for the first page and one for the nine that follow it
+    assert elapsed < 0.5
+
+
+def test_get_scenes_walks_every_page(rf_stub):
+    rf_stub.scenes = [{"id": str(idx)} for idx in range(25)]
+
+    scenes = rf.get_scenes("jwt", rf_stub.host, "project", "layer", page_size=10)
+
+    assert [scene["id"] for scene in scenes] == [str(idx) for idx in range(25)]
+
+
+def test_iter_pages_follows_has_next_past_the_count():
+    pages = [
+        {"count": 2, "hasNext": True, "results": [0]},
+        {"count": 2, "hasNext": True, "results": [1]},
+        {"count": 3, "hasNext": False, "results": [2]},
+    ]
+
+    fetched = list(iter_pages(lambda page, page_size: pages[page], page_size=1))
+
+    assert [page["results"] for page in fetched] == [[0], [1], [2]]
+
+
+def test_iter_labels_yields_features_lazily_in_order(rf_stub):
+    rf_stub.annotations = [{"id": str(idx)} for idx in range(250)]
+
+    features = rf.iter_labels(
+        "jwt", rf_stub.host, "project", "layer", "group", page_size=100, max_workers=1
+    )
+    assert next(features)["id"] == "0"
+    assert len(rf_stub.requests) <= 2
+
+    assert [feat["id"] for feat in features] == [str(idx) for idx in range(1, 250)]
+    assert len(rf_stub.requests) == 3
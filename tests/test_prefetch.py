@@ -0,0 +1,53 @@
+import threading
+
+import numpy as np
+
+from rf_raster_vision_plugin.raster_source.prefetch import ChipPrefetcher
+
+
+def windows(count):
+    return [(0, 10 * idx, 10, 10 * (idx + 1)) for idx in range(count)]
+
+
+def chip_for(window):
+    return np.full((2, 2, 1), window[1], dtype=np.int32)
+
+
+def test_prefetched_chips_match_direct_reads():
+    prefetcher = ChipPrefetcher(chip_for, windows(20), max_workers=3, queue_size=4)
+    for window in windows(20):
+        np.testing.assert_array_equal(prefetcher.get(window), chip_for(window))
+    stats = prefetcher.stats()
+    assert stats["hits"] + stats["stalls"] == 20
+    assert stats["misses"] == 0
+    prefetcher.close()
+
+
+def test_reads_stay_within_the_queue_size():
+    release = threading.Event()
+    started = []
+
+    def read_chip(window):
+        started.append(window)
+        release.wait()
+        return chip_for(window)
+
+    prefetcher = ChipPrefetcher(read_chip, windows(20), max_workers=8, queue_size=3)
+    assert len(started) <= 3
+    release.set()
+    prefetcher.get(windows(20)[0])
+    assert len(started) <= 4
+    prefetcher.close()
+
+
+def test_unqueued_and_skipped_windows():
+    prefetcher = ChipPrefetcher(chip_for, windows(5), queue_size=5)
+    np.testing.assert_array_equal(
+        prefetcher.get((0, 500, 10, 510)), chip_for((0, 500, 10, 510))
+    )
+    assert prefetcher.stats()["misses"] == 1
+    # Skipping ahead drops the windows before it
+    prefetcher.get(windows(5)[3])
+    prefetcher.get(windows(5)[0])
+    assert prefetcher.stats()["misses"] == 2
+    prefetcher.close()
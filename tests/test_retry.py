@@ -0,0 +1,63 @@
+import time
+
+import pytest
+import requests
+
+from rf_raster_vision_plugin.http.client import RfClient
+from rf_raster_vision_plugin.http.retry import RetryPolicy, TokenBucket
+
+
+def client(rf_stub, **kwargs):
+    return RfClient(
+        "refresh", rf_stub.host, retry_policy=RetryPolicy(backoff=0), **kwargs
+    )
+
+
+def test_pages_are_retried_alone_honoring_retry_after(rf_stub):
+    rf_stub.scenes = [{"id": str(idx)} for idx in range(30)]
+    rf_client = client(rf_stub)
+    rf_client.get_project("project")
+    rf_stub.requests.clear()
+    rf_stub.failures = [(503, {"Retry-After": "0.3"}), (502, {})]
+
+    start = time.perf_counter()
+    scenes = rf_client.get_scenes("project", "layer", page_size=10, max_workers=1)
+
+    assert [scene["id"] for scene in scenes] == [str(idx) for idx in range(30)]
+    assert time.perf_counter() - start >= 0.3
+    pages = [req[2]["page"][0] for req in rf_stub.requests]
+    assert pages == ["0", "0", "0", "1", "2"]
+
+
+def test_posts_are_retried_only_when_refused(rf_stub):
+    rf_client = client(rf_stub)
+    rf_client.get_project("project")
+
+    rf_stub.failures = [(429, {"Retry-After": "0"})]
+    rf_client.post_labels("project", "layer", [{"id": "a"}])
+    assert rf_stub.posted == [{"id": "a"}]
+
+    rf_stub.failures = [(502, {})]
+    with pytest.raises(requests.HTTPError):
+        rf_client.post_labels("project", "layer", [{"id": "b"}])
+    assert rf_stub.posted == [{"id": "a"}]
+
+
+def test_retry_after_dates_and_caps():
+    response = requests.Response()
+    response.headers["Retry-After"] = "Wed, 21 Oct 2015 07:28:00 GMT"
+    assert RetryPolicy().delay(0, response) == 0
+
+    response.headers["Retry-After"] = "3600"
+    assert RetryPolicy(max_backoff=5).delay(0, response) == 5
+
+
+def test_token_bucket_spaces_out_requests_past_the_burst():
+    bucket = TokenBucket(rate=20, capacity=5)
+
+    start = time.perf_counter()
+    for _ in range(15):
+        bucket.acquire()
+
+    # The first five are a burst, and the next ten wait a twentieth of a second each
+    assert 0.45 <= time.perf_counter() - start < 1.0
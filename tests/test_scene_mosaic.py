@@ -0,0 +1,166 @@
+import numpy as np
+import rasterio
+from rasterio.warp import transform_bounds
+
+from rf_raster_vision_plugin.raster_source import scene_mosaic
+from rf_raster_vision_plugin.raster_source.scene_mosaic import (
+    LayerGrid,
+    MosaicStack,
+    SceneMosaic,
+    prepare_scenes,
+)
+from rf_raster_vision_plugin.raster_source.tiles import (
+    ORIGIN_SHIFT,
+    TILE_SIZE,
+    tile_span,
+)
+
+
+def utm_scene(path, idx, value):
+    left, top = 500000 + idx * 5000, 4500000
+    with rasterio.open(
+        path,
+        "w",
+        driver="GTiff",
+        width=500,
+        height=500,
+        count=3,
+        dtype="uint8",
+        crs="EPSG:32633",
+        transform=rasterio.Affine(10, 0, left, 0, -10, top),
+    ) as dataset:
+        dataset.write(np.full((3, 500, 500), value, dtype=np.uint8))
+    xmin, ymin, xmax, ymax = transform_bounds(
+        "EPSG:32633", "EPSG:4326", left, top - 5000, left + 5000, top
+    )
+    return {
+        "id": str(idx),
+        "ingestLocation": path,
+        "statusFields": {"ingestStatus": "INGESTED"},
+        "dataFootprint": {
+            "type": "MultiPolygon",
+            "coordinates": [
+                [[[xmin, ymin], [xmin, ymax], [xmax, ymax], [xmax, ymin], [xmin, ymin]]]
+            ],
+        },
+        "images": [{"resolutionMeters": 10}],
+    }
+
+
+def test_windows_read_only_the_scenes_under_them(tmpdir):
+    rf_scenes = [
+        utm_scene(str(tmpdir.join("{}.tif".format(idx))), idx, idx + 1)
+        for idx in range(2)
+    ]
+    rf_scenes.append(dict(rf_scenes[0], statusFields={"ingestStatus": "FAILED"}))
+    scenes = prepare_scenes(rf_scenes)
+    grid = LayerGrid.from_scenes(scenes)
+    mosaic = SceneMosaic(scenes, grid, 3)
+
+    assert len(scenes) == 2
+    # Two 5km scenes side by side at 10m
+    assert abs(grid.width - 1000) <= 2 and abs(grid.height - 500) <= 5
+    assert list(mosaic.scenes_in(0, 0, 100, 100)) == [0]
+
+    left = mosaic.read(200, 200, 300, 300)
+    right = mosaic.read(200, grid.width - 300, 300, grid.width - 200)
+    middle = mosaic.read(200, grid.width // 2 - 50, 300, grid.width // 2 + 50)
+
+    assert left.shape == (100, 100, 3) and left.dtype == np.uint8
+    assert set(np.unique(left)) == {1}
+    assert set(np.unique(right)) == {2}
+    assert set(np.unique(middle)) == {1, 2}
+
+
+def test_coarse_grids_read_decimated(tmpdir, monkeypatch):
+    rf_scenes = [
+        utm_scene(str(tmpdir.join("{}.tif".format(idx))), idx, idx + 1)
+        for idx in range(2)
+    ]
+    scenes = prepare_scenes(rf_scenes)
+    native = LayerGrid.from_scenes(scenes)
+    grid = LayerGrid.from_scenes(scenes, resolution=40)
+    mosaic = SceneMosaic(scenes, grid, 3)
+    reads = []
+    read = rasterio.io.DatasetReader.read
+
+    def recording_read(dataset, *args, **kwargs):
+        data = read(dataset, *args, **kwargs)
+        reads.append(data.shape)
+        return data
+
+    monkeypatch.setattr(rasterio.io.DatasetReader, "read", recording_read)
+    chip = mosaic.read(0, 0, 100, 100)
+
+    assert abs(grid.width - native.width / 4) <= 1
+    assert abs(grid.transform.a - native.transform.a * 4) < 1e-6
+    assert chip.shape == (100, 100, 3)
+    assert set(np.unique(chip[:50, :50])) == {1}
+    # The window spans over 400 native pixels each way, but is read decimated
+    assert reads and all(height < 150 and width < 150 for _, height, width in reads)
+
+
+def test_zoom_grids_align_with_tiles(tmpdir):
+    scenes = prepare_scenes([utm_scene(str(tmpdir.join("0.tif")), 0, 1)])
+
+    grid = LayerGrid.from_scenes(scenes, zoom=12)
+
+    pixel_size = tile_span(12) / TILE_SIZE
+    assert grid.transform.a == pixel_size
+    assert ((grid.transform.c + ORIGIN_SHIFT) / pixel_size) % 1 == 0
+    assert ((ORIGIN_SHIFT - grid.transform.f) / pixel_size) % 1 == 0
+
+
+def mercator_scene(path, grid, value, footprint_bounds):
+    """A scene ingested on a grid's own pixels"""
+    with rasterio.open(
+        path,
+        "w",
+        driver="GTiff",
+        width=grid.width,
+        height=grid.height,
+        count=2,
+        dtype="uint8",
+        crs="EPSG:3857",
+        transform=grid.transform,
+    ) as dataset:
+        dataset.write(np.full((2, grid.height, grid.width), value, dtype=np.uint8))
+    return {
+        "id": path,
+        "uri": path,
+        "footprint_bounds": footprint_bounds,
+        "resolution": None,
+    }
+
+
+def test_stacks_layers_into_one_array(tmpdir, monkeypatch):
+    utm_scenes = prepare_scenes([utm_scene(str(tmpdir.join("utm.tif")), 0, 7)])
+    grid = LayerGrid.from_scenes(utm_scenes, zoom=12)
+    aligned = [
+        mercator_scene(
+            str(tmpdir.join("aligned.tif")),
+            grid,
+            9,
+            utm_scenes[0]["footprint_bounds"],
+        )
+    ]
+    stack = MosaicStack(
+        [SceneMosaic(utm_scenes, grid, 3), SceneMosaic(aligned, grid, 2)]
+    )
+    warped = []
+    reproject = scene_mosaic.reproject
+
+    def recording_reproject(*args, **kwargs):
+        warped.append(kwargs["src_crs"])
+        return reproject(*args, **kwargs)
+
+    monkeypatch.setattr(scene_mosaic, "reproject", recording_reproject)
+    out = np.full((4, 4, 5), 255, dtype=np.uint8)
+    chip = stack.read(2, 2, 6, 6, out=out)
+    stack.close()
+
+    assert chip is out and stack.num_channels == 5
+    assert set(np.unique(chip[:, :, :3])) == {7}
+    assert set(np.unique(chip[:, :, 3:])) == {9}
+    # Only the UTM layer needed warping onto the grid
+    assert [crs.to_epsg() for crs in warped] == [32633]
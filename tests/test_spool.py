@@ -0,0 +1,26 @@
+import numpy as np
+
+from rf_raster_vision_plugin.label_store.box_ops import nms
+from rf_raster_vision_plugin.label_store.spool import LabelSpool
+
+
+def test_shards_merge_and_duplicates_across_them_are_dropped(tmpdir):
+    spool = LabelSpool(str(tmpdir))
+    left = np.array([[0.0, 0.0, 1.0, 1.0], [5.0, 5.0, 6.0, 6.0]])
+    # The first box was also predicted from the neighbouring window, slightly shifted
+    right = np.array([[0.05, 0.0, 1.05, 1.0], [0.0, 0.0, 1.0, 1.0]])
+    spool.write("left", left, ["car", "car"], np.array([0.9, 0.8]))
+    spool.write("right", right, ["car", "truck"], np.array([0.7, 0.6]))
+
+    annotations = spool.read(spool.shards())
+    kept = annotations.take(
+        nms(annotations.bounds, annotations.scores, annotations.label_indices)
+    )
+
+    assert len(spool.shards()) == 2
+    assert len(spool.read(spool.shards()[:1]).scores) == 2
+    assert kept.labels[kept.label_indices].tolist() == ["car", "car", "truck"]
+    np.testing.assert_array_equal(kept.scores, [0.9, 0.8, 0.6])
+
+    spool.clear(spool.shards())
+    assert spool.shards() == []
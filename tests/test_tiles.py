@@ -0,0 +1,78 @@
+import io
+
+import numpy as np
+
+from rf_raster_vision_plugin.http.client import RfClient
+from rf_raster_vision_plugin.raster_source.tiles import (
+    MAX_ZOOM,
+    ORIGIN_SHIFT,
+    TILE_SIZE,
+    TileFetcher,
+    tile_range,
+    tile_span,
+    zoom_for_resolution,
+)
+
+
+def encode(array):
+    buf = io.BytesIO()
+    np.save(buf, array)
+    return buf.getvalue()
+
+
+def decode(data):
+    return np.load(io.BytesIO(data))
+
+
+def test_tile_math():
+    assert zoom_for_resolution(tile_span(0) / TILE_SIZE) == 0
+    assert zoom_for_resolution(tile_span(10) / TILE_SIZE * 0.9) == 11
+    assert all(
+        zoom_for_resolution(tile_span(z) / TILE_SIZE) == z for z in range(MAX_ZOOM + 1)
+    )
+    # The top-left quarter of the world at zoom 1
+    assert tile_range((-ORIGIN_SHIFT + 1, 1, -1, ORIGIN_SHIFT - 1), 1) == (0, 0, 0, 0)
+    assert tile_range((-1, -1, 1, 1), 1) == (0, 0, 1, 1)
+
+
+def test_mosaic_fetches_covering_tiles_once(rf_stub):
+    z = 2
+    for x in range(4):
+        for y in range(4):
+            rf_stub.tiles[(z, x, y)] = encode(
+                np.full((TILE_SIZE, TILE_SIZE, 3), 10 * x + y, dtype=np.uint8)
+            )
+    client = RfClient("refresh", rf_stub.host)
+    fetcher = TileFetcher(
+        lambda z, x, y: client.get_tile(rf_stub.host, "project", "layer", z, x, y),
+        3,
+        decode=decode,
+    )
+    span = tile_span(z)
+    # Just inside tiles x 1..2 and y 1..2
+    bounds = (-span + 1, -span + 1, span - 1, span - 1)
+
+    mosaic, transform = fetcher.get_mosaic(bounds, z)
+    fetcher.get_mosaic(bounds, z)
+
+    assert mosaic.shape == (2 * TILE_SIZE, 2 * TILE_SIZE, 3)
+    assert mosaic[0, 0, 0] == 11
+    assert mosaic[0, -1, 0] == 21
+    assert mosaic[-1, 0, 0] == 12
+    assert transform[2] == -span and transform[5] == span
+    tile_requests = [req for req in rf_stub.requests if "/layers/" in req[1]]
+    assert len(tile_requests) == 4
+
+
+def test_missing_tiles_are_zero_filled(rf_stub):
+    client = RfClient("refresh", rf_stub.host)
+    fetcher = TileFetcher(
+        lambda z, x, y: client.get_tile(rf_stub.host, "project", "layer", z, x, y),
+        4,
+        decode=decode,
+    )
+
+    mosaic, _ = fetcher.get_mosaic((-1, -1, 1, 1), 1)
+
+    assert mosaic.shape == (2 * TILE_SIZE, 2 * TILE_SIZE, 4)
+    assert not mosaic.any()
@@ -0,0 +1,78 @@
+import numpy as np
+import rasterio
+
+from rf_raster_vision_plugin import window_sampler
+
+
+def brute_force_counts(npboxes, shape, chip_size, stride):
+    counts = np.zeros(shape, dtype=int)
+    for row in range(shape[0]):
+        for col in range(shape[1]):
+            ymin, xmin = row * stride, col * stride
+            counts[row, col] = np.sum(
+                (npboxes[:, 0] < ymin + chip_size)
+                & (npboxes[:, 2] > ymin)
+                & (npboxes[:, 1] < xmin + chip_size)
+                & (npboxes[:, 3] > xmin)
+            )
+    return counts
+
+
+def test_grid_shape_matches_get_windows():
+    # Box.get_windows starts windows at range(0, height, stride)
+    assert window_sampler.grid_shape(1000, 1300, 200) == (5, 7)
+    assert window_sampler.grid_shape(1000, 1000, 200) == (5, 5)
+
+
+def test_label_counts_match_brute_force():
+    rng = np.random.RandomState(0)
+    corners = rng.uniform(-50, 1300, (500, 2))
+    npboxes = np.hstack([corners, corners + rng.uniform(1, 60, (500, 2))])
+
+    for chip_size, stride in [(300, 200), (200, 200), (256, 128)]:
+        shape = window_sampler.grid_shape(1000, 1300, stride)
+        np.testing.assert_array_equal(
+            window_sampler.label_counts(npboxes, shape, chip_size, stride),
+            brute_force_counts(npboxes, shape, chip_size, stride),
+        )
+
+
+def test_label_counts_without_labels():
+    counts = window_sampler.label_counts(np.empty((0, 4)), (3, 4), 100, 100)
+    np.testing.assert_array_equal(counts, np.zeros((3, 4)))
+
+
+def test_footprint_coverage():
+    # 1000 x 1300 pixels of 0.001 degrees, with data in the western 600 columns
+    transform = rasterio.Affine(0.001, 0, 10, 0, -0.001, 46)
+    footprint = {
+        "type": "Polygon",
+        "coordinates": [[[10, 46], [10.6, 46], [10.6, 44], [10, 44], [10, 46]]],
+    }
+    shape = window_sampler.grid_shape(1000, 1300, 200)
+
+    coverage = window_sampler.footprint_coverage(
+        [footprint], transform, "EPSG:4326", shape, 300, 200
+    )
+
+    assert coverage.shape == shape
+    np.testing.assert_allclose(coverage[:, :2], 1)
+    np.testing.assert_allclose(coverage[:, 2], 2 / 3.0)
+    np.testing.assert_allclose(coverage[:, 3:], 0)
+
+
+def test_choose_windows_samples_negatives():
+    counts = np.zeros((10, 10), dtype=int)
+    counts[0, :4] = 1
+    counts[1, :2] = 3
+    coverage = np.ones((10, 10))
+    coverage[9] = 0
+
+    chosen = window_sampler.choose_windows(counts, coverage, neg_ratio=2.0, seed=0)
+
+    assert chosen[counts > 0].all()
+    assert chosen.sum() == 18
+    assert not chosen[9].any()
+    assert window_sampler.choose_windows(counts, coverage, neg_ratio=0).sum() == 6
+    assert window_sampler.choose_windows(counts, coverage, min_labels=2).sum() == 4
+    assert window_sampler.choose_windows(counts, coverage, neg_ratio=None).sum() == 90